@@ -0,0 +1,392 @@
+import argparse
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import ANALYTICS_CONFIG, OUTPUT_CONFIG
+from logger import configurar_logging, obtener_logger, detener_logging
+
+logger = obtener_logger('analytics')
+
+# ==============================================================================
+# ESPEJO ANALÍTICO COLUMNAR (DUCKDB) DE LA BASE SQLITE
+# ==============================================================================
+#
+# Las consultas analíticas (agregados sobre todos los perfiles, joins con media_urls) corren
+# sobre una copia columnar en DuckDB en lugar de la base operativa: son vectorizadas y no
+# retienen locks de SQLite mientras el scraper escribe. La copia se sincroniza de forma
+# incremental leyendo de SQLite en páginas cortas (cada página es una consulta independiente).
+
+# Tabla SQLite -> especificación del espejo
+#   columnas: nombre -> tipo DuckDB
+#   clave: columna única de la fila
+#   marcas: columnas de timestamp que cambian cuando la fila cambia
+#   particion: si se indica, al cambiar una fila se reemplaza toda su partición (para tablas
+#              cuyas filas se borran y reinsertan, como media_urls por username)
+TABLAS_ESPEJO: Dict[str, Dict] = {}
+
+
+def registrar_tabla_espejo(tabla: str, columnas: Dict[str, str], clave: str,
+                           marcas: Sequence[str], particion: Optional[str] = None) -> None:
+    """
+    Registra una tabla de SQLite para que se replique en el espejo analítico
+
+    Args:
+        tabla (str): Nombre de la tabla (igual en SQLite y en DuckDB)
+        columnas (Dict[str, str]): Columna -> tipo DuckDB
+        clave (str): Columna única
+        marcas (Sequence[str]): Columnas de timestamp de modificación
+        particion (str, optional): Columna cuyas particiones se reemplazan completas
+    """
+    TABLAS_ESPEJO[tabla] = {
+        'columnas': columnas,
+        'clave': clave,
+        'marcas': tuple(marcas),
+        'particion': particion,
+    }
+
+
+registrar_tabla_espejo('usuarios_unicos', {
+    'username': 'VARCHAR',
+    'perfil_inactivo': 'BOOLEAN',
+    'nombre_persona': 'VARCHAR',
+    'categoria': 'VARCHAR',
+    'perfil_privado': 'BOOLEAN',
+    'cantidad_publicaciones': 'BIGINT',
+    'cantidad_destacadas': 'BIGINT',
+    'cantidad_seguidores': 'BIGINT',
+    'cantidad_seguidos': 'BIGINT',
+    'biografia': 'VARCHAR',
+    'links_externos': 'VARCHAR',
+    'fecha_scraping': 'TIMESTAMP',
+    'ultima_actualizacion': 'TIMESTAMP',
+    'id_instagram': 'VARCHAR',
+}, clave='username', marcas=('ultima_actualizacion',))
+
+registrar_tabla_espejo('media_urls', {
+    'id': 'BIGINT',
+    'username': 'VARCHAR',
+    'url_media': 'VARCHAR',
+    'tipo_media': 'VARCHAR',
+    'subtipo_post': 'VARCHAR',
+    'cantidad_likes': 'BIGINT',
+    'cantidad_comentarios': 'BIGINT',
+    'fecha_scraping': 'TIMESTAMP',
+    'hash_contenido': 'VARCHAR',
+    'ruta_archivo': 'VARCHAR',
+    'estado_descarga': 'VARCHAR',
+    'intentos_descarga': 'BIGINT',
+    'fecha_descarga': 'TIMESTAMP',
+    'url_expira': 'TIMESTAMP',
+}, clave='id', marcas=('fecha_scraping', 'fecha_descarga'), particion='username')
+
+registrar_tabla_espejo('cambios', {
+    'seq': 'BIGINT',
+    'fecha': 'TIMESTAMP',
+    'entidad': 'VARCHAR',
+    'username': 'VARCHAR',
+    'clave': 'VARCHAR',
+    'operacion': 'VARCHAR',
+    'campos': 'VARCHAR',
+}, clave='seq', marcas=('fecha',))
+
+
+class EspejoAnalitico:
+    """
+    Copia columnar en DuckDB de las tablas registradas en TABLAS_ESPEJO.
+
+    Requiere los paquetes opcionales duckdb y numpy.
+    """
+
+    def __init__(self, db_path: str = None, archivo: str = None):
+        """
+        Args:
+            db_path (str, optional): Ruta a la base SQLite operativa
+            archivo (str, optional): Ruta del archivo DuckDB (':memory:' para uno temporal)
+        """
+        try:
+            import duckdb
+            import numpy
+        except ImportError as e:
+            raise ImportError("El espejo analítico requiere 'duckdb' y 'numpy' (pip install duckdb numpy)") from e
+
+        self._np = numpy
+        self.db_path = db_path or OUTPUT_CONFIG['database_file']
+        self.archivo = archivo or ANALYTICS_CONFIG['archivo_duckdb']
+        self.con = duckdb.connect(self.archivo)
+        self._crear_esquema()
+
+    def _crear_esquema(self) -> None:
+        self.con.execute('''
+            CREATE TABLE IF NOT EXISTS _sincronizacion (
+                tabla VARCHAR PRIMARY KEY,
+                marca VARCHAR,
+                filas BIGINT,
+                fecha TIMESTAMP
+            )
+        ''')
+        for tabla, spec in TABLAS_ESPEJO.items():
+            columnas = ', '.join(f'{nombre} {tipo}' for nombre, tipo in spec['columnas'].items())
+            self.con.execute(f'CREATE TABLE IF NOT EXISTS {tabla} ({columnas})')
+
+    def cerrar(self) -> None:
+        self.con.close()
+
+    # --------------------------------------------------------------------------
+    # Sincronización
+    # --------------------------------------------------------------------------
+
+    def _marca_previa(self, tabla: str) -> Optional[str]:
+        fila = self.con.execute('SELECT marca FROM _sincronizacion WHERE tabla = ?', [tabla]).fetchone()
+        return fila[0] if fila else None
+
+    def _leer_paginas(self, sqlite_conn, tabla: str, columnas: List[str], hasta: int, where: str = '',
+                      parametros: Sequence = ()):
+        """
+        Lee de SQLite por páginas keyset sobre rowid; cada página es una consulta corta.
+        Solo lee hasta el rowid `hasta`: las filas insertadas después de tomar la marca quedan
+        para la próxima sincronización.
+        """
+        ultimo = -1
+        filtro = f'({where}) AND ' if where else ''
+        lote = ANALYTICS_CONFIG['lote']
+        while True:
+            filas = sqlite_conn.execute(f'''
+                SELECT rowid, {', '.join(columnas)} FROM {tabla}
+                WHERE {filtro}rowid > ? AND rowid <= ?
+                ORDER BY rowid LIMIT ?
+            ''', [*parametros, ultimo, hasta, lote]).fetchall()
+            if not filas:
+                return
+            ultimo = filas[-1][0]
+            yield [fila[1:] for fila in filas]
+            if len(filas) < lote:
+                return
+
+    def _insertar_lote(self, tabla: str, spec: Dict, filas: List[tuple]) -> None:
+        """
+        Inserta un lote en DuckDB como arrays por columna (escaneo vectorizado, sin executemany).
+        Los NULL viajan en una máscara booleana por columna, porque el escaneo de NumPy
+        no admite None dentro de los arrays.
+        """
+        np = self._np
+        _lote = {}
+        seleccion = []
+        for i, (columna, tipo) in enumerate(spec['columnas'].items()):
+            valores = [fila[i] for fila in filas]
+            _lote[f'{columna}__nulo'] = np.fromiter((v is None for v in valores), dtype=bool, count=len(valores))
+            if tipo in ('BIGINT', 'BOOLEAN'):
+                _lote[columna] = np.array([0 if v is None else int(v) for v in valores], dtype=np.int64)
+            else:
+                _lote[columna] = np.array(['' if v is None else str(v) for v in valores], dtype=np.str_)
+            seleccion.append(f'CASE WHEN {columna}__nulo THEN NULL ELSE CAST({columna} AS {tipo}) END')
+
+        # DuckDB resuelve '_lote' con un replacement scan sobre esta variable local
+        self.con.execute(f"INSERT INTO {tabla} SELECT {', '.join(seleccion)} FROM _lote")
+
+    def _copiar(self, sqlite_conn, tabla: str, spec: Dict, hasta: int, where: str = '',
+                parametros: Sequence = ()) -> int:
+        copiadas = 0
+        for filas in self._leer_paginas(sqlite_conn, tabla, list(spec['columnas']), hasta, where, parametros):
+            self._insertar_lote(tabla, spec, filas)
+            copiadas += len(filas)
+        return copiadas
+
+    def _borrar_claves(self, tabla: str, columna: str, valores: List) -> None:
+        _claves = {'valor': self._np.array(valores, dtype=object)}  # Replacement scan, como en _insertar_lote
+        self.con.execute(f'DELETE FROM {tabla} WHERE {columna} IN (SELECT valor FROM _claves)')
+
+    def _sincronizar_tabla(self, sqlite_conn, tabla: str, spec: Dict, completo: bool) -> Tuple[int, bool]:
+        """
+        Sincroniza una tabla del espejo
+
+        Returns:
+            Tuple[int, bool]: (filas copiadas, si fue una copia completa)
+        """
+        marcas = spec['marcas']
+        marca_previa = None if completo else self._marca_previa(tabla)
+        # La marca nueva, el último rowid y el conteo se toman juntos antes de leer (una sola
+        # consulta, así que coinciden). La copia no pasa de ese rowid: lo insertado mientras tanto
+        # se lee la próxima vez y el espejo se compara con las filas que había al tomar la marca.
+        captura = sqlite_conn.execute(
+            f"SELECT COUNT(*), COALESCE(MAX(rowid), 0){''.join(f', MAX({m})' for m in marcas)} FROM {tabla}"
+        ).fetchone()
+        filas_sqlite, hasta = captura[:2]
+        marca_nueva = max((m for m in captura[2:] if m is not None), default=None)
+
+        self.con.execute('BEGIN TRANSACTION')
+        try:
+            if marca_previa is None:
+                self.con.execute(f'DELETE FROM {tabla}')
+                copiadas = self._copiar(sqlite_conn, tabla, spec, hasta)
+            else:
+                # Las claves también se acotan al rowid capturado: una partición reemplazada después
+                # (filas nuevas con rowid mayor) se copia completa en la próxima sincronización
+                cambio = f"rowid <= ? AND ({' OR '.join(f'{m} >= ?' for m in marcas)})"
+                parametros = [hasta] + [marca_previa] * len(marcas)
+                if spec['particion']:
+                    particion = spec['particion']
+                    claves = [fila[0] for fila in sqlite_conn.execute(
+                        f'SELECT DISTINCT {particion} FROM {tabla} WHERE {cambio}', parametros)]
+                    columna_borrado, cambio, parametros = particion, None, claves
+                else:
+                    claves = [fila[0] for fila in sqlite_conn.execute(
+                        f"SELECT {spec['clave']} FROM {tabla} WHERE {cambio}", parametros)]
+                    columna_borrado = spec['clave']
+
+                copiadas = 0
+                if claves:
+                    self._borrar_claves(tabla, columna_borrado, claves)
+                    # Releer por grupos de claves (límite de parámetros de SQLite)
+                    for i in range(0, len(claves), 500):
+                        grupo = claves[i:i + 500]
+                        copiadas += self._copiar(sqlite_conn, tabla, spec, hasta,
+                                                 f"{columna_borrado} IN ({', '.join('?' * len(grupo))})", grupo)
+
+            filas_espejo = self.con.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+            recopiar = marca_previa is not None and filas_sqlite != filas_espejo
+            if recopiar:
+                self.con.execute('ROLLBACK')
+            else:
+                self.con.execute('''
+                    INSERT OR REPLACE INTO _sincronizacion (tabla, marca, filas, fecha)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''', [tabla, marca_nueva, filas_espejo])
+                self.con.execute('COMMIT')
+
+        except Exception:
+            self.con.execute('ROLLBACK')
+            raise
+
+        if recopiar:
+            # Filas borradas en SQLite sin cambio de marca (limpieza, retención): copia completa.
+            # Va fuera del try: la transacción ya se cerró y un error de la copia no se enmascara
+            logger.info(f"[*] {tabla}: {filas_espejo} filas en el espejo y {filas_sqlite} en SQLite, copia completa")
+            return self._sincronizar_tabla(sqlite_conn, tabla, spec, completo=True)
+        return copiadas, marca_previa is None
+
+    def sincronizar(self, completo: bool = False) -> Dict[str, int]:
+        """
+        Sincroniza todas las tablas registradas desde SQLite
+
+        Args:
+            completo (bool): Si True, recopia todo en lugar de solo lo modificado
+
+        Returns:
+            Dict[str, int]: Tabla -> filas copiadas
+        """
+        resultado = {}
+        sqlite_conn = sqlite3.connect(self.db_path)
+        try:
+            existentes = {fila[0] for fila in sqlite_conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for tabla, spec in TABLAS_ESPEJO.items():
+                if tabla not in existentes:
+                    continue
+                copiadas, fue_completa = self._sincronizar_tabla(sqlite_conn, tabla, spec, completo)
+                resultado[tabla] = copiadas
+                logger.info(f"[+] {tabla}: {copiadas} filas {'copiadas' if fue_completa else 'actualizadas'}")
+        finally:
+            sqlite_conn.close()
+        return resultado
+
+    # --------------------------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------------------------
+
+    def consultar(self, sql: str, parametros: Optional[Sequence] = None) -> List[Dict]:
+        """
+        Ejecuta una consulta sobre el espejo
+
+        Args:
+            sql (str): Consulta SQL (dialecto DuckDB)
+            parametros (Sequence, optional): Parámetros posicionales (?)
+
+        Returns:
+            List[Dict]: Filas como diccionarios
+        """
+        cursor = self.con.execute(sql, parametros or [])
+        columnas = [descripcion[0] for descripcion in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def reporte_categorias(self, limite: int = 20) -> List[Dict]:
+        """Perfiles, seguidores y engagement de posts agregados por categoría"""
+        return self.consultar('''
+            WITH posts AS (
+                SELECT username,
+                       COUNT(*) AS posts,
+                       AVG(cantidad_likes) AS likes_promedio,
+                       AVG(cantidad_comentarios) AS comentarios_promedio
+                FROM media_urls
+                WHERE tipo_media = 'post'
+                GROUP BY username
+            )
+            SELECT COALESCE(u.categoria, '(sin categoría)') AS categoria,
+                   COUNT(*) AS perfiles,
+                   CAST(MEDIAN(u.cantidad_seguidores) AS BIGINT) AS seguidores_mediana,
+                   SUM(p.posts) AS posts,
+                   ROUND(AVG(p.likes_promedio), 1) AS likes_promedio,
+                   ROUND(AVG(p.comentarios_promedio), 1) AS comentarios_promedio
+            FROM usuarios_unicos u
+            LEFT JOIN posts p ON p.username = u.username
+            WHERE NOT u.perfil_inactivo
+            GROUP BY 1
+            ORDER BY perfiles DESC
+            LIMIT ?
+        ''', [limite])
+
+    def reporte_media(self) -> List[Dict]:
+        """Distribución de media por tipo, subtipo y estado de descarga"""
+        return self.consultar('''
+            SELECT tipo_media, subtipo_post, estado_descarga, COUNT(*) AS filas,
+                   COUNT(DISTINCT username) AS perfiles
+            FROM media_urls
+            GROUP BY ALL
+            ORDER BY filas DESC
+        ''')
+
+
+def _imprimir_filas(filas: List[Dict]) -> None:
+    if not filas:
+        print("(sin resultados)")
+        return
+    columnas = list(filas[0])
+    print(" | ".join(columnas))
+    for fila in filas:
+        print(" | ".join('' if fila[c] is None else str(fila[c]) for c in columnas))
+
+
+def main():
+    """Sincroniza el espejo analítico o consulta sobre él desde la línea de comandos"""
+    parser = argparse.ArgumentParser(description='Espejo analítico DuckDB de la base SQLite')
+    parser.add_argument('--db', default=None, help='Ruta a la base SQLite')
+    parser.add_argument('--archivo', default=None, help='Archivo DuckDB del espejo')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    sincronizar = subcomandos.add_parser('sincronizar', help='Copia los cambios de SQLite al espejo')
+    sincronizar.add_argument('--completo', action='store_true', help='Recopia todo el contenido')
+    consulta = subcomandos.add_parser('consulta', help='Ejecuta una consulta SQL sobre el espejo')
+    consulta.add_argument('sql')
+    subcomandos.add_parser('reporte', help='Reportes por categoría y de media')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        espejo = EspejoAnalitico(db_path=args.db, archivo=args.archivo)
+        try:
+            if args.comando == 'sincronizar':
+                espejo.sincronizar(completo=args.completo)
+            elif args.comando == 'consulta':
+                _imprimir_filas(espejo.consultar(args.sql))
+            else:
+                espejo.sincronizar()
+                print("\n📊 Por categoría")
+                _imprimir_filas(espejo.reporte_categorias())
+                print("\n🖼️ Media")
+                _imprimir_filas(espejo.reporte_media())
+        finally:
+            espejo.cerrar()
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import OUTPUT_CONFIG, RESPUESTAS_CONFIG
+from logger import configurar_logging, obtener_logger, ProgresoBatch, detener_logging
+
+logger = obtener_logger('respuestas')
+
+# ==============================================================================
+# ARCHIVO DE RESPUESTAS CRUDAS (COMPRIMIDO, SOLO ANEXAR) Y RE-EXTRACCIÓN OFFLINE
+# ==============================================================================
+#
+# Cada respuesta 200 de web_profile_info y de las consultas GraphQL se comprime con zlib y se
+# anexa al segmento activo (<directorio>/segmento-NNNNNN.bin, rota al superar el tamaño
+# configurado). El índice (<directorio>/indice.db) guarda username, tipo, fecha y la posición
+# del registro en su segmento. Los bytes se escriben antes que la fila del índice: un corte
+# a mitad deja, como mucho, bytes huérfanos que nunca se leen.
+
+# Tipo de respuesta -> etapa del scraper que la produce
+TIPOS_RESPUESTA = ('perfil', 'user', 'highlights', 'posts')
+
+
+class ArchivoRespuestas:
+    """Archivo anexable de respuestas crudas, indexado por username, tipo y fecha"""
+
+    def __init__(self, directorio: Optional[str] = None):
+        """
+        Args:
+            directorio (str, optional): Directorio del archivo (por defecto, de config)
+        """
+        self.directorio = directorio or RESPUESTAS_CONFIG['directorio']
+        self.tamano_segmento = RESPUESTAS_CONFIG['tamano_segmento_mb'] * 2**20
+        os.makedirs(self.directorio, exist_ok=True)
+
+        self.indice = sqlite3.connect(os.path.join(self.directorio, 'indice.db'))
+        self.indice.execute('PRAGMA journal_mode = WAL')
+        self.indice.execute('PRAGMA synchronous = NORMAL')
+        self.indice.execute('''
+            CREATE TABLE IF NOT EXISTS respuestas (
+                id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                segmento INTEGER NOT NULL,
+                desplazamiento INTEGER NOT NULL,
+                longitud INTEGER NOT NULL,
+                tamano_original INTEGER NOT NULL
+            )
+        ''')
+        self.indice.execute('CREATE INDEX IF NOT EXISTS idx_respuestas_usuario ON respuestas(username, tipo, id)')
+        self.indice.execute('CREATE INDEX IF NOT EXISTS idx_respuestas_fecha ON respuestas(fecha)')
+        self.indice.commit()
+
+        self._segmento = None
+        self._archivo = None
+
+    def ruta_segmento(self, segmento: int) -> str:
+        """Ruta del archivo de un segmento"""
+        return os.path.join(self.directorio, f'segmento-{segmento:06d}.bin')
+
+    def _segmento_activo(self):
+        if self._archivo is not None and self._archivo.tell() < self.tamano_segmento:
+            return self._archivo
+
+        if self._archivo is not None:
+            self._archivo.close()
+            self._segmento += 1
+        else:
+            ultimo = self.indice.execute('SELECT MAX(segmento) FROM respuestas').fetchone()[0] or 1
+            self._segmento = ultimo
+            if os.path.exists(self.ruta_segmento(ultimo)) and \
+                    os.path.getsize(self.ruta_segmento(ultimo)) >= self.tamano_segmento:
+                self._segmento += 1
+        self._archivo = open(self.ruta_segmento(self._segmento), 'ab')
+        return self._archivo
+
+    def guardar(self, username: str, tipo: str, cuerpo: bytes) -> None:
+        """
+        Comprime y anexa una respuesta, y la registra en el índice
+
+        Args:
+            username (str): Perfil consultado
+            tipo (str): Tipo de respuesta (ver TIPOS_RESPUESTA)
+            cuerpo (bytes): Cuerpo crudo de la respuesta
+        """
+        comprimido = zlib.compress(cuerpo, RESPUESTAS_CONFIG['nivel_compresion'])
+        archivo = self._segmento_activo()
+        desplazamiento = archivo.tell()
+        archivo.write(comprimido)
+        archivo.flush()
+
+        self.indice.execute('''
+            INSERT INTO respuestas (username, tipo, segmento, desplazamiento, longitud, tamano_original)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (username, tipo, self._segmento, desplazamiento, len(comprimido), len(cuerpo)))
+        self.indice.commit()
+
+    def leer(self, segmento: int, desplazamiento: int, longitud: int) -> bytes:
+        """Lee y descomprime un registro"""
+        with open(self.ruta_segmento(segmento), 'rb') as archivo:
+            archivo.seek(desplazamiento)
+            return zlib.decompress(archivo.read(longitud))
+
+    def ultima(self, username: str, tipo: str) -> Optional[bytes]:
+        """Cuerpo de la respuesta más reciente de un perfil y tipo, o None"""
+        fila = self.indice.execute('''
+            SELECT segmento, desplazamiento, longitud FROM respuestas
+            WHERE username = ? AND tipo = ?
+            ORDER BY id DESC LIMIT 1
+        ''', (username, tipo)).fetchone()
+        return self.leer(*fila) if fila else None
+
+    def ultimas(self, usernames: Optional[Sequence[str]] = None,
+                desde: Optional[str] = None) -> Iterator[Tuple[str, str, int, int, int]]:
+        """
+        Registros más recientes por (username, tipo), ordenados por username
+
+        Args:
+            usernames (Sequence[str], optional): Solo estos perfiles
+            desde (str, optional): Solo respuestas archivadas desde 'YYYY-MM-DD HH:MM:SS'
+
+        Yields:
+            Tuple: (username, tipo, segmento, desplazamiento, longitud)
+        """
+        condiciones = []
+        parametros = []
+        if usernames:
+            condiciones.append(f"username IN ({', '.join('?' * len(usernames))})")
+            parametros.extend(usernames)
+        if desde:
+            condiciones.append('fecha >= ?')
+            parametros.append(desde)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        # Con MAX(), SQLite toma las demás columnas de la fila del máximo
+        cursor = self.indice.execute(f'''
+            SELECT username, tipo, segmento, desplazamiento, longitud, MAX(id)
+            FROM respuestas
+            {where}
+            GROUP BY username, tipo
+            ORDER BY username, tipo
+        ''', parametros)
+        for fila in cursor:
+            yield fila[:5]
+
+    def estado(self) -> Dict:
+        """Registros, perfiles, segmentos y tamaños (comprimido y original) del archivo"""
+        registros, perfiles, segmentos, comprimido, original = self.indice.execute('''
+            SELECT COUNT(*), COUNT(DISTINCT username), COUNT(DISTINCT segmento),
+                   COALESCE(SUM(longitud), 0), COALESCE(SUM(tamano_original), 0)
+            FROM respuestas
+        ''').fetchone()
+        por_tipo = dict(self.indice.execute('SELECT tipo, COUNT(*) FROM respuestas GROUP BY tipo').fetchall())
+        return {
+            'registros': registros,
+            'perfiles': perfiles,
+            'segmentos': segmentos,
+            'bytes_comprimidos': comprimido,
+            'bytes_originales': original,
+            'por_tipo': por_tipo,
+        }
+
+    def cerrar(self) -> None:
+        """Cierra el segmento activo y el índice"""
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        self.indice.close()
+
+
+# ==============================================================================
+# RE-EXTRACCIÓN EN PARALELO (POOL DE PROCESOS + SEGMENTOS MAPEADOS EN MEMORIA)
+# ==============================================================================
+
+# Segmentos mapeados por proceso worker: segmento -> (archivo, mmap)
+_MAPAS: Dict[int, Tuple] = {}
+
+
+def _registro(directorio: str, segmento: int, desplazamiento: int, longitud: int) -> bytes:
+    """Lee un registro desde el mmap del segmento (se vuelve a mapear si el segmento creció)"""
+    mapa = _MAPAS.get(segmento)
+    if mapa is None or desplazamiento + longitud > len(mapa[1]):
+        if mapa is not None:
+            mapa[1].close()
+            mapa[0].close()
+        archivo = open(os.path.join(directorio, f'segmento-{segmento:06d}.bin'), 'rb')
+        mapa = _MAPAS[segmento] = (archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ))
+    return zlib.decompress(mapa[1][desplazamiento:desplazamiento + longitud])
+
+
+def _extraer(tipo: str, data: Dict):
+    """Aplica el extractor del scraper a una respuesta; None si la respuesta no es válida"""
+    from scraper_perfil import ScraperPerfil
+
+    if tipo == 'perfil':
+        return (data.get('data') or {}).get('user', {}).get('id')
+    if 'errors' in data:
+        return None
+    if tipo == 'user':
+        return ScraperPerfil.extract_user_data(data) if (data.get('data') or {}).get('user') else None
+    if tipo == 'highlights':
+        return ScraperPerfil.extract_highlights_data(data)
+    if tipo == 'posts':
+        return ScraperPerfil.extract_posts_data(data)
+    return None
+
+
+def _reprocesar_lote(directorio: str, registros: List[Tuple[str, str, int, int, int]]) -> List[Dict]:
+    """
+    Worker: re-extrae los perfiles de un lote (registros ordenados por username)
+
+    Returns:
+        List[Dict]: Un dict por perfil con las claves de TIPOS_RESPUESTA que resultaron válidas
+    """
+    perfiles = []
+    for username, grupo in groupby(registros, key=itemgetter(0)):
+        extraido = {'username': username}
+        for _, tipo, segmento, desplazamiento, longitud in grupo:
+            try:
+                valor = _extraer(tipo, json.loads(_registro(directorio, segmento, desplazamiento, longitud)))
+            except (ValueError, zlib.error, AttributeError, TypeError):
+                valor = None
+            if valor is not None:
+                extraido[tipo] = valor
+        perfiles.append(extraido)
+    return perfiles
+
+
+def _lotes(registros: Iterator[Tuple], perfiles_por_lote: int) -> Iterator[List[Tuple]]:
+    """Agrupa registros ordenados por username en lotes sin partir un perfil"""
+    lote = []
+    perfiles = 0
+    for username, grupo in groupby(registros, key=itemgetter(0)):
+        if perfiles >= perfiles_por_lote:
+            yield lote
+            lote = []
+            perfiles = 0
+        lote.extend(grupo)
+        perfiles += 1
+    if lote:
+        yield lote
+
+
+def _preparar_perfil(extraido: Dict) -> Tuple[str, Optional[Dict]]:
+    """
+    Arma el user_data de un perfil re-extraído
+
+    Returns:
+        Tuple[str, Optional[Dict]]: (resultado, user_data). Resultado 'completo' (usuario y
+        media), 'solo_usuario' (faltan posts o highlights válidos: la media guardada no se toca)
+        o 'incompleto' (sin datos de usuario válidos, user_data None)
+    """
+    from scraper_perfil import ScraperPerfil
+
+    if 'user' not in extraido:
+        return 'incompleto', None
+
+    user_data = dict(extraido['user'])
+    user_data['username'] = extraido['username']
+    user_data['user_id'] = extraido.get('perfil') or user_data.get('pk')
+    # Sin posts o highlights válidos no se agrega la clave: la media y los conteos guardados se conservan
+    for clave in ('posts', 'highlights'):
+        if clave in extraido:
+            user_data[clave] = extraido[clave]
+    completo = 'posts' in extraido and 'highlights' in extraido
+    return ('completo' if completo else 'solo_usuario'), ScraperPerfil.adaptar_para_guardar(user_data)
+
+
+def reprocesar(db_path: Optional[str] = None, directorio: Optional[str] = None,
+               usernames: Optional[Sequence[str]] = None, desde: Optional[str] = None,
+               workers: Optional[int] = None, simular: bool = False) -> Dict[str, int]:
+    """
+    Re-ejecuta los extractores del scraper sobre la respuesta más reciente de cada perfil y tipo,
+    en un pool de procesos, y escribe el resultado en la base (sin requests de red)
+
+    Args:
+        db_path (str, optional): Ruta a la base de datos
+        directorio (str, optional): Directorio del archivo
+        usernames (Sequence[str], optional): Solo estos perfiles
+        desde (str, optional): Solo respuestas archivadas desde esta fecha
+        workers (int, optional): Procesos del pool (por defecto, de config o CPUs)
+        simular (bool): Si True, extrae pero no escribe en la base
+
+    Returns:
+        Dict[str, int]: Perfiles completos, solo_usuario e incompletos
+    """
+    from database import InstagramDatabase
+
+    db = InstagramDatabase(db_path or OUTPUT_CONFIG['database_file'])
+    archivo = ArchivoRespuestas(directorio)
+    workers = workers or RESPUESTAS_CONFIG['workers'] or os.cpu_count()
+    conteos = {'completo': 0, 'solo_usuario': 0, 'incompleto': 0}
+    progreso = ProgresoBatch(total=archivo.estado()['perfiles'] if not usernames else len(usernames))
+
+    lotes = _lotes(archivo.ultimas(usernames, desde), RESPUESTAS_CONFIG['perfiles_por_lote'])
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Como máximo dos lotes en vuelo por worker: memoria acotada con backlogs grandes
+            en_vuelo = set()
+            while True:
+                for lote in lotes:
+                    en_vuelo.add(pool.submit(_reprocesar_lote, archivo.directorio, lote))
+                    if len(en_vuelo) >= workers * 2:
+                        break
+                if not en_vuelo:
+                    break
+
+                listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    # Un lote del pool = una transacción
+                    escrituras = []
+                    for extraido in futuro.result():
+                        resultado, user_data = _preparar_perfil(extraido)
+                        if user_data is not None:
+                            escrituras.append((user_data, resultado == 'completo'))
+                        conteos[resultado] += 1
+                        progreso.actualizar(resultado != 'incompleto')
+                    if escrituras and not simular:
+                        db.guardar_perfiles_lote(escrituras)
+    finally:
+        progreso.finalizar()
+        archivo.cerrar()
+
+    logger.info(f"[+] Re-extracción{' (simulada)' if simular else ''}: {conteos['completo']} completos, "
+                f"{conteos['solo_usuario']} solo usuario, {conteos['incompleto']} sin datos de usuario")
+    return conteos
+
+
+def main():
+    """Estado del archivo, lectura de respuestas y re-extracción desde la línea de comandos"""
+    parser = argparse.ArgumentParser(description='Archivo de respuestas crudas y re-extracción offline')
+    parser.add_argument('--directorio', default=None, help='Directorio del archivo')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('estado', help='Registros, perfiles y tamaño del archivo')
+    mostrar_parser = sub.add_parser('mostrar', help='Muestra la respuesta más reciente de un perfil')
+    mostrar_parser.add_argument('username')
+    mostrar_parser.add_argument('tipo', choices=TIPOS_RESPUESTA)
+    reprocesar_parser = sub.add_parser('reprocesar', help='Re-extrae y escribe en la base, sin red')
+    reprocesar_parser.add_argument('--db', default=None, help='Ruta a la base de datos')
+    reprocesar_parser.add_argument('--usuario', action='append', help='Solo este perfil (repetible)')
+    reprocesar_parser.add_argument('--desde', default=None, help="Solo respuestas desde 'YYYY-MM-DD HH:MM:SS'")
+    reprocesar_parser.add_argument('--workers', type=int, default=None, help='Procesos del pool')
+    reprocesar_parser.add_argument('--simular', action='store_true', help='Extraer sin escribir en la base')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        if args.comando == 'estado':
+            archivo = ArchivoRespuestas(args.directorio)
+            estado = archivo.estado()
+            archivo.cerrar()
+            proporcion = estado['bytes_originales'] / estado['bytes_comprimidos'] if estado['bytes_comprimidos'] else 0
+            logger.info(f"🗃️ {estado['registros']} respuestas de {estado['perfiles']} perfiles "
+                        f"en {estado['segmentos']} segmentos")
+            logger.info(f"   {estado['bytes_comprimidos'] / 2**20:.1f} MB comprimidos "
+                        f"({estado['bytes_originales'] / 2**20:.1f} MB originales, {proporcion:.1f}x)")
+            for tipo, cantidad in sorted(estado['por_tipo'].items()):
+                logger.info(f"   {tipo}: {cantidad}")
+        elif args.comando == 'mostrar':
+            archivo = ArchivoRespuestas(args.directorio)
+            cuerpo = archivo.ultima(args.username, args.tipo)
+            archivo.cerrar()
+            if cuerpo is None:
+                logger.warning(f"[!] Sin respuestas '{args.tipo}' archivadas para @{args.username}")
+            else:
+                print(json.dumps(json.loads(cuerpo), indent=2, ensure_ascii=False))
+        else:
+            reprocesar(args.db, args.directorio, args.usuario, args.desde, args.workers, args.simular)
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
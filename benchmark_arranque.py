@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de arranque en frío de los subcomandos ligeros del scraper.
+
+Ejecuta `scraper_perfil.py estadisticas`, `exportar` y `cambios` en procesos nuevos contra
+una base temporal, mide el tiempo de pared (mínimo y mediana de N ejecuciones), muestra los
+imports más costosos según `python -X importtime` y verifica que no se cargue ninguna dependencia
+pesada (Selenium, requests, numpy, duckdb...). Sale con código 1 si algún comando supera el
+presupuesto o importa algo prohibido, para poder usarlo en CI.
+
+Uso:
+    python benchmark_arranque.py
+    python benchmark_arranque.py --repeticiones 20 --presupuesto-ms 150 --top 15
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(DIRECTORIO, 'scraper_perfil.py')
+
+# Módulos que los comandos ligeros nunca deben importar
+PROHIBIDOS = ('selenium', 'webdriver_manager', 'requests', 'urllib3', 'httpx', 'numpy', 'duckdb')
+
+
+def preparar_base(directorio: str, usuarios: int) -> str:
+    """Crea una base temporal con algunos usuarios para que estadísticas/exportación hagan trabajo real"""
+    sys.path.insert(0, DIRECTORIO)
+    from database import InstagramDatabase
+
+    db_path = os.path.join(directorio, 'arranque.db')
+    db = InstagramDatabase(db_path)
+    db.agregar_usuarios_masivo([f'usuario_{i}' for i in range(usuarios)])
+    return db_path
+
+
+def comandos(db_path: str, directorio: str) -> dict:
+    return {
+        'estadisticas': ['--db', db_path, 'estadisticas'],
+        'exportar csv': ['--db', db_path, 'exportar', '--formato', 'csv',
+                         '--archivo', os.path.join(directorio, 'export.csv')],
+        'exportar json': ['--db', db_path, 'exportar', '--formato', 'json',
+                          '--archivo', os.path.join(directorio, 'export.json')],
+        'cambios': ['--db', db_path, 'cambios'],
+    }
+
+
+def medir(argumentos: list, repeticiones: int, directorio: str) -> list:
+    """Tiempos de pared (ms) de `python [scraper_perfil.py] <argumentos>`; '-c' mide el intérprete vacío"""
+    programa = [] if argumentos[0] == '-c' else [SCRIPT]
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable] + programa + argumentos, cwd=directorio, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+def perfil_imports(argumentos: list, directorio: str) -> list:
+    """Devuelve [(acumulado_us, modulo)] a partir de la salida de -X importtime"""
+    salida = subprocess.run([sys.executable, '-X', 'importtime', SCRIPT] + argumentos, cwd=directorio,
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    imports = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, modulo = linea[len('import time:'):].split('|')
+        imports.append((int(acumulado), modulo.rstrip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque en frío de los comandos ligeros')
+    parser.add_argument('--repeticiones', type=int, default=10, help='Ejecuciones por comando')
+    parser.add_argument('--presupuesto-ms', type=float, default=150.0, help='Mediana máxima permitida por comando')
+    parser.add_argument('--usuarios', type=int, default=1000, help='Usuarios en la base temporal')
+    parser.add_argument('--top', type=int, default=10, help='Imports más costosos a mostrar')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    fallos = []
+    try:
+        db_path = preparar_base(directorio, args.usuarios)
+        interprete = medir(['-c', 'pass'], args.repeticiones, directorio)
+        print(f"Intérprete vacío: mín {min(interprete):.0f} ms (referencia)")
+
+        for nombre, argumentos in comandos(db_path, directorio).items():
+            tiempos = medir(argumentos, args.repeticiones, directorio)
+            mediana = statistics.median(tiempos)
+            estado = '✓' if mediana <= args.presupuesto_ms else '✗'
+            print(f"\n{estado} {nombre}: mín {min(tiempos):.0f} ms | mediana {mediana:.0f} ms "
+                  f"(presupuesto {args.presupuesto_ms:.0f} ms)")
+            if mediana > args.presupuesto_ms:
+                fallos.append(f"{nombre} supera el presupuesto ({mediana:.0f} ms)")
+
+            imports = perfil_imports(argumentos, directorio)
+            for acumulado, modulo in sorted(imports, reverse=True)[:args.top]:
+                print(f"   {acumulado / 1000:7.1f} ms  {modulo}")
+            cargados = {modulo.strip().split('.')[0] for _, modulo in imports}
+            for prohibido in PROHIBIDOS:
+                if prohibido in cargados:
+                    fallos.append(f"{nombre} importa '{prohibido}'")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if fallos:
+        print("\n❌ " + "\n❌ ".join(fallos))
+        sys.exit(1)
+    print("\n✅ Todos los comandos dentro del presupuesto y sin dependencias pesadas")
+
+
+if __name__ == '__main__':
+    main()
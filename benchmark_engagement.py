@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del cálculo de engagement vectorizado.
+
+Genera datos sintéticos (perfiles con seguidores y categoría, posts con likes/comentarios) y mide
+el cálculo en memoria; con --sqlite también mide el pipeline completo (carga desde SQLite,
+cálculo y escritura de las tablas de resumen). Verifica los percentiles contra np.percentile
+en una muestra de perfiles.
+
+Uso:
+    python benchmark_engagement.py --media 5000000 --perfiles 200000
+    python benchmark_engagement.py --media 1000000 --perfiles 50000 --sqlite
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from engagement import calcular_metricas_perfiles, calcular_metricas_categorias, calcular_engagement
+from logger import configurar_logging, detener_logging
+
+
+def generar(n_media: int, n_perfiles: int, semilla: int = 7):
+    rng = np.random.default_rng(semilla)
+    seguidores = rng.lognormal(9, 2, n_perfiles).astype(np.int64)
+    categorias = rng.choice(np.array(['Artist', 'Athlete', 'Brand', 'Creator', 'Media', '(sin categoría)'],
+                                     dtype=object), n_perfiles)
+    codigos = rng.integers(0, n_perfiles, n_media)
+    likes = np.round(seguidores[codigos] * rng.beta(1, 40, n_media))
+    comentarios = np.round(likes * rng.beta(1, 60, n_media))
+    es_video = (rng.random(n_media) < 0.35).astype(np.float64)
+    return codigos, likes, comentarios, es_video, seguidores.astype(np.float64), categorias
+
+
+def verificar(codigos, likes, metricas, muestra: int = 50):
+    for perfil in np.unique(codigos)[:muestra]:
+        valores = likes[codigos == perfil]
+        for q, clave in ((50, 'likes_p50'), (90, 'likes_p90')):
+            esperado = np.percentile(valores, q)
+            assert np.isclose(metricas[clave][perfil], esperado), (perfil, clave, metricas[clave][perfil], esperado)
+
+
+def benchmark_memoria(n_media: int, n_perfiles: int):
+    codigos, likes, comentarios, es_video, seguidores, categorias = generar(n_media, n_perfiles)
+
+    inicio = time.perf_counter()
+    metricas = calcular_metricas_perfiles(codigos, likes, comentarios, es_video, seguidores)
+    t_perfiles = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resumen = calcular_metricas_categorias(categorias, metricas)
+    t_categorias = time.perf_counter() - inicio
+
+    verificar(codigos, likes, metricas)
+    print(f"En memoria: {n_media:,} posts / {n_perfiles:,} perfiles")
+    print(f"   Métricas por perfil:    {t_perfiles:6.2f}s ({n_media / t_perfiles / 1e6:.1f} M posts/s)")
+    print(f"   Rollup por categoría:   {t_categorias:6.2f}s ({len(resumen['categoria'])} categorías)")
+    print("   Percentiles verificados contra np.percentile ✓")
+
+
+def benchmark_sqlite(n_media: int, n_perfiles: int):
+    codigos, likes, comentarios, es_video, seguidores, categorias = generar(n_media, n_perfiles)
+    directorio = tempfile.mkdtemp()
+    db_path = os.path.join(directorio, 'benchmark.db')
+
+    from database import InstagramDatabase
+    InstagramDatabase(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany('''
+            INSERT INTO usuarios_unicos (username, cantidad_seguidores, cantidad_seguidos,
+                                         cantidad_publicaciones, categoria)
+            VALUES (?, ?, 0, 0, ?)
+        ''', ((f'perfil_{i}', int(s), None if c == '(sin categoría)' else c)
+              for i, (s, c) in enumerate(zip(seguidores, categorias))))
+        conn.executemany('''
+            INSERT INTO media_urls (username, url_media, tipo_media, subtipo_post, cantidad_likes, cantidad_comentarios)
+            VALUES (?, '', 'post', ?, ?, ?)
+        ''', ((f'perfil_{c}', 'reel' if v else 'foto', int(l), int(m))
+              for c, l, m, v in zip(codigos.tolist(), likes.tolist(), comentarios.tolist(), es_video.tolist())))
+        conn.commit()
+
+    inicio = time.perf_counter()
+    perfiles_resumidos, n_categorias = calcular_engagement(db_path)
+    duracion = time.perf_counter() - inicio
+    print(f"Pipeline SQLite: {n_media:,} posts / {n_perfiles:,} perfiles")
+    print(f"   Carga + cálculo + escritura: {duracion:6.2f}s ({perfiles_resumidos:,} perfiles, {n_categorias} categorías)")
+    os.remove(db_path)
+    os.rmdir(directorio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del engagement vectorizado')
+    parser.add_argument('--media', type=int, default=5_000_000, help='Posts sintéticos')
+    parser.add_argument('--perfiles', type=int, default=200_000, help='Perfiles sintéticos')
+    parser.add_argument('--sqlite', action='store_true', help='Medir también el pipeline completo sobre SQLite')
+    args = parser.parse_args()
+
+    configurar_logging(nivel='WARNING')
+    try:
+        benchmark_memoria(args.media, args.perfiles)
+        if args.sqlite:
+            benchmark_sqlite(args.media, args.perfiles)
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
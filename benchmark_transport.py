@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de la capa de transporte contra un servidor HTTP local.
+
+Mide, para cada configuración de sesión, cuántas conexiones TCP se abren para N requests
+(reutilización de conexiones) y el tiempo hasta el primer byte (TTFB, p50/p95), tanto en
+secuencial como con concurrencia.
+
+Uso:
+    python benchmark_transport.py --requests 400 --concurrencia 16
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from transport import crear_sesion
+
+CUERPO = json.dumps({'data': {'user': {'id': '1', 'biography': 'x' * 4000}}}).encode()
+CUERPO_GZIP = gzip.compress(CUERPO)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    conexiones = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with _Handler.lock:
+            _Handler.conexiones.add(self.client_address)
+
+        cuerpo = CUERPO
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            cuerpo = CUERPO_GZIP
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def _medir(nombre, obtener, url, total, concurrencia):
+    _Handler.conexiones = set()
+    ttfb = []
+
+    def una_request(_):
+        inicio = time.perf_counter()
+        respuesta = obtener(url, stream=True)
+        ttfb.append(time.perf_counter() - inicio)
+        respuesta.content
+        respuesta.close()
+
+    inicio = time.perf_counter()
+    if concurrencia > 1:
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            list(pool.map(una_request, range(total)))
+    else:
+        for i in range(total):
+            una_request(i)
+    duracion = time.perf_counter() - inicio
+
+    ttfb.sort()
+    p95 = ttfb[int(len(ttfb) * 0.95) - 1]
+    print(f"{nombre:<38} conexiones: {len(_Handler.conexiones):>5} | "
+          f"TTFB p50: {statistics.median(ttfb) * 1000:6.2f} ms | p95: {p95 * 1000:6.2f} ms | "
+          f"{total / duracion:8.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de reutilización de conexiones y TTFB')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrencia', type=int, default=16)
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/api"
+
+    sesion_default = requests.Session()
+    sesion_transporte = crear_sesion(backend='requests', pool_maxsize=args.concurrencia)
+
+    for concurrencia in (1, args.concurrencia):
+        print(f"\n=== {args.requests} requests, concurrencia {concurrencia} ===")
+        _medir('requests.get (sin sesión)', requests.get, url, args.requests, concurrencia)
+        _medir('requests.Session() por defecto', sesion_default.get, url, args.requests, concurrencia)
+        _medir('transport.crear_sesion()', sesion_transporte.get, url, args.requests, concurrencia)
+
+        try:
+            sesion_httpx = crear_sesion(backend='httpx', pool_maxsize=args.concurrencia)
+            if not isinstance(sesion_httpx, requests.Session):
+                _medir('transport.crear_sesion(httpx)', sesion_httpx.get, url, args.requests, concurrencia)
+                sesion_httpx.close()
+        except ImportError:
+            pass
+
+    servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+from collections import deque
+from typing import Dict, Optional
+
+from config import CIRCUIT_BREAKER_CONFIG
+
+# ==============================================================================
+# CIRCUIT BREAKER POR TIPO DE CONSULTA
+# ==============================================================================
+
+class CircuitBreaker:
+    """
+    Vigila la tasa de error móvil de cada tipo de consulta.
+
+    Cuando un doc_id queda obsoleto o expiran fb_dtsg/lsd, todas las consultas de
+    ese tipo empiezan a fallar a la vez; el breaker se dispara al superar el umbral
+    dentro de la ventana para que el batch se detenga en lugar de seguir gastando
+    requests y marcando perfiles válidos como inactivos.
+    """
+
+    def __init__(self, ventana: Optional[int] = None, min_muestras: Optional[int] = None,
+                 umbral_error: Optional[float] = None):
+        """
+        Args:
+            ventana (int, optional): Cantidad de resultados recientes considerados por tipo
+            min_muestras (int, optional): Resultados mínimos antes de poder dispararse
+            umbral_error (float, optional): Tasa de error (0-1) que dispara el breaker
+        """
+        self.ventana = ventana or CIRCUIT_BREAKER_CONFIG['ventana']
+        self.min_muestras = min_muestras or CIRCUIT_BREAKER_CONFIG['min_muestras']
+        self.umbral_error = umbral_error or CIRCUIT_BREAKER_CONFIG['umbral_error']
+        self._resultados: Dict[str, deque] = {}
+
+    def registrar(self, tipo: str, exito: bool) -> None:
+        """
+        Registra el resultado de una consulta
+
+        Args:
+            tipo (str): Tipo de consulta ("perfil", "user", "highlights", "posts", ...)
+            exito (bool): Si la consulta respondió correctamente
+        """
+        if tipo not in self._resultados:
+            self._resultados[tipo] = deque(maxlen=self.ventana)
+        self._resultados[tipo].append(exito)
+
+    def tasa_error(self, tipo: str) -> float:
+        """Devuelve la tasa de error móvil de un tipo de consulta"""
+        resultados = self._resultados.get(tipo)
+        if not resultados:
+            return 0.0
+        return resultados.count(False) / len(resultados)
+
+    def ultimo_fallo(self, tipo: str) -> bool:
+        """Indica si el último resultado registrado para el tipo fue un fallo"""
+        resultados = self._resultados.get(tipo)
+        return bool(resultados) and not resultados[-1]
+
+    def disparado(self) -> Optional[str]:
+        """
+        Verifica si algún tipo de consulta superó el umbral de error
+
+        Returns:
+            Optional[str]: Tipo de consulta que disparó el breaker, o None
+        """
+        for tipo, resultados in self._resultados.items():
+            if len(resultados) >= self.min_muestras and self.tasa_error(tipo) >= self.umbral_error:
+                return tipo
+        return None
+
+    def reiniciar(self) -> None:
+        """Descarta el historial (por ejemplo, después de refrescar tokens)"""
+        self._resultados.clear()
@@ -7,6 +7,15 @@ import os
 # Rutas
 CHROMEDRIVER_PATH = "C:\\Users\\Noval\\Downloads\\chromedriver-win64\\chromedriver-win64\\chromedriver.exe"
 
+# Navegador de login (Selenium)
+LOGIN_CONFIG = {
+    'cache_driver': '.chromedriver_path',   # Ruta de chromedriver resuelta por webdriver-manager (evita la consulta de red)
+    'directorio_perfil': 'chrome_profile',  # Perfil de Chrome reutilizable (None = perfil temporal)
+    'estrategia_carga': 'eager',            # 'eager': no espera imágenes ni subrecursos
+    'bloquear_imagenes': True,              # No descargar imágenes en el navegador de login
+    'timeout_espera': 15,                   # Espera máxima por elemento / token (segundos)
+}
+
 # NOTA: Las credenciales ahora se manejan a través del módulo login.py
 # que solicita las credenciales al usuario de forma interactiva y segura
 
@@ -28,10 +37,94 @@ USERNAMES_EJEMPLO = [
 SCRAPING_CONFIG = {
     'delay_min': 2,      # Delay mínimo entre requests (segundos)
     'delay_max': 6,      # Delay máximo entre requests (segundos)
-    'max_retries': 3,    # Máximo número de reintentos
-    'timeout': 20,       # Timeout para requests
+    'max_retries': 3,    # Fallos transitorios consecutivos antes de descartar el perfil
+    'backoff_base': 900,         # Espera tras el primer fallo transitorio (segundos); se duplica en cada fallo
+    'backoff_max': 86400,        # Espera máxima entre reintentos (segundos)
+    'ttl_descartados': 30 * 86400,  # Caché negativa: perfiles inexistentes o sin reintentos no se piden en N segundos
+    'timeout': 20,       # Timeout de lectura para requests (segundos)
+    'timeout_conexion': 5,  # Timeout para establecer la conexión (segundos)
+    'deadline_perfil': 90,  # Tiempo máximo por perfil sumando todas sus consultas (segundos)
     'headless': True,    # Ejecutar Chrome sin ventana visible
     'force_rescrape': False,  # Si True, scrapea incluso perfiles ya completos
+    'horas_antes_expiracion': 12,  # Refrescar URLs de media que expiren dentro de este horizonte
+    # Límites de cada ejecución de scrape_pending_users (None = sin límite). Se verifican entre
+    # perfiles con el costo medio observado, para no empezar un perfil que no alcanza a terminar
+    'max_minutos_batch': None,   # Tiempo de pared máximo
+    'max_requests_batch': None,  # Requests a la API máximas (cuota)
+    'max_perfiles_batch': None,  # Perfiles procesados máximos
+    'orden_pendientes': 'antiguedad',  # 'antiguedad' (menos actualizados primero) o 'seguidores' (más seguidores primero)
+    'reanudar_batch': True,      # Si un batch detenido antes de terminar continúa desde su posición guardada
+}
+
+# Intervalo de refresco por consulta del perfil (horas): al re-scrapear, las consultas respondidas
+# hace menos de N horas se saltan y se conservan sus datos guardados (None o 0 = siempre se piden)
+REFRESCO_CONFIG = {
+    'user': 6,          # Métricas y datos del perfil (seguidores cambian a diario)
+    'posts': 24,        # Posts recientes
+    'highlights': 168,  # Historias destacadas (casi no cambian)
+}
+
+# Circuit breaker (doc_ids obsoletos o tokens expirados)
+CIRCUIT_BREAKER_CONFIG = {
+    'ventana': 20,          # Resultados recientes considerados por tipo de consulta
+    'min_muestras': 8,      # Resultados mínimos antes de poder dispararse
+    'umbral_error': 0.6,    # Tasa de error que dispara el breaker
+    'pausa_segundos': 120,  # Pausa antes de intentar refrescar tokens
+    'max_refrescos': 1,     # Refrescos de tokens antes de detener el batch
+}
+
+# Presupuesto de requests a la API compartido por todas las etapas (limitador.py)
+LIMITE_TASA_CONFIG = {
+    'requests_por_segundo': 1.0,  # Ritmo sostenido máximo
+    'rafaga': 4,                  # Requests seguidas permitidas tras un periodo inactivo
+}
+
+# Extracción de posts: qué candidato de imagen/video se usa como URL principal (la que se descarga)
+POSTS_CONFIG = {
+    # 'primera': el primer candidato del payload (el de mayor resolución)
+    # 'mayor': el de mayor ancho | 'menor_sobre': el menor con ancho >= resolucion_minima
+    'politica_candidato': 'primera',
+    'resolucion_minima': 640,  # Ancho mínimo (px) para 'menor_sobre'; si ninguno alcanza, el mayor
+}
+
+# Contenido de las historias destacadas (opcional: cuesta requests extra por perfil)
+DESTACADAS_CONFIG = {
+    'activo': False,          # Si True, descarga los items (reels) de cada destacada
+    'ids_por_request': 10,    # Destacadas pedidas juntas en cada request a reels_media
+    'workers': 2,             # Requests de contenido en paralelo (dentro del presupuesto compartido)
+}
+
+# Salud de la sesión autenticada (re-autenticación automática a mitad del batch)
+SESION_CONFIG = {
+    'cookies_criticas': ['sessionid', 'csrftoken', 'ds_user_id'],  # Si alguna caduca, la sesión deja de servir
+    'margen_expiracion': 600,      # Re-autenticar si una cookie crítica expira en menos de N segundos
+    'estados_http': [401, 403],    # Estados que indican sesión inválida
+    'rutas_login': ['/accounts/login', '/challenge'],  # Redirecciones que indican sesión inválida
+    'mensajes_error': ['login_required', 'checkpoint_required', '"require_login":true'],
+    'codigos_graphql': [1357001, 1357004],  # Códigos de error GraphQL de "no autenticado"
+    'max_reautenticaciones': 5,    # Por ejecución; al agotarlas el batch se detiene
+}
+
+# Transporte HTTP de la sesión compartida
+TRANSPORT_CONFIG = {
+    'backend': 'requests',       # 'requests' o 'httpx' (HTTP/2 con: pip install httpx[http2])
+    'http2': True,               # Solo aplica al backend httpx
+    'pool_hosts': 4,             # Hosts distintos con pool propio (instagram.com, CDNs, ...)
+    'pool_por_host': 16,         # Conexiones reutilizables por host
+    'pool_bloqueante': False,    # Si True, espera una conexión libre en lugar de abrir una extra
+    'keepalive_inactividad': 60, # Segundos de inactividad antes de sondear (TCP keep-alive)
+    'keepalive_intervalo': 15,   # Segundos entre sondeos TCP keep-alive
+}
+
+# Consultas GraphQL
+GRAPHQL_CONFIG = {
+    # Doc IDs por tipo de consulta (CRÍTICOS - pueden cambiar con actualizaciones de Instagram)
+    'doc_ids': {
+        'user': '24059491867034637',
+        'highlights': '9814547265267853',
+        'posts': '24312092678414792',
+    },
+    'archivo_doc_ids': 'doc_ids.json',  # JSON opcional que sobrescribe los doc_ids sin tocar código
 }
 
 # Archivos de salida
@@ -41,4 +134,69 @@ OUTPUT_CONFIG = {
     'database_file': 'instagram_data.db',  # Archivo de base de datos
 }
 
+# Configuración de logging y progreso
+LOGGING_CONFIG = {
+    'nivel': 'INFO',            # Nivel de consola (DEBUG muestra el detalle por perfil)
+    'modo_silencioso': False,   # Si True, solo warnings + una línea de progreso con ETA
+    'intervalo_progreso': 2.0,  # Segundos mínimos entre actualizaciones de la línea de progreso
+    'archivo_jsonl': None,      # Ej: 'scraper.log.jsonl' para un log JSON-lines (hilo en segundo plano)
+    'nivel_jsonl': 'DEBUG',     # Nivel mínimo que se escribe al archivo JSON-lines
+}
+
+# Descarga de media (almacén direccionado por contenido)
+DOWNLOAD_CONFIG = {
+    'directorio': 'media_store',  # Raíz del almacén: <sha[:2]>/<sha[2:4]>/<sha>.<ext>
+    'workers': 8,                 # Descargas concurrentes (y tamaño del pool de conexiones)
+    'lote': 200,                  # Filas leídas y registradas en la BD por lote
+    'chunk_bytes': 64 * 1024,     # Tamaño de bloque al escribir en streaming
+    'timeout': 20,                # Timeout por descarga (segundos)
+    'max_intentos': 3,            # Intentos antes de dejar de reintentar una URL
+}
+
+# Espejo analítico columnar (DuckDB, opcional: pip install duckdb numpy)
+ANALYTICS_CONFIG = {
+    'archivo_duckdb': 'analytics.duckdb',  # Archivo del espejo analítico
+    'lote': 50000,                         # Filas leídas de SQLite por consulta al sincronizar
+}
+
+# Importación masiva de usernames (CSV / NDJSON / texto plano)
+INGESTA_CONFIG = {
+    'lote': 5000,           # Filas por executemany / transacción
+    'columna': 'username',  # Columna (CSV) o clave (NDJSON) con el username
+}
+
+# Registro de cambios (CDC) de perfiles y media para consumidores incrementales
+CAMBIOS_CONFIG = {
+    'activo': True,        # Si el guardado de perfiles y media registra eventos en la tabla 'cambios'
+    'lote': 1000,          # Eventos leídos por consulta al seguir el registro
+    'intervalo_seguir': 2, # Segundos entre consultas con --seguir cuando no hay eventos nuevos
+}
+
+# Retención, archivo y compactación de la base SQLite
+RETENCION_CONFIG = {
+    'directorio_archivo': 'archivo_db',  # Filas archivadas: <tabla>/<política>-<fecha>.ndjson.gz
+    'politicas': {                       # Política -> antigüedad en días antes de archivar (None = desactivada)
+        'media_posts': 365,
+        'media_destacadas': 180,
+        'perfiles_inactivos': 180,
+        'cambios': 90,
+    },
+    'lote': 5000,                # Filas leídas por fetchmany al archivar
+    'borrar_archivos': True,     # Si se borran los archivos de media que solo usaban filas archivadas (False = informar)
+    'presupuesto_mb': 1024,      # Tamaño máximo de la base antes de archivar y compactar (0 = sin límite)
+    'archivar_al_exceder': True, # Si al superar el presupuesto se aplican las políticas de retención
+    'umbral_libre': 0.10,        # Fracción de páginas libres que dispara un incremental_vacuum
+    'paginas_vacuum': 2000,      # Páginas liberadas por pasada de incremental_vacuum
+}
+
+# Archivo de respuestas crudas (para re-extraer campos nuevos sin volver a scrapear)
+RESPUESTAS_CONFIG = {
+    'activo': True,             # Si archivar cada respuesta 200 de web_profile_info y GraphQL
+    'directorio': 'respuestas', # Segmentos segmento-NNNNNN.bin + índice indice.db
+    'tamano_segmento_mb': 256,  # Tamaño a partir del cual se abre un segmento nuevo
+    'nivel_compresion': 6,      # Nivel de zlib por respuesta
+    'workers': None,            # Procesos al re-extraer (None = CPUs disponibles)
+    'perfiles_por_lote': 500,   # Perfiles por tarea del pool al re-extraer
+}
+
 # No necesitamos crear directorios adicionales
\ No newline at end of file
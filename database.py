@@ -1,8 +1,98 @@
 import sqlite3
+import itertools
 import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+from logger import obtener_logger
+from migraciones import aplicar_migraciones
+
+logger = obtener_logger('database')
+
+# Columnas proyectables por los lectores iterar_usuarios / iterar_media
+COLUMNAS_USUARIOS = (
+    'username', 'perfil_inactivo', 'nombre_persona', 'categoria', 'perfil_privado',
+    'cantidad_publicaciones', 'cantidad_destacadas', 'cantidad_seguidores', 'cantidad_seguidos',
+    'biografia', 'links_externos', 'fecha_scraping', 'ultima_actualizacion', 'id_instagram',
+)
+COLUMNAS_MEDIA = (
+    'id', 'username', 'url_media', 'tipo_media', 'subtipo_post', 'cantidad_likes',
+    'cantidad_comentarios', 'fecha_scraping', 'hash_contenido', 'ruta_archivo', 'estado_descarga',
+    'intentos_descarga', 'fecha_descarga', 'url_expira',
+)
+
+# Un usuario está pendiente si le faltan seguidores, seguidos o publicaciones, o quedó inactivo.
+# Debe coincidir con el WHERE del índice parcial idx_usuarios_pendientes (migraciones 002 y 005).
+PREDICADO_PENDIENTE = '''(cantidad_seguidores IS NULL
+           OR cantidad_seguidos IS NULL
+           OR cantidad_publicaciones IS NULL
+           OR perfil_inactivo = TRUE)'''
+
+# Un usuario es elegible si no tiene un reintento programado a futuro (backoff o caché negativa).
+# No puede ir en el WHERE del índice parcial (CURRENT_TIMESTAMP no es determinista), pero
+# proximo_intento es columna del índice y se filtra sin leer la tabla.
+PREDICADO_ELEGIBLE = '(proximo_intento IS NULL OR proximo_intento <= CURRENT_TIMESTAMP)'
+
+# Fallos que no se resuelven reintentando (el perfil no existe o cambió de nombre): van directo
+# a la caché negativa. El resto son transitorios y se reintentan con backoff exponencial.
+FALLOS_PERMANENTES = frozenset({'no_encontrado'})
+
+# Campos cuyos cambios se registran en la tabla 'cambios' (valores viejo y nuevo). Las marcas de
+# tiempo y el estado de descarga cambian en cada guardado y no son cambios del perfil.
+CAMPOS_CAMBIO_USUARIO = (
+    'perfil_inactivo', 'nombre_persona', 'categoria', 'perfil_privado', 'cantidad_publicaciones',
+    'cantidad_destacadas', 'cantidad_seguidores', 'cantidad_seguidos', 'biografia', 'links_externos',
+    'id_instagram',
+)
+CAMPOS_CAMBIO_MEDIA = ('url_media', 'tipo_media', 'subtipo_post', 'cantidad_likes', 'cantidad_comentarios')
+
+# Consulta del perfil -> columna con la fecha de su última respuesta correcta (migración 010)
+COLUMNAS_CONSULTA = {
+    'user': 'fecha_consulta_usuario',
+    'posts': 'fecha_consulta_posts',
+    'highlights': 'fecha_consulta_destacadas',
+}
+
+# Claves de paginación por orden (la última columna es única y desempata)
+ORDENES_USUARIOS = {
+    'username': ('username',),
+    'ultima_actualizacion': ('ultima_actualizacion', 'username'),
+    'fecha_scraping': ('fecha_scraping', 'username'),
+}
+
+# Orden de los pendientes existentes en CursorPendientes -> clave keyset (la última es única).
+# 'seguidores' recorre primero los perfiles nunca scrapeados (sin seguidores, escalón -1 de la
+# migración 012), después los de mayor escalón de seguidores (nivel_seguidores, migración 009), y
+# dentro de cada escalón los menos actualizados.
+ORDENES_PENDIENTES = {
+    'antiguedad': ('ultima_actualizacion', 'username'),
+    'seguidores': ('nivel_seguidores', 'ultima_actualizacion', 'username'),
+}
+
+def programar_reintento(tipo_fallo: str, intentos: int) -> Tuple[str, int]:
+    """
+    Decide el estado y la espera tras un fallo
+    
+    Args:
+        tipo_fallo (str): Tipo del fallo ('no_encontrado', 'timeout', 'http', 'consulta', ...)
+        intentos (int): Fallos consecutivos, incluido este
+        
+    Returns:
+        Tuple[str, int]: ('reintentar' | 'descartado', segundos hasta volver a ser elegible)
+    """
+    from config import SCRAPING_CONFIG
+    
+    if tipo_fallo in FALLOS_PERMANENTES or intentos > SCRAPING_CONFIG['max_retries']:
+        return 'descartado', SCRAPING_CONFIG['ttl_descartados']
+    espera = SCRAPING_CONFIG['backoff_base'] * 2 ** (intentos - 1)
+    return 'reintentar', min(espera, SCRAPING_CONFIG['backoff_max'])
+
+# Bases cuyo esquema ya se verificó en este proceso: ruta absoluta -> busqueda_disponible
+_ESQUEMAS_VERIFICADOS: Dict[str, bool] = {}
 
 # ==============================================================================
 # MÓDULO DE BASE DE DATOS PARA INSTAGRAM SCRAPER
@@ -17,13 +107,24 @@ class InstagramDatabase:
             db_path (str): Ruta al archivo de base de datos
         """
         self.db_path = db_path
-        self.init_database()
+        
+        # El DDL y las migraciones se verifican una vez por proceso y archivo
+        ruta = os.path.abspath(db_path)
+        if ruta in _ESQUEMAS_VERIFICADOS and os.path.exists(ruta):
+            self.busqueda_disponible = _ESQUEMAS_VERIFICADOS[ruta]
+        else:
+            self.init_database()
+            _ESQUEMAS_VERIFICADOS[ruta] = self.busqueda_disponible
     
     def init_database(self):
         """Crea las tablas si no existen"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
             
+            # Solo tiene efecto en bases nuevas; las existentes se convierten con un VACUUM
+            # (python retencion.py compactar --completo)
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            
             # Tabla de usuarios únicos
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS usuarios_unicos (
@@ -39,7 +140,8 @@ class InstagramDatabase:
                     biografia TEXT,
                     links_externos TEXT,
                     fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ultima_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    ultima_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    id_instagram TEXT
                 )
             ''')
             
@@ -54,17 +156,76 @@ class InstagramDatabase:
                     cantidad_likes INTEGER DEFAULT 0,
                     cantidad_comentarios INTEGER DEFAULT 0,
                     fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    hash_contenido TEXT,
+                    ruta_archivo TEXT,
+                    estado_descarga TEXT DEFAULT 'pendiente',
+                    intentos_descarga INTEGER DEFAULT 0,
+                    fecha_descarga TIMESTAMP,
+                    url_expira TIMESTAMP,
                     FOREIGN KEY (username) REFERENCES usuarios_unicos (username)
                 )
             ''')
             
-            # Índices para mejorar rendimiento
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_username ON media_urls(username)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_tipo ON media_urls(tipo_media)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_fecha ON usuarios_unicos(fecha_scraping)')
+            conn.commit()
+            
+            # Columnas e índices agregados después de la versión inicial (migraciones versionadas)
+            aplicar_migraciones(conn)
+            
+            # Índice de texto completo sobre nombre, biografía y categoría
+            self.busqueda_disponible = self._crear_indice_busqueda(cursor)
             
             conn.commit()
-            print(f"[+] Base de datos inicializada: {self.db_path}")
+            logger.debug(f"[+] Base de datos inicializada: {self.db_path}")
+    
+    def _crear_indice_busqueda(self, cursor) -> bool:
+        """
+        Crea la tabla FTS5 usuarios_fts (external content sobre usuarios_unicos) y los
+        triggers que la mantienen sincronizada. Si la tabla es nueva y ya hay usuarios
+        (base de datos existente), la indexa desde cero.
+        
+        Returns:
+            bool: False si SQLite no fue compilado con FTS5
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usuarios_fts'")
+        existia = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_fts USING fts5(
+                    username, nombre_persona, biografia, categoria,
+                    content='usuarios_unicos', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"[!] FTS5 no disponible en este SQLite, búsqueda de perfiles desactivada: {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS usuarios_fts_insert AFTER INSERT ON usuarios_unicos BEGIN
+                INSERT INTO usuarios_fts (rowid, username, nombre_persona, biografia, categoria)
+                VALUES (new.rowid, new.username, new.nombre_persona, new.biografia, new.categoria);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS usuarios_fts_delete AFTER DELETE ON usuarios_unicos BEGIN
+                INSERT INTO usuarios_fts (usuarios_fts, rowid, username, nombre_persona, biografia, categoria)
+                VALUES ('delete', old.rowid, old.username, old.nombre_persona, old.biografia, old.categoria);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS usuarios_fts_update
+            AFTER UPDATE OF username, nombre_persona, biografia, categoria ON usuarios_unicos BEGIN
+                INSERT INTO usuarios_fts (usuarios_fts, rowid, username, nombre_persona, biografia, categoria)
+                VALUES ('delete', old.rowid, old.username, old.nombre_persona, old.biografia, old.categoria);
+                INSERT INTO usuarios_fts (rowid, username, nombre_persona, biografia, categoria)
+                VALUES (new.rowid, new.username, new.nombre_persona, new.biografia, new.categoria);
+            END
+        ''')
+        
+        if not existia:
+            cursor.execute("INSERT INTO usuarios_fts (usuarios_fts) VALUES ('rebuild')")
+        return True
     
     def insertar_usuario(self, user_data: Dict) -> bool:
         """
@@ -78,45 +239,134 @@ class InstagramDatabase:
         """
         try:
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Determinar si el perfil está inactivo
-                perfil_inactivo = user_data.get('error') is not None
-                
-                # Preparar datos para inserción
-                username = user_data.get('username')
-                nombre_persona = user_data.get('full_name')
-                categoria = user_data.get('category') if user_data.get('is_business') else None
-                perfil_privado = user_data.get('is_private', False)
-                cantidad_publicaciones = user_data.get('media_count', 0)
-                cantidad_destacadas = len(user_data.get('highlights', []))
-                cantidad_seguidores = user_data.get('follower_count', 0)
-                cantidad_seguidos = user_data.get('following_count', 0)
-                biografia = user_data.get('biography')
-                links_externos = user_data.get('external_url')
-                
-                # INSERT OR REPLACE para actualizar si ya existe
-                cursor.execute('''
-                    INSERT OR REPLACE INTO usuarios_unicos (
-                        username, perfil_inactivo, nombre_persona, categoria,
-                        perfil_privado, cantidad_publicaciones, cantidad_destacadas,
-                        cantidad_seguidores, cantidad_seguidos, biografia, links_externos,
-                        ultima_actualizacion
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (
-                    username, perfil_inactivo, nombre_persona, categoria,
-                    perfil_privado, cantidad_publicaciones, cantidad_destacadas,
-                    cantidad_seguidores, cantidad_seguidos, biografia, links_externos
-                ))
-                
+                self._upsert_usuario(conn.cursor(), user_data)
                 conn.commit()
-                print(f"[+] Usuario '{username}' guardado en BD")
+                logger.debug(f"[+] Usuario '{user_data.get('username')}' guardado en BD")
                 return True
                 
         except Exception as e:
-            print(f"[!] Error insertando usuario {user_data.get('username', 'N/A')}: {e}")
+            logger.error(f"[!] Error insertando usuario {user_data.get('username', 'N/A')}: {e}")
+            return False
+    
+    def _upsert_usuario(self, cursor, user_data: Dict) -> None:
+        """
+        Inserta o actualiza un usuario con el cursor dado (sin commit)
+        
+        Si user_data trae 'error', el perfil queda inactivo y se programa el reintento según
+        user_data['tipo_fallo']; si no, se limpia el historial de fallos. Si la consulta de
+        highlights no se pidió o no respondió, se conserva cantidad_destacadas.
+        """
+        # Determinar si el perfil está inactivo
+        perfil_inactivo = user_data.get('error') is not None
+        
+        # Preparar datos para inserción
+        username = user_data.get('username')
+        nombre_persona = user_data.get('full_name')
+        categoria = user_data.get('category') if user_data.get('is_business') else None
+        perfil_privado = user_data.get('is_private', False)
+        cantidad_publicaciones = user_data.get('media_count', 0)
+        cantidad_destacadas = (len(user_data['highlights'])
+                               if _consultas_respondidas(user_data, ('highlights',)) else None)
+        cantidad_seguidores = user_data.get('follower_count', 0)
+        cantidad_seguidos = user_data.get('following_count', 0)
+        biografia = user_data.get('biography')
+        links_externos = user_data.get('external_url')
+        id_instagram = user_data.get('user_id') or user_data.get('pk')
+        
+        registrar_cambios = _registrar_cambios_activo()
+        if registrar_cambios:
+            antes = _campos_usuario(cursor, username)
+        
+        # UPSERT para actualizar si ya existe (conservando el id conocido). A diferencia de
+        # INSERT OR REPLACE, no borra la fila: mantiene el rowid y los triggers de usuarios_fts
+        cursor.execute('''
+            INSERT INTO usuarios_unicos (
+                username, perfil_inactivo, nombre_persona, categoria,
+                perfil_privado, cantidad_publicaciones, cantidad_destacadas,
+                cantidad_seguidores, cantidad_seguidos, biografia, links_externos,
+                ultima_actualizacion, id_instagram
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                perfil_inactivo = excluded.perfil_inactivo,
+                nombre_persona = excluded.nombre_persona,
+                categoria = excluded.categoria,
+                perfil_privado = excluded.perfil_privado,
+                cantidad_publicaciones = excluded.cantidad_publicaciones,
+                cantidad_destacadas = COALESCE(excluded.cantidad_destacadas, usuarios_unicos.cantidad_destacadas),
+                cantidad_seguidores = excluded.cantidad_seguidores,
+                cantidad_seguidos = excluded.cantidad_seguidos,
+                biografia = excluded.biografia,
+                links_externos = excluded.links_externos,
+                fecha_scraping = CURRENT_TIMESTAMP,
+                ultima_actualizacion = CURRENT_TIMESTAMP,
+                id_instagram = COALESCE(excluded.id_instagram, usuarios_unicos.id_instagram),
+                fecha_archivado = NULL
+        ''', (
+            username, perfil_inactivo, nombre_persona, categoria,
+            perfil_privado, cantidad_publicaciones, cantidad_destacadas,
+            cantidad_seguidores, cantidad_seguidos, biografia, links_externos,
+            id_instagram
+        ))
+        
+        if registrar_cambios:
+            campos = _diferencias(CAMPOS_CAMBIO_USUARIO, antes, _campos_usuario(cursor, username))
+            if campos:
+                _registrar_cambio(cursor, 'usuario', username, username,
+                                  'alta' if antes is None else 'modificacion', campos)
+        
+        _marcar_consultas(cursor, username, user_data, ('user',))
+        
+        if perfil_inactivo:
+            self._registrar_fallo(cursor, username, user_data.get('tipo_fallo') or 'desconocido')
+        else:
+            cursor.execute('''
+                UPDATE usuarios_unicos
+                SET tipo_fallo = NULL, intentos_fallidos = 0, proximo_intento = NULL, estado_fallo = NULL
+                WHERE username = ? AND tipo_fallo IS NOT NULL
+            ''', (username,))
+    
+    def registrar_fallo(self, username: str, tipo_fallo: str) -> bool:
+        """
+        Registra un fallo sin tocar los datos del perfil y programa el próximo intento
+        
+        Los fallos transitorios esperan backoff_base * 2^(intentos-1) segundos (hasta backoff_max);
+        los permanentes, o los transitorios que superan max_retries, quedan 'descartado' durante
+        ttl_descartados (caché negativa) y después vuelven a ser elegibles una vez más.
+        
+        Args:
+            username (str): Username del perfil
+            tipo_fallo (str): Tipo del fallo
+            
+        Returns:
+            bool: True si se registró correctamente
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                estado = self._registrar_fallo(conn.cursor(), username, tipo_fallo)
+                conn.commit()
+                logger.debug(f"[*] Fallo '{tipo_fallo}' registrado para '{username}' ({estado})")
+                return True
+        except Exception as e:
+            logger.error(f"[!] Error registrando fallo de {username}: {e}")
             return False
     
+    def _registrar_fallo(self, cursor, username: str, tipo_fallo: str) -> str:
+        """Incrementa los intentos fallidos y programa el reintento con el cursor dado (sin commit)"""
+        fila = cursor.execute('SELECT intentos_fallidos FROM usuarios_unicos WHERE username = ?',
+                              (username,)).fetchone()
+        intentos = ((fila[0] or 0) if fila else 0) + 1
+        estado, espera = programar_reintento(tipo_fallo, intentos)
+        cursor.execute('''
+            INSERT INTO usuarios_unicos (username, tipo_fallo, intentos_fallidos, proximo_intento, estado_fallo)
+            VALUES (?, ?, ?, datetime('now', ?), ?)
+            ON CONFLICT(username) DO UPDATE SET
+                tipo_fallo = excluded.tipo_fallo,
+                intentos_fallidos = excluded.intentos_fallidos,
+                proximo_intento = excluded.proximo_intento,
+                estado_fallo = excluded.estado_fallo
+        ''', (username, tipo_fallo, intentos, f'+{espera} seconds', estado))
+        return estado
+    
     def insertar_media_urls(self, username: str, user_data: Dict) -> bool:
         """
         Inserta las URLs de media (posts y destacadas) de un usuario
@@ -128,57 +378,266 @@ class InstagramDatabase:
         Returns:
             bool: True si se insertaron correctamente
         """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                self._reemplazar_media(conn.cursor(), username, user_data)
+                conn.commit()
+                logger.debug(f"[+] Media URLs de '{username}' guardadas: {len(user_data.get('posts', []))} posts, "
+                             f"{len(user_data.get('highlights', []))} destacadas")
+                return True
+                
+        except Exception as e:
+            logger.error(f"[!] Error insertando media URLs para {username}: {e}")
+            return False
+    
+    def _reemplazar_media(self, cursor, username: str, user_data: Dict) -> None:
+        """
+        Reemplaza la media de un usuario con el cursor dado (sin commit)
+        
+        Solo se reemplazan los tipos cuya consulta respondió en este scraping (clave en user_data
+        y fuera de 'consultas_fallidas'): la media de una consulta que no se pidió (todavía
+        vigente) o que falló se conserva tal cual.
+        """
+        respondidas = _consultas_respondidas(user_data, ('posts', 'highlights'))
+        tipos = [tipo for tipo, clave in (('post', 'posts'), ('destacada', 'highlights')) if clave in respondidas]
+        if not tipos:
+            return
+        filtro_tipos = f"tipo_media IN ({', '.join('?' * len(tipos))})"
+        
+        # Conservar el estado de descarga de archivos ya descargados: el CDN firma
+        # cada URL de nuevo en cada scraping, pero la ruta del recurso se mantiene
+        cursor.execute('''
+            SELECT url_media, hash_contenido, ruta_archivo, fecha_descarga
+            FROM media_urls
+            WHERE username = ? AND estado_descarga = 'descargado'
+        ''', (username,))
+        descargados = {
+            _ruta_recurso(url): (hash_contenido, ruta_archivo, fecha_descarga)
+            for url, hash_contenido, ruta_archivo, fecha_descarga in cursor.fetchall()
+        }
+        
+        registrar_cambios = _registrar_cambios_activo()
+        if registrar_cambios:
+            cursor.execute(f'''
+                SELECT id_externo, {', '.join(CAMPOS_CAMBIO_MEDIA)} FROM media_urls WHERE username = ?
+            ''', (username,))
+            previos = {_clave_media(fila[2], fila[0], fila[1]): fila[1:] for fila in cursor.fetchall()}
+        
+        # Limpiar media URLs anteriores del usuario (de los tipos consultados)
+        cursor.execute(f'DELETE FROM media_urls WHERE username = ? AND {filtro_tipos}', [username] + tipos)
+        
+        filas = []
+        
+        # Posts
+        for post in user_data['posts'] if 'posts' in respondidas else []:
+            thumbnail_url = post.get('thumbnail_url')
+            if thumbnail_url:
+                # Determinar subtipo (foto/reel/video)
+                subtipo = 'reel' if post.get('is_video') else 'foto'
+                filas.append((
+                    username, thumbnail_url, 'post', subtipo,
+                    post.get('like_count', 0), post.get('comment_count', 0), post.get('shortcode')
+                ))
+        
+        # Destacadas
+        for highlight in user_data['highlights'] if 'highlights' in respondidas else []:
+            thumbnail_url = highlight.get('thumbnail_url')
+            if thumbnail_url:
+                filas.append((username, thumbnail_url, 'destacada', None, 0, 0, highlight.get('id')))
+        
+        for fila in filas:
+            previo = descargados.get(_ruta_recurso(fila[1]))
+            if previo:
+                hash_contenido, ruta_archivo, fecha_descarga = previo
+                estado = 'descargado'
+            else:
+                hash_contenido = ruta_archivo = fecha_descarga = None
+                estado = 'pendiente'
+            
+            cursor.execute('''
+                INSERT INTO media_urls (
+                    username, url_media, tipo_media, subtipo_post,
+                    cantidad_likes, cantidad_comentarios, id_externo,
+                    hash_contenido, ruta_archivo, estado_descarga, fecha_descarga,
+                    url_expira
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', fila + (hash_contenido, ruta_archivo, estado, fecha_descarga, _expiracion_url(fila[1])))
+        
+        if registrar_cambios:
+            actuales = {_clave_media(fila[2], fila[6], fila[1]): fila[1:6] for fila in filas}
+            _registrar_cambios_media(cursor, username, previos, actuales, tipos)
+        
+        if 'posts' in respondidas:
+            self._reemplazar_posts(cursor, username, user_data['posts'])
+        _marcar_consultas(cursor, username, user_data, ('posts', 'highlights'))
+    
+    def _reemplazar_posts(self, cursor, username: str, posts: List[Dict]) -> None:
+        """Reemplaza el detalle de los posts de un usuario: recursos (carrusel) y variantes (sin commit)"""
+        cursor.execute('''
+            DELETE FROM variantes_recurso WHERE shortcode IN (SELECT shortcode FROM posts WHERE username = ?)
+        ''', (username,))
+        cursor.execute('''
+            DELETE FROM recursos_post WHERE shortcode IN (SELECT shortcode FROM posts WHERE username = ?)
+        ''', (username,))
+        cursor.execute('DELETE FROM posts WHERE username = ?', (username,))
+        
+        # Solo los posts extraídos con su detalle (los datos previos a esta extracción no lo traen).
+        # Un post colaborativo aparece en varios perfiles: su detalle se reescribe por shortcode
+        posts = [post for post in posts if post.get('shortcode') and post.get('recursos')]
+        shortcodes = [(post['shortcode'],) for post in posts]
+        cursor.executemany('DELETE FROM variantes_recurso WHERE shortcode = ?', shortcodes)
+        cursor.executemany('DELETE FROM recursos_post WHERE shortcode = ?', shortcodes)
+        cursor.executemany('''
+            INSERT OR REPLACE INTO posts (shortcode, username, id_post, tipo, texto, fecha_publicacion, cantidad_recursos)
+            VALUES (?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?)
+        ''', [
+            (post['shortcode'], username, post.get('id_post'), post.get('tipo'), post.get('texto'),
+             post.get('fecha_publicacion'), len(post['recursos']))
+            for post in posts
+        ])
+        cursor.executemany('''
+            INSERT OR REPLACE INTO recursos_post (shortcode, orden, id_recurso, es_video) VALUES (?, ?, ?, ?)
+        ''', [
+            (post['shortcode'], orden, recurso.get('id_recurso'), recurso.get('es_video', False))
+            for post in posts for orden, recurso in enumerate(post['recursos'])
+        ])
+        cursor.executemany('''
+            INSERT INTO variantes_recurso (shortcode, orden, tipo, ancho, alto, url, url_expira, seleccionada)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (post['shortcode'], orden, tipo, variante.get('ancho'), variante.get('alto'), variante['url'],
+             _expiracion_url(variante['url']), variante.get('seleccionada', False))
+            for post in posts for orden, recurso in enumerate(post['recursos'])
+            for tipo, clave in (('imagen', 'imagenes'), ('video', 'videos'))
+            for variante in recurso.get(clave, [])
+        ])
+    
+    def destacadas_sin_cambios(self, username: str, highlights: List[Dict]) -> set:
+        """
+        Ids de las destacadas cuyo contenido ya se obtuvo con el mismo título y la misma portada
+        
+        La portada se compara por la ruta del recurso (sin la firma del CDN, que cambia en cada
+        scraping), así que una destacada sin cambios no vuelve a pedirse.
+        
+        Args:
+            username (str): Username del perfil
+            highlights (List[Dict]): Destacadas del tray (id, title, thumbnail_url)
+        
+        Returns:
+            set: Ids que se pueden saltar
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                guardadas = {
+                    id_destacada: (titulo, ruta_portada)
+                    for id_destacada, titulo, ruta_portada in conn.execute(
+                        'SELECT id_destacada, titulo, ruta_portada FROM destacadas WHERE username = ?', (username,))
+                }
+        except Exception as e:
+            logger.error(f"[!] Error leyendo destacadas de {username}: {e}")
+            return set()
+        
+        return {
+            h['id'] for h in highlights
+            if h.get('id') in guardadas
+            and guardadas[h['id']] == (h.get('title'), _ruta_recurso(h.get('thumbnail_url') or ''))
+        }
+    
+    def guardar_contenido_destacadas(self, username: str, highlights: List[Dict],
+                                     contenido: Dict[str, List[Dict]]) -> int:
+        """
+        Guarda los items de las destacadas obtenidas y olvida las que ya no están en el perfil
+        
+        Args:
+            username (str): Username del perfil
+            highlights (List[Dict]): Todas las destacadas actuales del tray
+            contenido (Dict[str, List[Dict]]): Id de destacada -> items obtenidos (solo las pedidas)
+        
+        Returns:
+            int: Items guardados
+        """
+        por_id = {h['id']: h for h in highlights if h.get('id')}
+        guardados = 0
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                # Limpiar media URLs anteriores del usuario
-                cursor.execute('DELETE FROM media_urls WHERE username = ?', (username,))
-                
-                # Insertar posts
-                posts = user_data.get('posts', [])
-                for post in posts:
-                    thumbnail_url = post.get('thumbnail_url')
-                    if thumbnail_url:
-                        # Determinar subtipo (foto/reel/video)
-                        subtipo = 'reel' if post.get('is_video') else 'foto'
-                        
-                        cursor.execute('''
-                            INSERT INTO media_urls (
-                                username, url_media, tipo_media, subtipo_post,
-                                cantidad_likes, cantidad_comentarios
-                            ) VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            username, thumbnail_url, 'post', subtipo,
-                            post.get('like_count', 0), post.get('comment_count', 0)
-                        ))
-                
-                # Insertar destacadas
-                highlights = user_data.get('highlights', [])
-                for highlight in highlights:
-                    thumbnail_url = highlight.get('thumbnail_url')
-                    if thumbnail_url:
-                        cursor.execute('''
-                            INSERT INTO media_urls (
-                                username, url_media, tipo_media, subtipo_post,
-                                cantidad_likes, cantidad_comentarios
-                            ) VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            username, thumbnail_url, 'destacada', None, 0, 0
-                        ))
+                # Destacadas que el perfil ya no tiene
+                condicion = 'username = ?'
+                if por_id:
+                    condicion += f" AND id_destacada NOT IN ({', '.join('?' * len(por_id))})"
+                cursor.execute(f'''
+                    DELETE FROM items_destacadas WHERE id_destacada IN (
+                        SELECT id_destacada FROM destacadas WHERE {condicion})
+                ''', (username, *por_id))
+                cursor.execute(f'DELETE FROM destacadas WHERE {condicion}', (username, *por_id))
+                
+                for id_destacada, items in contenido.items():
+                    highlight = por_id.get(id_destacada, {})
+                    cursor.execute('''
+                        INSERT INTO destacadas (id_destacada, username, titulo, ruta_portada, cantidad_items)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(id_destacada) DO UPDATE SET
+                            titulo = excluded.titulo,
+                            ruta_portada = excluded.ruta_portada,
+                            cantidad_items = excluded.cantidad_items,
+                            fecha_contenido = CURRENT_TIMESTAMP
+                    ''', (id_destacada, username, highlight.get('title'),
+                          _ruta_recurso(highlight.get('thumbnail_url') or ''), len(items)))
+                    
+                    cursor.execute('DELETE FROM items_destacadas WHERE id_destacada = ?', (id_destacada,))
+                    cursor.executemany('''
+                        INSERT INTO items_destacadas (
+                            id_destacada, username, id_item, orden, subtipo,
+                            url_media, url_miniatura, fecha_publicacion, url_expira
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'), ?)
+                    ''', [
+                        (id_destacada, username, item['id_item'], orden, 'video' if item['es_video'] else 'foto',
+                         item['url_media'], item['url_miniatura'], item['fecha_publicacion'],
+                         _expiracion_url(item['url_media'] or ''))
+                        for orden, item in enumerate(items)
+                    ])
+                    guardados += len(items)
                 
                 conn.commit()
-                print(f"[+] Media URLs de '{username}' guardadas: {len(posts)} posts, {len(highlights)} destacadas")
-                return True
+                return guardados
+        
+        except Exception as e:
+            logger.error(f"[!] Error guardando contenido de destacadas de {username}: {e}")
+            return 0
+
+    def guardar_perfiles_lote(self, perfiles: Iterable[Tuple[Dict, bool]]) -> int:
+        """
+        Guarda varios perfiles en una sola transacción (para re-extracciones masivas)
+        
+        Args:
+            perfiles (Iterable[Tuple[Dict, bool]]): (user_data, reemplazar_media) por perfil
+            
+        Returns:
+            int: Perfiles guardados (0 si la transacción falló)
+        """
+        guardados = 0
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                for user_data, reemplazar_media in perfiles:
+                    self._upsert_usuario(cursor, user_data)
+                    if reemplazar_media:
+                        self._reemplazar_media(cursor, user_data['username'], user_data)
+                    guardados += 1
+                conn.commit()
+                return guardados
                 
         except Exception as e:
-            print(f"[!] Error insertando media URLs para {username}: {e}")
-            return False
+            logger.error(f"[!] Error guardando lote de perfiles: {e}")
+            return 0
     
     def obtener_usuarios_para_scrapear(self, force_rescrape: bool = False, limite: Optional[int] = None) -> List[str]:
         """
         Obtiene lista de usernames desde la base de datos para scrapear
         
+        Para backlogs grandes usar iterar_usuarios_pendientes, que no materializa la lista.
+        
         Args:
             force_rescrape (bool): Si True, incluye usuarios ya scrapeados
             limite (int, optional): Límite de usuarios a obtener
@@ -187,41 +646,145 @@ class InstagramDatabase:
             List[str]: Lista de usernames
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if force_rescrape:
-                    # Obtener todos los usuarios, priorizando los menos actualizados
-                    query = 'SELECT username FROM usuarios_unicos ORDER BY ultima_actualizacion ASC'
-                else:
-                    # Solo usuarios que NO están completamente scrapeados
-                    # Un usuario está completo si tiene seguidores, seguidos y publicaciones != NULL
-                    query = '''
-                        SELECT username FROM usuarios_unicos 
-                        WHERE cantidad_seguidores IS NULL 
-                           OR cantidad_seguidos IS NULL 
-                           OR cantidad_publicaciones IS NULL
-                           OR perfil_inactivo = TRUE
-                        ORDER BY ultima_actualizacion ASC
-                    '''
-                
-                if limite:
-                    query += f' LIMIT {limite}'
-                
-                cursor.execute(query)
-                usernames = [row[0] for row in cursor.fetchall()]
-                
-                if force_rescrape:
-                    print(f"[+] Obtenidos {len(usernames)} usuarios de la BD (incluyendo ya scrapeados)")
-                else:
-                    print(f"[+] Obtenidos {len(usernames)} usuarios pendientes de scrapear")
-                
-                return usernames
+            usernames = list(itertools.islice(self.iterar_usuarios_pendientes(force_rescrape), limite))
+            
+            if force_rescrape:
+                logger.debug(f"[+] Obtenidos {len(usernames)} usuarios de la BD (incluyendo ya scrapeados)")
+            else:
+                logger.debug(f"[+] Obtenidos {len(usernames)} usuarios pendientes de scrapear")
+            
+            return usernames
                 
         except Exception as e:
-            print(f"[!] Error obteniendo usuarios: {e}")
+            logger.error(f"[!] Error obteniendo usuarios: {e}")
             return []
     
+    def iterar_usuarios_pendientes(self, force_rescrape: bool = False, tamano_pagina: int = 500,
+                                   posicion: Optional[Dict] = None, orden: str = 'antiguedad') -> 'CursorPendientes':
+        """
+        Cursor por páginas sobre los usuarios pendientes (ver CursorPendientes)
+        
+        Args:
+            force_rescrape (bool): Si True, recorre todos los usuarios
+            tamano_pagina (int): Usernames leídos por consulta
+            posicion (Dict, optional): Posición guardada de un cursor anterior, para reanudar
+            orden (str): 'antiguedad' o 'seguidores' (ver ORDENES_PENDIENTES)
+            
+        Returns:
+            CursorPendientes: Iterable de usernames
+        """
+        return CursorPendientes(self.db_path, force_rescrape, tamano_pagina, posicion, orden)
+    
+    def iterar_consultas_vencidas(self, consulta: str, horas: Optional[float], tamano_pagina: int = 500,
+                                  posicion: Optional[Dict] = None) -> 'CursorConsultaVencida':
+        """
+        Cursor por páginas sobre los perfiles cuya consulta `consulta` venció (ver CursorConsultaVencida)
+        
+        Args:
+            consulta (str): 'user', 'posts' o 'highlights'
+            horas (float, optional): Intervalo de refresco de la consulta (None o 0 = todos los perfiles)
+            tamano_pagina (int): Usernames leídos por consulta
+            posicion (Dict, optional): Posición guardada de un cursor anterior, para reanudar
+            
+        Returns:
+            CursorConsultaVencida: Iterable de usernames
+        """
+        return CursorConsultaVencida(self.db_path, consulta, horas, tamano_pagina, posicion)
+    
+    def estado_consultas(self, username: str, horas: Dict[str, Optional[float]]) -> Tuple[Optional[str], set]:
+        """
+        Devuelve el id guardado de un perfil y qué consultas siguen vigentes según su intervalo
+        
+        Un perfil inactivo, o sin id_instagram, no tiene consultas vigentes.
+        
+        Args:
+            username (str): Username del perfil
+            horas (Dict[str, Optional[float]]): Consulta -> intervalo de refresco en horas (REFRESCO_CONFIG)
+            
+        Returns:
+            Tuple[Optional[str], set]: (id_instagram, consultas vigentes)
+        """
+        vigentes = [consulta for consulta in COLUMNAS_CONSULTA if horas.get(consulta)]
+        columnas = [f"{COLUMNAS_CONSULTA[consulta]} >= datetime('now', ?)" for consulta in vigentes]
+        with sqlite3.connect(self.db_path) as conn:
+            fila = conn.execute(f'''
+                SELECT id_instagram, perfil_inactivo{''.join(', ' + columna for columna in columnas)}
+                FROM usuarios_unicos WHERE username = ?
+            ''', [f'-{horas[consulta]} hours' for consulta in vigentes] + [username]).fetchone()
+        
+        if not fila or not fila[0] or fila[1]:
+            return (fila[0] if fila else None), set()
+        return fila[0], {consulta for consulta, vigente in zip(vigentes, fila[2:]) if vigente}
+    
+    def datos_usuario_guardados(self, username: str) -> Dict:
+        """
+        Datos guardados del perfil con las claves de extract_user_data, para completar un
+        scraping que no repitió la consulta de usuario
+        
+        Args:
+            username (str): Username del perfil
+            
+        Returns:
+            Dict: Datos del perfil ({} si no existe)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            fila = conn.execute('''
+                SELECT nombre_persona, categoria, perfil_privado, cantidad_publicaciones,
+                       cantidad_seguidores, cantidad_seguidos, biografia, links_externos
+                FROM usuarios_unicos WHERE username = ?
+            ''', (username,)).fetchone()
+        if not fila:
+            return {}
+        
+        nombre, categoria, privado, publicaciones, seguidores, seguidos, biografia, links = fila
+        # insertar_usuario solo guarda la categoría de las cuentas de negocio
+        return {
+            'full_name': nombre,
+            'category': categoria,
+            'is_business': categoria is not None,
+            'is_private': bool(privado),
+            'media_count': publicaciones,
+            'follower_count': seguidores,
+            'following_count': seguidos,
+            'biography': biografia,
+            'external_url': links,
+        }
+    
+    def obtener_posicion_batch(self, nombre: str) -> Optional[Dict]:
+        """Devuelve la posición de reanudación guardada de un batch (None si terminó o nunca se detuvo)"""
+        with sqlite3.connect(self.db_path) as conn:
+            fila = conn.execute('SELECT posicion FROM posiciones_batch WHERE nombre = ?', (nombre,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+    
+    def guardar_posicion_batch(self, nombre: str, posicion: Optional[Dict]) -> bool:
+        """
+        Guarda (o borra, si posicion es None) la posición de reanudación de un batch
+        
+        Args:
+            nombre (str): Nombre del batch ('pendientes', ...)
+            posicion (Dict, optional): Posición del cursor más la cola de reintentos
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                if posicion is None:
+                    conn.execute('DELETE FROM posiciones_batch WHERE nombre = ?', (nombre,))
+                else:
+                    conn.execute('''
+                        INSERT INTO posiciones_batch (nombre, posicion, fecha_actualizacion)
+                        VALUES (?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT(nombre) DO UPDATE SET
+                            posicion = excluded.posicion,
+                            fecha_actualizacion = excluded.fecha_actualizacion
+                    ''', (nombre, json.dumps(posicion)))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"[!] Error guardando la posición del batch '{nombre}': {e}")
+            return False
+    
     def verificar_usuario_completo(self, username: str) -> bool:
         """
         Verifica si un usuario ya está completamente scrapeado
@@ -262,7 +825,7 @@ class InstagramDatabase:
                 return completo
                 
         except Exception as e:
-            print(f"[!] Error verificando usuario {username}: {e}")
+            logger.error(f"[!] Error verificando usuario {username}: {e}")
             return False
     
     def obtener_estadisticas_scraping(self) -> Dict:
@@ -297,6 +860,14 @@ class InstagramDatabase:
                 cursor.execute('SELECT COUNT(*) FROM usuarios_unicos WHERE perfil_inactivo = TRUE')
                 usuarios_inactivos = cursor.fetchone()[0]
                 
+                # Fallos por estado: en backoff ('reintentar') y en caché negativa ('descartado')
+                cursor.execute('''
+                    SELECT estado_fallo, COUNT(*) FROM usuarios_unicos
+                    WHERE estado_fallo IS NOT NULL
+                    GROUP BY estado_fallo
+                ''')
+                fallos = dict(cursor.fetchall())
+                
                 # Progreso porcentual
                 progreso = (usuarios_completos / total_usuarios * 100) if total_usuarios > 0 else 0
                 
@@ -305,11 +876,13 @@ class InstagramDatabase:
                     'usuarios_completos': usuarios_completos,
                     'usuarios_pendientes': usuarios_pendientes,
                     'usuarios_inactivos': usuarios_inactivos,
+                    'usuarios_en_backoff': fallos.get('reintentar', 0),
+                    'usuarios_descartados': fallos.get('descartado', 0),
                     'progreso_porcentaje': round(progreso, 2)
                 }
                 
         except Exception as e:
-            print(f"[!] Error obteniendo estadísticas de scraping: {e}")
+            logger.error(f"[!] Error obteniendo estadísticas de scraping: {e}")
             return {}
     
     def agregar_usuarios_iniciales(self, usernames: List[str]) -> bool:
@@ -333,36 +906,272 @@ class InstagramDatabase:
                     ''', (username,))
                 
                 conn.commit()
-                print(f"[+] Agregados {len(usernames)} usuarios iniciales a la BD")
+                logger.debug(f"[+] Agregados {len(usernames)} usuarios iniciales a la BD")
                 return True
                 
         except Exception as e:
-            print(f"[!] Error agregando usuarios iniciales: {e}")
+            logger.error(f"[!] Error agregando usuarios iniciales: {e}")
             return False
     
-    def obtener_estadisticas(self) -> Dict:
+    def agregar_usuarios_masivo(self, usernames: Iterable[str], tamano_lote: int = 5000) -> Tuple[int, int]:
         """
-        Obtiene estadísticas de la base de datos
+        Agrega usuarios iniciales en lotes (una conexión, una transacción por lote)
+        
+        Args:
+            usernames (Iterable[str]): Usernames ya normalizados y sin duplicados
+            tamano_lote (int): Filas por executemany / commit
         
         Returns:
-            Dict: Estadísticas de usuarios y media
+            Tuple[int, int]: (agregados, ya_existian)
         """
+        agregados = 0
+        existentes = 0
+        
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
+                lote = []
                 
-                # Estadísticas de usuarios
-                cursor.execute('SELECT COUNT(*) FROM usuarios_unicos')
-                total_usuarios = cursor.fetchone()[0]
+                def insertar_lote():
+                    nonlocal agregados, existentes
+                    # rowcount no incluye las filas que escriben los triggers del índice FTS
+                    cursor.executemany('''
+                        INSERT OR IGNORE INTO usuarios_unicos (username, perfil_inactivo)
+                        VALUES (?, FALSE)
+                    ''', ((username,) for username in lote))
+                    conn.commit()
+                    nuevos = cursor.rowcount
+                    agregados += nuevos
+                    existentes += len(lote) - nuevos
+                    lote.clear()
                 
-                cursor.execute('SELECT COUNT(*) FROM usuarios_unicos WHERE perfil_inactivo = TRUE')
-                usuarios_inactivos = cursor.fetchone()[0]
+                for username in usernames:
+                    lote.append(username)
+                    if len(lote) >= tamano_lote:
+                        insertar_lote()
+                if lote:
+                    insertar_lote()
+        
+        except Exception as e:
+            logger.error(f"[!] Error en la carga masiva de usuarios: {e}")
+        
+        logger.debug(f"[+] Carga masiva: {agregados} agregados, {existentes} ya existían")
+        return agregados, existentes
+    
+    def obtener_media_pendiente_descarga(self, limite: int = 500, max_intentos: int = 3,
+                                         desde_id: int = 0) -> List[Tuple[int, str]]:
+        """
+        Obtiene filas de media cuyo archivo aún no se descargó
+        
+        Args:
+            limite (int): Máximo de filas a devolver
+            max_intentos (int): Filas con más intentos fallidos se omiten
+            desde_id (int): Devuelve solo filas con id mayor (paginación por lotes)
+            
+        Returns:
+            List[Tuple[int, str]]: Pares (id, url_media) ordenados por id
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, url_media FROM media_urls
+                    WHERE estado_descarga IN ('pendiente', 'error')
+                      AND intentos_descarga < ?
+                      AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (max_intentos, desde_id, limite))
+                return cursor.fetchall()
+                
+        except Exception as e:
+            logger.error(f"[!] Error obteniendo media pendiente de descarga: {e}")
+            return []
+    
+    def registrar_resultados_descarga(self, resultados: List[Dict]) -> bool:
+        """
+        Registra el resultado de un lote de descargas
+        
+        Args:
+            resultados (List[Dict]): Dicts con id, estado ('descargado'/'error'),
+                hash_contenido y ruta_archivo
+            
+        Returns:
+            bool: True si se registraron correctamente
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE media_urls
+                    SET estado_descarga = ?,
+                        hash_contenido = ?,
+                        ruta_archivo = ?,
+                        intentos_descarga = intentos_descarga + 1,
+                        fecha_descarga = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', [
+                    (r['estado'], r.get('hash_contenido'), r.get('ruta_archivo'), r['id'])
+                    for r in resultados
+                ])
+                conn.commit()
+                return True
+                
+        except Exception as e:
+            logger.error(f"[!] Error registrando resultados de descarga: {e}")
+            return False
+    
+    def obtener_perfiles_media_por_expirar(self, horas: float, limite: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        Obtiene los perfiles con URLs de media que expiran dentro del horizonte indicado
+        
+        Solo se devuelven perfiles con id_instagram conocido, para poder refrescar
+        posts/highlights sin volver a consultar web_profile_info ni la consulta de usuario.
+        
+        Args:
+            horas (float): Horizonte de expiración en horas desde ahora
+            limite (int, optional): Máximo de perfiles a devolver
+            
+        Returns:
+            List[Tuple[str, str]]: Pares (username, id_instagram), los que expiran antes primero
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                
+                query = '''
+                    SELECT m.username, u.id_instagram, MIN(m.url_expira) AS expira
+                    FROM media_urls m
+                    JOIN usuarios_unicos u ON u.username = m.username
+                    WHERE m.url_expira <= datetime('now', ?)
+                      AND u.id_instagram IS NOT NULL
+                    GROUP BY +m.username  -- '+': agrupar sin índice, para que filtre por rango de url_expira
+                    ORDER BY expira ASC
+                '''
+                parametros = [f'+{horas} hours']
+                if limite:
+                    query += ' LIMIT ?'
+                    parametros.append(limite)
+                
+                cursor.execute(query, parametros)
+                perfiles = [(username, id_instagram) for username, id_instagram, _ in cursor.fetchall()]
+                
+                logger.debug(f"[+] {len(perfiles)} perfiles con media por expirar en {horas}h")
+                return perfiles
+                
+        except Exception as e:
+            logger.error(f"[!] Error obteniendo media por expirar: {e}")
+            return []
+    
+    def buscar_perfiles(self, consulta: str, privado: Optional[bool] = None, negocio: Optional[bool] = None,
+                        min_seguidores: Optional[int] = None, max_seguidores: Optional[int] = None,
+                        limite: int = 20, pagina: int = 1, sintaxis_fts: bool = False) -> List[Dict]:
+        """
+        Busca perfiles por palabras clave en username, nombre, biografía y categoría
+        
+        Args:
+            consulta (str): Palabras a buscar (todas deben aparecer; se aceptan prefijos)
+            privado (bool, optional): Filtrar por perfiles privados / públicos
+            negocio (bool, optional): Filtrar por perfiles de negocio (con categoría) / personales
+            min_seguidores (int, optional): Seguidores mínimos
+            max_seguidores (int, optional): Seguidores máximos
+            limite (int): Resultados por página
+            pagina (int): Página (desde 1)
+            sintaxis_fts (bool): Si True, la consulta se pasa tal cual a FTS5 (OR, NEAR, "frases"...)
+            
+        Returns:
+            List[Dict]: Perfiles ordenados por relevancia (bm25), con un fragmento de la biografía
+        """
+        if not self.busqueda_disponible:
+            logger.warning("[!] Búsqueda no disponible: SQLite sin FTS5")
+            return []
+        
+        expresion = consulta if sintaxis_fts else _expresion_fts(consulta)
+        if not expresion:
+            return []
+        
+        condiciones = ['usuarios_fts MATCH ?']
+        parametros: List = [expresion]
+        if privado is not None:
+            condiciones.append('u.perfil_privado = ?')
+            parametros.append(privado)
+        if negocio is not None:
+            condiciones.append('u.categoria IS NOT NULL' if negocio else 'u.categoria IS NULL')
+        if min_seguidores is not None:
+            condiciones.append('u.cantidad_seguidores >= ?')
+            parametros.append(min_seguidores)
+        if max_seguidores is not None:
+            condiciones.append('u.cantidad_seguidores <= ?')
+            parametros.append(max_seguidores)
+        parametros.extend([limite, (max(pagina, 1) - 1) * limite])
+        
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                # Pesos bm25 por columna: username, nombre_persona, biografia, categoria
+                cursor.execute(f'''
+                    SELECT u.username, u.nombre_persona, u.categoria, u.perfil_privado,
+                           u.cantidad_seguidores,
+                           snippet(usuarios_fts, 2, '[', ']', '…', 12) AS fragmento_biografia,
+                           bm25(usuarios_fts, 4.0, 3.0, 1.0, 2.0) AS relevancia
+                    FROM usuarios_fts
+                    JOIN usuarios_unicos u ON u.rowid = usuarios_fts.rowid
+                    WHERE {' AND '.join(condiciones)}
+                    ORDER BY relevancia
+                    LIMIT ? OFFSET ?
+                ''', parametros)
+                return [dict(fila) for fila in cursor.fetchall()]
+                
+        except sqlite3.OperationalError as e:
+            logger.error(f"[!] Consulta de búsqueda inválida '{consulta}': {e}")
+            return []
+    
+    def reconstruir_indice_busqueda(self) -> bool:
+        """
+        Reconstruye usuarios_fts desde usuarios_unicos (por ejemplo, tras modificar la
+        tabla con herramientas externas que no disparan los triggers)
+        
+        Returns:
+            bool: True si se reconstruyó correctamente
+        """
+        if not self.busqueda_disponible:
+            logger.warning("[!] Búsqueda no disponible: SQLite sin FTS5")
+            return False
+        
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO usuarios_fts (usuarios_fts) VALUES ('rebuild')")
+                cursor.execute("INSERT INTO usuarios_fts (usuarios_fts) VALUES ('optimize')")
+                conn.commit()
+                logger.info("[+] Índice de búsqueda reconstruido")
+                return True
                 
-                cursor.execute('SELECT COUNT(*) FROM usuarios_unicos WHERE perfil_privado = TRUE')
-                usuarios_privados = cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"[!] Error reconstruyendo índice de búsqueda: {e}")
+            return False
+    
+    def obtener_estadisticas(self) -> Dict:
+        """
+        Obtiene estadísticas de la base de datos
+        
+        Returns:
+            Dict: Estadísticas de usuarios y media
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
                 
-                cursor.execute('SELECT COUNT(*) FROM usuarios_unicos WHERE categoria IS NOT NULL')
-                usuarios_negocio = cursor.fetchone()[0]
+                # Estadísticas de usuarios (una pasada sobre idx_usuarios_estadisticas)
+                cursor.execute('''
+                    SELECT COUNT(*),
+                           COALESCE(SUM(perfil_inactivo = TRUE), 0),
+                           COALESCE(SUM(perfil_privado = TRUE), 0),
+                           COUNT(categoria)
+                    FROM usuarios_unicos
+                ''')
+                total_usuarios, usuarios_inactivos, usuarios_privados, usuarios_negocio = cursor.fetchone()
                 
                 # Estadísticas de media
                 cursor.execute('SELECT COUNT(*) FROM media_urls')
@@ -386,26 +1195,29 @@ class InstagramDatabase:
                 }
                 
         except Exception as e:
-            print(f"[!] Error obteniendo estadísticas: {e}")
+            logger.error(f"[!] Error obteniendo estadísticas: {e}")
             return {}
     
-    def exportar_a_csv(self) -> bool:
+    def exportar_a_csv(self, archivo: Optional[str] = None) -> bool:
         """
         Exporta los datos a archivos CSV si está configurado
         
+        Args:
+            archivo (str, optional): Archivo destino; si se indica, exporta aunque save_csv esté desactivado
+        
         Returns:
             bool: True si se exportó correctamente o no era necesario
         """
         from config import OUTPUT_CONFIG
         
-        if not OUTPUT_CONFIG.get('save_csv', False):
-            print("[*] Exportación CSV deshabilitada en config")
+        if archivo is None and not OUTPUT_CONFIG.get('save_csv', False):
+            logger.info("[*] Exportación CSV deshabilitada en config")
             return True
         
         try:
             import csv
             
-            archivo_usuarios = OUTPUT_CONFIG.get('csv_file', 'usuarios_export.csv')
+            archivo_usuarios = archivo or OUTPUT_CONFIG.get('csv_file', 'usuarios_export.csv')
             
             with sqlite3.connect(self.db_path) as conn:
                 # Exportar usuarios
@@ -416,20 +1228,239 @@ class InstagramDatabase:
                     writer = csv.writer(csvfile)
                     # Headers
                     writer.writerow([description[0] for description in cursor.description])
-                    # Datos
-                    writer.writerows(cursor.fetchall())
+                    # Datos (iterando el cursor, sin cargar la tabla en memoria)
+                    writer.writerows(cursor)
                 
-                print(f"[+] Datos exportados a {archivo_usuarios}")
+                logger.info(f"[+] Datos exportados a {archivo_usuarios}")
                 return True
                 
         except Exception as e:
-            print(f"[!] Error exportando a CSV: {e}")
+            logger.error(f"[!] Error exportando a CSV: {e}")
+            return False
+    
+    def _iterar_keyset(self, tabla: str, columnas_validas: tuple, columnas: Optional[List[str]],
+                       claves: tuple, descendente: bool, condiciones: List[str], parametros: List,
+                       tamano_pagina: int, limite: Optional[int]) -> Iterator[Dict]:
+        """
+        Recorre una tabla por páginas con paginación keyset: cada página continúa desde la
+        última clave vista (WHERE (claves) > (...)), sin OFFSET ni cargar la tabla completa.
+        
+        Args:
+            tabla (str): Tabla a recorrer
+            columnas_validas (tuple): Columnas permitidas en la proyección
+            columnas (List[str], optional): Columnas a devolver (None = todas)
+            claves (tuple): Columnas de orden; la última debe ser única
+            descendente (bool): Orden descendente
+            condiciones (List[str]): Filtros SQL adicionales
+            parametros (List): Parámetros de los filtros
+            tamano_pagina (int): Filas leídas por consulta
+            limite (int, optional): Máximo de filas a devolver
+            
+        Yields:
+            Dict: Una fila por elemento
+        """
+        columnas = list(columnas or columnas_validas)
+        invalidas = [c for c in columnas if c not in columnas_validas]
+        if invalidas:
+            raise ValueError(f"Columnas desconocidas en {tabla}: {', '.join(invalidas)}")
+        
+        # Las claves de orden se leen siempre para poder continuar, aunque no se proyecten
+        seleccion = columnas + [c for c in claves if c not in columnas]
+        direccion = 'DESC' if descendente else 'ASC'
+        comparador = '<' if descendente else '>'
+        lista_claves = ', '.join(claves)
+        continuar = f"({lista_claves}) {comparador} ({', '.join('?' * len(claves))})"
+        
+        entregadas = 0
+        ultima_clave = None
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            while limite is None or entregadas < limite:
+                filtros = list(condiciones)
+                valores = list(parametros)
+                if ultima_clave is not None:
+                    filtros.append(continuar)
+                    valores.extend(ultima_clave)
+                where = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+                pagina = tamano_pagina if limite is None else min(tamano_pagina, limite - entregadas)
+                
+                filas = conn.execute(f'''
+                    SELECT {', '.join(seleccion)} FROM {tabla}
+                    {where}
+                    ORDER BY {', '.join(f'{c} {direccion}' for c in claves)}
+                    LIMIT ?
+                ''', valores + [pagina]).fetchall()
+                if not filas:
+                    break
+                
+                for fila in filas:
+                    yield {c: fila[c] for c in columnas}
+                entregadas += len(filas)
+                ultima_clave = tuple(filas[-1][c] for c in claves)
+                if len(filas) < pagina:
+                    break
+        finally:
+            conn.close()
+    
+    def iterar_usuarios(self, columnas: Optional[List[str]] = None, orden: str = 'username',
+                        descendente: bool = False, privado: Optional[bool] = None,
+                        inactivo: Optional[bool] = None, negocio: Optional[bool] = None,
+                        min_seguidores: Optional[int] = None, max_seguidores: Optional[int] = None,
+                        actualizado_desde: Optional[str] = None, tamano_pagina: int = 1000,
+                        limite: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Itera usuarios en memoria constante (paginación keyset)
+        
+        Args:
+            columnas (List[str], optional): Columnas a devolver (ver COLUMNAS_USUARIOS)
+            orden (str): 'username', 'ultima_actualizacion' o 'fecha_scraping'
+            descendente (bool): Orden descendente
+            privado (bool, optional): Filtrar por perfil_privado
+            inactivo (bool, optional): Filtrar por perfil_inactivo
+            negocio (bool, optional): Filtrar por perfiles con / sin categoría
+            min_seguidores (int, optional): Seguidores mínimos
+            max_seguidores (int, optional): Seguidores máximos
+            actualizado_desde (str, optional): Solo filas con ultima_actualizacion >= 'YYYY-MM-DD HH:MM:SS'
+            tamano_pagina (int): Filas leídas por consulta
+            limite (int, optional): Máximo de usuarios a devolver
+            
+        Yields:
+            Dict: Un usuario por elemento
+        """
+        if orden not in ORDENES_USUARIOS:
+            raise ValueError(f"Orden desconocido: {orden} (opciones: {', '.join(ORDENES_USUARIOS)})")
+        
+        condiciones = []
+        parametros = []
+        if privado is not None:
+            condiciones.append('perfil_privado = ?')
+            parametros.append(privado)
+        if inactivo is not None:
+            condiciones.append('perfil_inactivo = ?')
+            parametros.append(inactivo)
+        if negocio is not None:
+            condiciones.append('categoria IS NOT NULL' if negocio else 'categoria IS NULL')
+        if min_seguidores is not None:
+            condiciones.append('cantidad_seguidores >= ?')
+            parametros.append(min_seguidores)
+        if max_seguidores is not None:
+            condiciones.append('cantidad_seguidores <= ?')
+            parametros.append(max_seguidores)
+        if actualizado_desde is not None:
+            condiciones.append('ultima_actualizacion >= ?')
+            parametros.append(actualizado_desde)
+        
+        return self._iterar_keyset('usuarios_unicos', COLUMNAS_USUARIOS, columnas, ORDENES_USUARIOS[orden],
+                                   descendente, condiciones, parametros, tamano_pagina, limite)
+    
+    def iterar_media(self, columnas: Optional[List[str]] = None, username: Optional[str] = None,
+                     tipo_media: Optional[str] = None, estado_descarga: Optional[str] = None,
+                     descendente: bool = False, tamano_pagina: int = 1000,
+                     limite: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Itera filas de media_urls en memoria constante (paginación keyset por id)
+        
+        Args:
+            columnas (List[str], optional): Columnas a devolver (ver COLUMNAS_MEDIA)
+            username (str, optional): Solo la media de este usuario
+            tipo_media (str, optional): 'post' o 'destacada'
+            estado_descarga (str, optional): 'pendiente', 'descargado' o 'error'
+            descendente (bool): Orden descendente (más recientes primero)
+            tamano_pagina (int): Filas leídas por consulta
+            limite (int, optional): Máximo de filas a devolver
+            
+        Yields:
+            Dict: Una fila de media por elemento
+        """
+        condiciones = []
+        parametros = []
+        if username is not None:
+            condiciones.append('username = ?')
+            parametros.append(username)
+        if tipo_media is not None:
+            condiciones.append('tipo_media = ?')
+            parametros.append(tipo_media)
+        if estado_descarga is not None:
+            condiciones.append('estado_descarga = ?')
+            parametros.append(estado_descarga)
+        
+        return self._iterar_keyset('media_urls', COLUMNAS_MEDIA, columnas, ('id',),
+                                   descendente, condiciones, parametros, tamano_pagina, limite)
+    
+    def leer_cambios(self, desde: int = 0, limite: int = 1000, entidad: Optional[str] = None) -> List[Dict]:
+        """
+        Lee eventos del registro de cambios posteriores a un seq (paginación por la clave primaria)
+        
+        Args:
+            desde (int): Último seq ya procesado (0 = desde el principio)
+            limite (int): Máximo de eventos a devolver
+            entidad (str, optional): 'usuario' o 'media'
+            
+        Returns:
+            List[Dict]: Eventos en orden de seq, con 'campos' ya decodificado
+        """
+        condiciones = ['seq > ?']
+        parametros = [desde]
+        if entidad is not None:
+            condiciones.append('entidad = ?')
+            parametros.append(entidad)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            filas = conn.execute(f'''
+                SELECT seq, fecha, entidad, username, clave, operacion, campos FROM cambios
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY seq
+                LIMIT ?
+            ''', parametros + [limite]).fetchall()
+        
+        eventos = []
+        for fila in filas:
+            evento = dict(fila)
+            evento['campos'] = json.loads(evento['campos'])
+            eventos.append(evento)
+        return eventos
+    
+    def obtener_offset_consumidor(self, consumidor: str) -> int:
+        """Devuelve el último seq confirmado por un consumidor del registro de cambios (0 si es nuevo)"""
+        with sqlite3.connect(self.db_path) as conn:
+            fila = conn.execute('SELECT seq FROM consumidores_cambios WHERE consumidor = ?',
+                                (consumidor,)).fetchone()
+        return fila[0] if fila else 0
+    
+    def guardar_offset_consumidor(self, consumidor: str, seq: int) -> bool:
+        """
+        Confirma hasta qué seq procesó un consumidor
+        
+        Args:
+            consumidor (str): Nombre del consumidor
+            seq (int): Último seq procesado
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('''
+                    INSERT INTO consumidores_cambios (consumidor, seq, fecha_actualizacion)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(consumidor) DO UPDATE SET
+                        seq = excluded.seq,
+                        fecha_actualizacion = excluded.fecha_actualizacion
+                ''', (consumidor, seq))
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"[!] Error guardando el offset de '{consumidor}': {e}")
             return False
     
     def obtener_todos_los_datos(self, incluir_media: bool = True) -> Dict:
         """
         Obtiene TODOS los datos de la base de datos para testing
         
+        Para recorrer tablas grandes sin cargarlas en memoria usar iterar_usuarios / iterar_media.
+        
         Args:
             incluir_media (bool): Si incluir las URLs de media o solo usuarios
             
@@ -437,52 +1468,25 @@ class InstagramDatabase:
             Dict: Todos los datos de la base de datos
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Obtener todos los usuarios
-                cursor.execute('SELECT * FROM usuarios_unicos ORDER BY fecha_scraping DESC')
-                usuarios_raw = cursor.fetchall()
-                
-                # Obtener nombres de columnas para usuarios
-                cursor.execute('PRAGMA table_info(usuarios_unicos)')
-                columnas_usuarios = [col[1] for col in cursor.fetchall()]
-                
-                # Convertir usuarios a diccionarios
-                usuarios = []
-                for usuario_raw in usuarios_raw:
-                    usuario_dict = dict(zip(columnas_usuarios, usuario_raw))
-                    usuarios.append(usuario_dict)
-                
-                resultado = {
-                    'total_usuarios': len(usuarios),
-                    'usuarios': usuarios,
-                    'timestamp_consulta': datetime.now().isoformat()
-                }
-                
-                # Incluir media si se solicita
-                if incluir_media:
-                    cursor.execute('SELECT * FROM media_urls ORDER BY fecha_scraping DESC')
-                    media_raw = cursor.fetchall()
-                    
-                    # Obtener nombres de columnas para media
-                    cursor.execute('PRAGMA table_info(media_urls)')
-                    columnas_media = [col[1] for col in cursor.fetchall()]
-                    
-                    # Convertir media a diccionarios
-                    media = []
-                    for media_item_raw in media_raw:
-                        media_dict = dict(zip(columnas_media, media_item_raw))
-                        media.append(media_dict)
-                    
-                    resultado['total_media'] = len(media)
-                    resultado['media_urls'] = media
-                
-                print(f"[+] Obtenidos {len(usuarios)} usuarios y {len(media) if incluir_media else 0} elementos de media")
-                return resultado
-                
+            usuarios = list(self.iterar_usuarios(orden='fecha_scraping', descendente=True))
+            
+            resultado = {
+                'total_usuarios': len(usuarios),
+                'usuarios': usuarios,
+                'timestamp_consulta': datetime.now().isoformat()
+            }
+            
+            # Incluir media si se solicita
+            if incluir_media:
+                media = list(self.iterar_media(descendente=True))
+                resultado['total_media'] = len(media)
+                resultado['media_urls'] = media
+            
+            logger.debug(f"[+] Obtenidos {len(usuarios)} usuarios y {resultado.get('total_media', 0)} elementos de media")
+            return resultado
+            
         except Exception as e:
-            print(f"[!] Error obteniendo todos los datos: {e}")
+            logger.error(f"[!] Error obteniendo todos los datos: {e}")
             return {}
     
     def obtener_usuario_especifico(self, username: str, incluir_media: bool = True) -> Dict:
@@ -498,51 +1502,31 @@ class InstagramDatabase:
         """
         try:
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Obtener datos del usuario
-                cursor.execute('SELECT * FROM usuarios_unicos WHERE username = ?', (username,))
-                usuario_raw = cursor.fetchone()
-                
-                if not usuario_raw:
-                    print(f"[!] Usuario '{username}' no encontrado en la BD")
-                    return {}
-                
-                # Obtener nombres de columnas para usuarios
-                cursor.execute('PRAGMA table_info(usuarios_unicos)')
-                columnas_usuarios = [col[1] for col in cursor.fetchall()]
-                
-                # Convertir a diccionario
-                usuario_dict = dict(zip(columnas_usuarios, usuario_raw))
-                
-                resultado = {
-                    'usuario': usuario_dict,
-                    'timestamp_consulta': datetime.now().isoformat()
-                }
-                
-                # Incluir media si se solicita
-                if incluir_media:
-                    cursor.execute('SELECT * FROM media_urls WHERE username = ? ORDER BY fecha_scraping DESC', (username,))
-                    media_raw = cursor.fetchall()
-                    
-                    # Obtener nombres de columnas para media
-                    cursor.execute('PRAGMA table_info(media_urls)')
-                    columnas_media = [col[1] for col in cursor.fetchall()]
-                    
-                    # Convertir media a diccionarios
-                    media = []
-                    for media_item_raw in media_raw:
-                        media_dict = dict(zip(columnas_media, media_item_raw))
-                        media.append(media_dict)
-                    
-                    resultado['total_media'] = len(media)
-                    resultado['media_urls'] = media
-                
-                print(f"[+] Obtenidos datos completos de '{username}': {len(media) if incluir_media else 0} elementos de media")
-                return resultado
-                
+                conn.row_factory = sqlite3.Row
+                fila = conn.execute(
+                    f"SELECT {', '.join(COLUMNAS_USUARIOS)} FROM usuarios_unicos WHERE username = ?", (username,)
+                ).fetchone()
+            
+            if not fila:
+                logger.warning(f"[!] Usuario '{username}' no encontrado en la BD")
+                return {}
+            
+            resultado = {
+                'usuario': dict(fila),
+                'timestamp_consulta': datetime.now().isoformat()
+            }
+            
+            # Incluir media si se solicita
+            if incluir_media:
+                media = list(self.iterar_media(username=username, descendente=True))
+                resultado['total_media'] = len(media)
+                resultado['media_urls'] = media
+            
+            logger.debug(f"[+] Obtenidos datos completos de '{username}': {resultado.get('total_media', 0)} elementos de media")
+            return resultado
+            
         except Exception as e:
-            print(f"[!] Error obteniendo datos de {username}: {e}")
+            logger.error(f"[!] Error obteniendo datos de {username}: {e}")
             return {}
     
     def exportar_datos_completos_json(self, archivo: str = "datos_completos.json") -> bool:
@@ -561,14 +1545,14 @@ class InstagramDatabase:
             with open(archivo, 'w', encoding='utf-8') as f:
                 json.dump(datos_completos, f, indent=2, ensure_ascii=False, default=str)
             
-            print(f"[+] Datos completos exportados a {archivo}")
-            print(f"    - {datos_completos.get('total_usuarios', 0)} usuarios")
-            print(f"    - {datos_completos.get('total_media', 0)} elementos de media")
+            logger.info(f"[+] Datos completos exportados a {archivo}")
+            logger.info(f"    - {datos_completos.get('total_usuarios', 0)} usuarios")
+            logger.info(f"    - {datos_completos.get('total_media', 0)} elementos de media")
             
             return True
             
         except Exception as e:
-            print(f"[!] Error exportando datos completos: {e}")
+            logger.error(f"[!] Error exportando datos completos: {e}")
             return False
 
     def limpiar_base_datos(self) -> bool:
@@ -585,17 +1569,319 @@ class InstagramDatabase:
                 cursor.execute('DELETE FROM usuarios_unicos')
                 conn.commit()
                 
-                print("[+] Base de datos limpiada completamente")
+                logger.info("[+] Base de datos limpiada completamente")
                 return True
                 
         except Exception as e:
-            print(f"[!] Error limpiando base de datos: {e}")
+            logger.error(f"[!] Error limpiando base de datos: {e}")
             return False
 
+# ==============================================================================
+# CURSOR DE USUARIOS PENDIENTES
+# ==============================================================================
+
+class CursorPendientes:
+    """
+    Recorre los usuarios pendientes por páginas, sin materializar el backlog
+    
+    Fase 1: pendientes que existían al empezar, de menos a más actualizados, con paginación
+    keyset sobre (ultima_actualizacion, username) acotada a ultima_actualizacion < inicio.
+    Un perfil procesado pasa a tener ultima_actualizacion >= inicio, así que no se repite
+    aunque siga pendiente (por ejemplo, si quedó inactivo).
+    
+    Fase 2: usuarios agregados durante la ejecución (rowid mayor que el máximo al empezar),
+    en orden de inserción, hasta que una página vuelve vacía.
+    
+    `posicion` es un dict serializable a JSON; pasarlo a un cursor nuevo reanuda el recorrido
+    (incluye el orden y el modo con que se creó, que prevalecen sobre los argumentos).
+    
+    El orden de la fase 1 sale de ORDENES_PENDIENTES: por antigüedad, o primero los perfiles
+    de más seguidores.
+    
+    En ambas fases se omiten los perfiles con proximo_intento a futuro (backoff o descartados).
+    """
+    
+    def __init__(self, db_path: str, force_rescrape: bool = False, tamano_pagina: int = 500,
+                 posicion: Optional[Dict] = None, orden: str = 'antiguedad'):
+        self.db_path = db_path
+        self.tamano_pagina = tamano_pagina
+        self.posicion = dict(posicion) if posicion else None
+        if self.posicion:
+            force_rescrape = self.posicion.get('force_rescrape', force_rescrape)
+            orden = self.posicion.get('orden', orden)
+        if orden not in ORDENES_PENDIENTES:
+            raise ValueError(f"Orden inválido: {orden} (válidos: {', '.join(ORDENES_PENDIENTES)})")
+        self.force_rescrape = force_rescrape
+        self.orden = orden
+        self.clave = ORDENES_PENDIENTES[orden]
+        # Los perfiles en backoff o en caché negativa se saltan incluso con force_rescrape
+        self.filtro = PREDICADO_ELEGIBLE if force_rescrape else f'{PREDICADO_PENDIENTE} AND {PREDICADO_ELEGIBLE}'
+    
+    def _iniciar(self, conn: sqlite3.Connection) -> None:
+        # ultima_actualizacion tiene resolución de segundos: se empieza en un segundo nuevo para
+        # que todo lo escrito antes quede < inicio y todo lo que se procese después, >= inicio
+        time.sleep(1.01 - time.time() % 1)
+        inicio, rowid_inicial = conn.execute(
+            'SELECT CURRENT_TIMESTAMP, COALESCE(MAX(rowid), 0) FROM usuarios_unicos'
+        ).fetchone()
+        self.posicion = {
+            'fase': 1,
+            'orden': self.orden,
+            'force_rescrape': self.force_rescrape,
+            'inicio': inicio,
+            'rowid_inicial': rowid_inicial,
+            'ultima_clave': None,
+            'ultimo_rowid': rowid_inicial,
+        }
+    
+    def _condiciones_existentes(self) -> Tuple[List[str], List]:
+        condiciones = [self.filtro, 'ultima_actualizacion < ?']
+        parametros = [self.posicion['inicio']]
+        if self.posicion['ultima_clave']:
+            condiciones.append(f"({', '.join(self.clave)}) > ({', '.join('?' * len(self.clave))})")
+            parametros.extend(self.posicion['ultima_clave'])
+        return condiciones, parametros
+    
+    def consulta_pagina(self) -> Tuple[str, List]:
+        """SQL y parámetros de la próxima página de la fase 1 (también para verificar su plan)"""
+        condiciones, parametros = self._condiciones_existentes()
+        return f'''
+            SELECT {', '.join(self.clave)} FROM usuarios_unicos
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY {', '.join(self.clave)}
+            LIMIT ?
+        ''', parametros + [self.tamano_pagina]
+    
+    def _pagina_existentes(self, conn: sqlite3.Connection) -> List[tuple]:
+        return conn.execute(*self.consulta_pagina()).fetchall()
+    
+    def _pagina_nuevos(self, conn: sqlite3.Connection) -> List[Tuple[int, str]]:
+        return conn.execute(f'''
+            SELECT rowid, username FROM usuarios_unicos
+            WHERE rowid > ? AND {self.filtro}
+            ORDER BY rowid
+            LIMIT ?
+        ''', (self.posicion['ultimo_rowid'], self.tamano_pagina)).fetchall()
+    
+    def __iter__(self) -> Iterator[str]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if self.posicion is None:
+                self._iniciar(conn)
+            
+            # La posición avanza con cada username entregado, no por página
+            while self.posicion['fase'] == 1:
+                pagina = self._pagina_existentes(conn)
+                for clave in pagina:
+                    self.posicion['ultima_clave'] = list(clave)
+                    yield clave[-1]
+                if len(pagina) < self.tamano_pagina:
+                    self.posicion['fase'] = 2
+            
+            while True:
+                pagina = self._pagina_nuevos(conn)
+                if not pagina:
+                    break
+                for rowid, username in pagina:
+                    self.posicion['ultimo_rowid'] = rowid
+                    yield username
+        finally:
+            conn.close()
+    
+    def contar(self) -> int:
+        """Pendientes por recorrer en este momento (para mostrar progreso)"""
+        with sqlite3.connect(self.db_path) as conn:
+            if self.posicion is None:
+                return conn.execute(f'SELECT COUNT(*) FROM usuarios_unicos WHERE {self.filtro}').fetchone()[0]
+            
+            nuevos = conn.execute(f'SELECT COUNT(*) FROM usuarios_unicos WHERE rowid > ? AND {self.filtro}',
+                                  (self.posicion['ultimo_rowid'],)).fetchone()[0]
+            if self.posicion['fase'] == 2:
+                return nuevos
+            
+            condiciones, parametros = self._condiciones_existentes()
+            existentes = conn.execute(f"SELECT COUNT(*) FROM usuarios_unicos WHERE {' AND '.join(condiciones)}",
+                                      parametros).fetchone()[0]
+            return existentes + nuevos
+
+class CursorConsultaVencida:
+    """
+    Recorre los perfiles con una consulta vencida, de la respuesta más vieja a la más nueva
+    
+    Solo perfiles activos con id_instagram (la consulta se repite con el id guardado) y
+    elegibles (sin reintento programado a futuro). El corte se fija al empezar: un perfil
+    procesado pasa a tener la fecha de la consulta posterior al corte y no se repite. La
+    paginación es keyset sobre (fecha de la consulta, username) con el índice parcial de
+    la migración 010.
+    
+    `posicion` es un dict serializable a JSON; pasarlo a un cursor nuevo reanuda el recorrido.
+    """
+    
+    def __init__(self, db_path: str, consulta: str, horas: Optional[float], tamano_pagina: int = 500,
+                 posicion: Optional[Dict] = None):
+        if consulta not in COLUMNAS_CONSULTA:
+            raise ValueError(f"Consulta inválida: {consulta} (válidas: {', '.join(COLUMNAS_CONSULTA)})")
+        self.db_path = db_path
+        self.consulta = consulta
+        self.horas = horas or 0
+        self.tamano_pagina = tamano_pagina
+        self.posicion = dict(posicion) if posicion else None
+        self.columna = COLUMNAS_CONSULTA[consulta]
+        # `NOT perfil_inactivo` (y no `= FALSE`) repite el predicado del índice parcial y evita que
+        # el planner prefiera idx_usuarios_estadisticas por la igualdad sobre perfil_inactivo
+        self.filtro = f'id_instagram IS NOT NULL AND NOT perfil_inactivo AND {PREDICADO_ELEGIBLE}'
+    
+    def _condiciones(self) -> Tuple[List[str], List]:
+        condiciones = [self.filtro, f'{self.columna} < ?']
+        parametros = [self.posicion['corte']]
+        if self.posicion['ultima_clave']:
+            condiciones.append(f'({self.columna}, username) > (?, ?)')
+            parametros.extend(self.posicion['ultima_clave'])
+        return condiciones, parametros
+    
+    def consulta_pagina(self) -> Tuple[str, List]:
+        """SQL y parámetros de la próxima página (también para verificar su plan)"""
+        condiciones, parametros = self._condiciones()
+        return f'''
+            SELECT {self.columna}, username FROM usuarios_unicos
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY {self.columna}, username
+            LIMIT ?
+        ''', parametros + [self.tamano_pagina]
+    
+    def __iter__(self) -> Iterator[str]:
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if self.posicion is None:
+                corte = conn.execute("SELECT datetime('now', ?)", (f'-{self.horas} hours',)).fetchone()[0]
+                self.posicion = {'consulta': self.consulta, 'corte': corte, 'ultima_clave': None}
+            
+            while True:
+                pagina = conn.execute(*self.consulta_pagina()).fetchall()
+                for clave in pagina:
+                    self.posicion['ultima_clave'] = list(clave)
+                    yield clave[1]
+                if len(pagina) < self.tamano_pagina:
+                    break
+        finally:
+            conn.close()
+    
+    def contar(self) -> int:
+        """Perfiles por recorrer en este momento (para mostrar progreso)"""
+        with sqlite3.connect(self.db_path) as conn:
+            if self.posicion is None:
+                return conn.execute(f'''
+                    SELECT COUNT(*) FROM usuarios_unicos
+                    WHERE {self.filtro} AND {self.columna} < datetime('now', ?)
+                ''', (f'-{self.horas} hours',)).fetchone()[0]
+            condiciones, parametros = self._condiciones()
+            return conn.execute(f"SELECT COUNT(*) FROM usuarios_unicos WHERE {' AND '.join(condiciones)}",
+                                parametros).fetchone()[0]
+
 # ==============================================================================
 # FUNCIONES DE CONVENIENCIA
 # ==============================================================================
 
+def _marcar_consultas(cursor, username: str, user_data: Dict, consultas: tuple) -> None:
+    """Fija la fecha de las consultas de `consultas` que respondieron en este scraping (user_data['consultas_ok'])"""
+    columnas = [COLUMNAS_CONSULTA[consulta] for consulta in consultas
+                if consulta in user_data.get('consultas_ok', ())]
+    if columnas:
+        cursor.execute(f'''
+            UPDATE usuarios_unicos SET {', '.join(f'{columna} = CURRENT_TIMESTAMP' for columna in columnas)}
+            WHERE username = ?
+        ''', (username,))
+
+def _consultas_respondidas(user_data: Dict, consultas: tuple) -> tuple:
+    """Consultas de `consultas` cuyos datos trae user_data: clave presente y sin fallo en este scraping"""
+    fallidas = user_data.get('consultas_fallidas') or ()
+    return tuple(consulta for consulta in consultas if consulta in user_data and consulta not in fallidas)
+
+def _registrar_cambios_activo() -> bool:
+    from config import CAMBIOS_CONFIG
+    return CAMBIOS_CONFIG['activo']
+
+def _campos_usuario(cursor, username: str) -> Optional[tuple]:
+    """Valores actuales de los campos con registro de cambios (None si el usuario no existe)"""
+    return cursor.execute(f'''
+        SELECT {', '.join(CAMPOS_CAMBIO_USUARIO)} FROM usuarios_unicos WHERE username = ?
+    ''', (username,)).fetchone()
+
+def _clave_media(tipo_media: str, id_externo: Optional[str], url: str) -> str:
+    """Identidad estable de una fila de media: el CDN firma la URL de nuevo en cada scraping"""
+    return f"{tipo_media}:{id_externo or _ruta_recurso(url)}"
+
+def _diferencias(columnas: tuple, antes: Optional[tuple], despues: Optional[tuple]) -> Dict:
+    """Campo -> {'antes', 'despues'} de las columnas cuyo valor cambió (None = fila inexistente)"""
+    antes = antes or (None,) * len(columnas)
+    despues = despues or (None,) * len(columnas)
+    return {
+        columna: {'antes': viejo, 'despues': nuevo}
+        for columna, viejo, nuevo in zip(columnas, antes, despues)
+        if viejo != nuevo
+    }
+
+def _registrar_cambio(cursor, entidad: str, username: str, clave: str, operacion: str, campos: Dict) -> None:
+    """Agrega un evento al registro de cambios con el cursor dado (sin commit)"""
+    cursor.execute('''
+        INSERT INTO cambios (entidad, username, clave, operacion, campos) VALUES (?, ?, ?, ?, ?)
+    ''', (entidad, username, clave, operacion, json.dumps(campos, ensure_ascii=False)))
+
+def _registrar_cambios_media(cursor, username: str, previos: Dict[str, tuple], actuales: Dict[str, tuple],
+                             tipos: List[str]) -> None:
+    """
+    Registra altas, bajas y modificaciones de la media de un usuario
+    
+    Solo se comparan los tipos de `tipos` (los de las consultas que respondieron en este
+    scraping): la media de una consulta omitida o fallida no se reemplazó y no es una baja.
+    
+    Args:
+        previos (Dict[str, tuple]): Clave de media -> valores de CAMPOS_CAMBIO_MEDIA antes de reemplazar
+        actuales (Dict[str, tuple]): Clave de media -> valores de CAMPOS_CAMBIO_MEDIA guardados ahora
+        tipos (List[str]): Tipos de media reemplazados ('post', 'destacada')
+    """
+    previos = {clave: valores for clave, valores in previos.items() if clave.split(':', 1)[0] in tipos}
+    for clave, valores in actuales.items():
+        previo = previos.get(clave)
+        campos = _diferencias(CAMPOS_CAMBIO_MEDIA, previo, valores)
+        # Una URL re-firmada que apunta al mismo recurso no es un cambio
+        if previo and 'url_media' in campos and _ruta_recurso(previo[0]) == _ruta_recurso(valores[0]):
+            del campos['url_media']
+        if campos:
+            _registrar_cambio(cursor, 'media', username, clave, 'modificacion' if previo else 'alta', campos)
+    
+    for clave, valores in previos.items():
+        if clave not in actuales:
+            _registrar_cambio(cursor, 'media', username, clave, 'baja',
+                              _diferencias(CAMPOS_CAMBIO_MEDIA, valores, None))
+
+def _expresion_fts(consulta: str) -> str:
+    """Convierte texto libre en una expresión FTS5 segura: cada palabra como prefijo entre comillas"""
+    palabras = re.findall(r'\w+', consulta)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+def _ruta_recurso(url: str) -> str:
+    """Devuelve la ruta de una URL de CDN sin los parámetros de firma"""
+    return urlsplit(url).path
+
+def _expiracion_url(url: str) -> Optional[str]:
+    """
+    Obtiene la fecha de expiración (UTC) de una URL firmada del CDN de Instagram
+    
+    El parámetro 'oe' contiene el timestamp Unix de expiración en hexadecimal.
+    
+    Returns:
+        Optional[str]: 'YYYY-MM-DD HH:MM:SS' (mismo formato que CURRENT_TIMESTAMP) o None
+    """
+    valores = parse_qs(urlsplit(url).query).get('oe')
+    if not valores:
+        return None
+    try:
+        return datetime.fromtimestamp(int(valores[0], 16), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
 def crear_base_datos(db_path: str = "instagram_data.db") -> InstagramDatabase:
     """
     Función de conveniencia para crear una instancia de la base de datos
@@ -642,10 +1928,10 @@ def inicializar_con_perfiles_famosos(db_path: str = "instagram_data.db") -> bool
             total_usuarios = cursor.fetchone()[0]
             
             if total_usuarios > 0:
-                print(f"[*] Base de datos ya contiene {total_usuarios} usuarios")
+                logger.info(f"[*] Base de datos ya contiene {total_usuarios} usuarios")
                 return True
     except Exception as e:
-        print(f"[!] Error verificando base de datos: {e}")
+        logger.error(f"[!] Error verificando base de datos: {e}")
         return False
     
     # Lista de perfiles públicos famosos para inicializar
@@ -705,16 +1991,16 @@ def inicializar_con_perfiles_famosos(db_path: str = "instagram_data.db") -> bool
         'ladygaga',          # Lady Gaga
     ]
     
-    print(f"[+] Inicializando base de datos con {len(perfiles_famosos)} perfiles famosos...")
+    logger.info(f"[+] Inicializando base de datos con {len(perfiles_famosos)} perfiles famosos...")
     
     success = db.agregar_usuarios_iniciales(perfiles_famosos)
     
     if success:
-        print("[+] Base de datos inicializada con perfiles famosos")
-        print("[*] Estos perfiles están listos para ser scrapeados")
+        logger.info("[+] Base de datos inicializada con perfiles famosos")
+        logger.info("[*] Estos perfiles están listos para ser scrapeados")
         return True
     else:
-        print("[!] Error inicializando base de datos con perfiles famosos")
+        logger.error("[!] Error inicializando base de datos con perfiles famosos")
         return False
 
 # ==============================================================================
@@ -722,6 +2008,9 @@ def inicializar_con_perfiles_famosos(db_path: str = "instagram_data.db") -> bool
 # ==============================================================================
 
 if __name__ == '__main__':
+    from logger import configurar_logging
+    configurar_logging()
+    
     print("=== PRUEBA DEL MÓDULO DE BASE DE DATOS ===\n")
     
     # Crear instancia de BD
@@ -0,0 +1,138 @@
+import time
+from typing import Optional, Tuple
+
+from config import SCRAPING_CONFIG
+
+# ==============================================================================
+# TIMEOUTS POR REQUEST Y DEADLINE POR PERFIL
+# ==============================================================================
+
+class TiempoExcedido(Exception):
+    """Una request superó su timeout o el perfil agotó su deadline"""
+
+
+class Deadline:
+    """
+    Tiempo máximo para todas las consultas de un perfil.
+
+    Cada request recibe como timeout el mínimo entre el configurado y el tiempo restante,
+    y antes de enviarla se verifica que el deadline no haya vencido: así una conexión
+    colgada o un perfil lento no pueden retener el batch más allá del límite.
+    """
+
+    def __init__(self, segundos: Optional[float] = None):
+        """
+        Args:
+            segundos (float, optional): Duración del deadline (por defecto, de config)
+        """
+        self.segundos = segundos or SCRAPING_CONFIG['deadline_perfil']
+        self.limite = time.monotonic() + self.segundos
+
+    def restante(self) -> float:
+        """Segundos que quedan antes de vencer (0 si ya venció)"""
+        return max(0.0, self.limite - time.monotonic())
+
+    def verificar(self, etapa: str) -> None:
+        """
+        Cancela la etapa si el deadline ya venció
+
+        Raises:
+            TiempoExcedido: Si no queda tiempo
+        """
+        if self.restante() <= 0:
+            raise TiempoExcedido(f"Deadline de {self.segundos:g}s agotado antes de '{etapa}'")
+
+    def timeout(self, etapa: str, conexion: float, lectura: float) -> Tuple[float, float]:
+        """
+        Devuelve el timeout (conexión, lectura) acotado al tiempo restante
+
+        Raises:
+            TiempoExcedido: Si no queda tiempo
+        """
+        self.verificar(etapa)
+        restante = self.restante()
+        return min(conexion, restante), min(lectura, restante)
+
+    def extender(self, segundos: float) -> None:
+        """Amplía el límite (por ejemplo, por el tiempo que el batch estuvo pausado re-autenticando)"""
+        self.limite += segundos
+
+    def dormir(self, segundos: float, etapa: str) -> None:
+        """
+        Espera dentro del deadline; si la espera no cabe, cancela sin dormir
+
+        Raises:
+            TiempoExcedido: Si la espera superaría el deadline
+        """
+        if segundos >= self.restante():
+            raise TiempoExcedido(f"Deadline de {self.segundos:g}s no permite esperar {segundos:g}s en '{etapa}'")
+        time.sleep(segundos)
+
+
+class PresupuestoBatch:
+    """
+    Límites de una ejecución completa: tiempo de pared, requests y perfiles.
+
+    Se consulta entre perfiles. Para no empezar un perfil que no cabe, el tiempo y las
+    requests se proyectan con el costo medio por perfil observado hasta el momento.
+    """
+
+    def __init__(self, max_minutos: Optional[float] = None, max_requests: Optional[int] = None,
+                 max_perfiles: Optional[int] = None):
+        """
+        Args:
+            max_minutos (float, optional): Tiempo de pared máximo (None = sin límite)
+            max_requests (int, optional): Requests máximas (None = sin límite)
+            max_perfiles (int, optional): Perfiles máximos (None = sin límite)
+        """
+        self.max_segundos = max_minutos * 60 if max_minutos else None
+        self.max_requests = max_requests
+        self.max_perfiles = max_perfiles
+        self.inicio = time.monotonic()
+        self.perfiles = 0
+        self.requests = 0
+
+    def registrar_perfil(self, requests: int) -> None:
+        """Cuenta un perfil procesado y fija el total de requests usadas hasta ahora"""
+        self.perfiles += 1
+        self.requests = requests
+
+    def restante(self) -> Optional[float]:
+        """Segundos de pared que quedan en la ejecución (None si no hay límite de tiempo)"""
+        if self.max_segundos is None:
+            return None
+        return max(0.0, self.max_segundos - (time.monotonic() - self.inicio))
+
+    def agotado(self) -> Optional[str]:
+        """
+        Verifica si el próximo perfil cabe en los límites
+
+        Returns:
+            Optional[str]: Motivo (para el log), o None si se puede seguir
+        """
+        if self.max_perfiles is not None and self.perfiles >= self.max_perfiles:
+            return f"{self.perfiles} perfiles (máximo {self.max_perfiles})"
+
+        media_requests = self.requests / self.perfiles if self.perfiles else 0
+        if self.max_requests is not None and self.requests + media_requests > self.max_requests:
+            return f"{self.requests} requests (máximo {self.max_requests})"
+
+        transcurrido = time.monotonic() - self.inicio
+        media_segundos = transcurrido / self.perfiles if self.perfiles else 0
+        if self.max_segundos is not None and transcurrido + media_segundos > self.max_segundos:
+            return f"{transcurrido / 60:.1f} min (máximo {self.max_segundos / 60:g})"
+        return None
+
+
+def timeout_requests(deadline: Optional[Deadline] = None, etapa: str = 'request') -> Tuple[float, float]:
+    """
+    Timeout (conexión, lectura) de config para una request, acotado por el deadline si hay uno
+
+    Raises:
+        TiempoExcedido: Si el deadline ya venció
+    """
+    conexion = SCRAPING_CONFIG['timeout_conexion']
+    lectura = SCRAPING_CONFIG['timeout']
+    if deadline is None:
+        return conexion, lectura
+    return deadline.timeout(etapa, conexion, lectura)
@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import DOWNLOAD_CONFIG, OUTPUT_CONFIG
+from database import InstagramDatabase
+from transport import crear_sesion
+from logger import configurar_logging, obtener_logger, ProgresoBatch, detener_logging
+
+logger = obtener_logger('downloader')
+
+# ==============================================================================
+# DESCARGADOR CONCURRENTE DE MEDIA CON ALMACENAMIENTO POR CONTENIDO
+# ==============================================================================
+
+EXTENSIONES_POR_TIPO = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/heic': '.heic',
+    'video/mp4': '.mp4',
+}
+
+
+class DescargadorMedia:
+    """
+    Descarga las URLs pendientes de media_urls a un almacén direccionado por contenido.
+
+    Cada archivo se guarda como <directorio>/<sha[:2]>/<sha[2:4]>/<sha><ext>, así una misma
+    imagen compartida entre perfiles (o re-firmada por el CDN) se almacena una sola vez.
+    El progreso queda registrado en media_urls, por lo que una ejecución interrumpida se
+    retoma donde quedó.
+    """
+
+    def __init__(self, db_path: str = None, directorio: str = None, workers: int = None):
+        """
+        Args:
+            db_path (str, optional): Ruta a la base de datos
+            directorio (str, optional): Directorio raíz del almacén de archivos
+            workers (int, optional): Descargas concurrentes
+        """
+        self.db = InstagramDatabase(db_path or OUTPUT_CONFIG['database_file'])
+        self.directorio = directorio or DOWNLOAD_CONFIG['directorio']
+        self.workers = workers or DOWNLOAD_CONFIG['workers']
+        self.directorio_temporal = os.path.join(self.directorio, 'tmp')
+        os.makedirs(self.directorio_temporal, exist_ok=True)
+        self._limpiar_temporales()
+
+        # Un pool de conexiones por host del tamaño de la concurrencia
+        self.session = crear_sesion(pool_maxsize=self.workers)
+
+    def _limpiar_temporales(self) -> None:
+        """Elimina archivos temporales de ejecuciones interrumpidas"""
+        for nombre in os.listdir(self.directorio_temporal):
+            try:
+                os.remove(os.path.join(self.directorio_temporal, nombre))
+            except OSError:
+                pass
+
+    def ruta_para_hash(self, hash_contenido: str, extension: str) -> str:
+        """Devuelve la ruta del almacén para un hash de contenido"""
+        return os.path.join(self.directorio, hash_contenido[:2], hash_contenido[2:4], hash_contenido + extension)
+
+    def _extension(self, url: str, content_type: Optional[str]) -> str:
+        if content_type:
+            extension = EXTENSIONES_POR_TIPO.get(content_type.split(';')[0].strip().lower())
+            if extension:
+                return extension
+        return os.path.splitext(urlsplit(url).path)[1].lower() or '.bin'
+
+    def descargar(self, media_id: int, url: str) -> Dict:
+        """
+        Descarga una URL en streaming, calculando el hash mientras se escribe a disco
+
+        Args:
+            media_id (int): ID de la fila en media_urls
+            url (str): URL a descargar
+
+        Returns:
+            Dict: Resultado con id, estado, hash_contenido y ruta_archivo
+        """
+        descriptor, ruta_temporal = tempfile.mkstemp(dir=self.directorio_temporal)
+        try:
+            sha = hashlib.sha256()
+            with os.fdopen(descriptor, 'wb') as archivo:
+                with self.session.get(url, stream=True, timeout=DOWNLOAD_CONFIG['timeout']) as response:
+                    response.raise_for_status()
+                    extension = self._extension(url, response.headers.get('content-type'))
+                    for bloque in response.iter_content(chunk_size=DOWNLOAD_CONFIG['chunk_bytes']):
+                        sha.update(bloque)
+                        archivo.write(bloque)
+
+            hash_contenido = sha.hexdigest()
+            ruta_final = self.ruta_para_hash(hash_contenido, extension)
+            if os.path.exists(ruta_final):
+                # Contenido ya almacenado: se descarta la copia duplicada
+                os.remove(ruta_temporal)
+            else:
+                os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+                os.replace(ruta_temporal, ruta_final)
+
+            return {'id': media_id, 'estado': 'descargado',
+                    'hash_contenido': hash_contenido, 'ruta_archivo': ruta_final}
+
+        except Exception as e:
+            logger.warning(f"[!] Error descargando media {media_id}: {e}")
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            return {'id': media_id, 'estado': 'error'}
+
+    def descargar_pendientes(self, limite: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Descarga todas las filas pendientes, por lotes, registrando cada lote en la BD
+
+        Args:
+            limite (int, optional): Máximo de archivos a procesar en esta ejecución
+
+        Returns:
+            Tuple[int, int]: (descargados, fallidos)
+        """
+        descargados = 0
+        fallidos = 0
+        ultimo_id = 0
+        progreso = ProgresoBatch(total=limite)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while limite is None or descargados + fallidos < limite:
+                tamano_lote = DOWNLOAD_CONFIG['lote']
+                if limite is not None:
+                    tamano_lote = min(tamano_lote, limite - descargados - fallidos)
+
+                lote = self.db.obtener_media_pendiente_descarga(
+                    limite=tamano_lote, max_intentos=DOWNLOAD_CONFIG['max_intentos'], desde_id=ultimo_id)
+                if not lote:
+                    break
+                ultimo_id = lote[-1][0]
+
+                resultados = list(pool.map(lambda fila: self.descargar(*fila), lote))
+                self.db.registrar_resultados_descarga(resultados)
+
+                for resultado in resultados:
+                    exito = resultado['estado'] == 'descargado'
+                    if exito:
+                        descargados += 1
+                    else:
+                        fallidos += 1
+                    progreso.actualizar(exito)
+
+        progreso.finalizar()
+        logger.info(f"[+] Descarga finalizada: {descargados} descargados, {fallidos} fallidos")
+        return descargados, fallidos
+
+
+def main():
+    """Descarga la media pendiente desde la línea de comandos"""
+    parser = argparse.ArgumentParser(description='Descarga la media pendiente de media_urls')
+    parser.add_argument('--limite', type=int, default=None, help='Máximo de archivos a descargar')
+    parser.add_argument('--workers', type=int, default=None, help='Descargas concurrentes')
+    parser.add_argument('--directorio', default=None, help='Directorio del almacén de archivos')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        DescargadorMedia(directorio=args.directorio, workers=args.workers).descargar_pendientes(limite=args.limite)
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
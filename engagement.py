@@ -0,0 +1,272 @@
+import argparse
+import sqlite3
+from typing import Dict, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("El análisis de engagement requiere 'numpy' (pip install numpy)") from e
+
+from config import OUTPUT_CONFIG
+from database import InstagramDatabase
+from logger import configurar_logging, obtener_logger, detener_logging
+
+logger = obtener_logger('engagement')
+
+# ==============================================================================
+# ENGAGEMENT VECTORIZADO SOBRE TODOS LOS PERFILES
+# ==============================================================================
+#
+# media_urls y usuarios_unicos se cargan una vez en arrays de NumPy y cada métrica es una
+# pasada vectorizada (bincount para sumas y conteos, lexsort para percentiles por grupo),
+# sin bucles de Python por perfil. El resultado se guarda en engagement_perfiles y
+# engagement_categorias (migración 004).
+
+SIN_CATEGORIA = '(sin categoría)'
+PERCENTILES = (0.5, 0.9)
+
+
+def percentiles_por_grupo(codigos: np.ndarray, valores: np.ndarray, n_grupos: int,
+                          cuantiles: Sequence[float] = PERCENTILES) -> Dict[float, np.ndarray]:
+    """
+    Percentiles (interpolación lineal, como np.percentile) de cada grupo en una sola ordenación
+
+    Args:
+        codigos (np.ndarray): Grupo de cada valor (0..n_grupos-1)
+        valores (np.ndarray): Valores a resumir
+        n_grupos (int): Cantidad de grupos
+        cuantiles (Sequence[float]): Cuantiles entre 0 y 1
+
+    Returns:
+        Dict[float, np.ndarray]: Cuantil -> valor por grupo (NaN en grupos vacíos)
+    """
+    conteos = np.bincount(codigos, minlength=n_grupos)
+    if len(valores) == 0:
+        return {q: np.full(n_grupos, np.nan) for q in cuantiles}
+
+    # Ordena por grupo y, dentro de cada grupo, por valor
+    ordenados = valores[np.lexsort((valores, codigos))].astype(np.float64)
+    inicios = np.cumsum(conteos) - conteos
+    con_datos = conteos > 0
+
+    resultado = {}
+    for q in cuantiles:
+        posicion = inicios + q * np.maximum(conteos - 1, 0)
+        abajo = np.floor(posicion).astype(np.int64)
+        arriba = np.ceil(posicion).astype(np.int64)
+        fraccion = posicion - abajo
+        abajo = np.where(con_datos, abajo, 0)
+        arriba = np.where(con_datos, arriba, 0)
+        valor = ordenados[abajo] * (1 - fraccion) + ordenados[arriba] * fraccion
+        resultado[q] = np.where(con_datos, valor, np.nan)
+    return resultado
+
+
+def calcular_metricas_perfiles(codigos: np.ndarray, likes: np.ndarray, comentarios: np.ndarray,
+                               es_video: np.ndarray, seguidores: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Métricas de engagement por perfil a partir de arrays alineados por post
+
+    Args:
+        codigos (np.ndarray): Índice del perfil de cada post
+        likes (np.ndarray): Likes de cada post
+        comentarios (np.ndarray): Comentarios de cada post
+        es_video (np.ndarray): Si cada post es video/reel
+        seguidores (np.ndarray): Seguidores de cada perfil (por índice de perfil)
+
+    Returns:
+        Dict[str, np.ndarray]: Métrica -> array por perfil
+    """
+    n_perfiles = len(seguidores)
+    posts = np.bincount(codigos, minlength=n_perfiles)
+    con_posts = posts > 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        likes_promedio = np.bincount(codigos, weights=likes, minlength=n_perfiles) / posts
+        comentarios_promedio = np.bincount(codigos, weights=comentarios, minlength=n_perfiles) / posts
+        proporcion_video = np.bincount(codigos, weights=es_video, minlength=n_perfiles) / posts
+        tasa_engagement = np.where(seguidores > 0, (likes_promedio + comentarios_promedio) / seguidores, np.nan)
+
+    percentiles_likes = percentiles_por_grupo(codigos, likes, n_perfiles)
+    percentiles_comentarios = percentiles_por_grupo(codigos, comentarios, n_perfiles)
+
+    return {
+        'posts': posts,
+        'likes_promedio': np.where(con_posts, likes_promedio, np.nan),
+        'likes_p50': percentiles_likes[0.5],
+        'likes_p90': percentiles_likes[0.9],
+        'comentarios_promedio': np.where(con_posts, comentarios_promedio, np.nan),
+        'comentarios_p50': percentiles_comentarios[0.5],
+        'comentarios_p90': percentiles_comentarios[0.9],
+        'tasa_engagement': np.where(con_posts, tasa_engagement, np.nan),
+        'proporcion_video': np.where(con_posts, proporcion_video, np.nan),
+    }
+
+
+def calcular_metricas_categorias(categorias: np.ndarray, metricas: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Agrega las métricas de los perfiles con posts por categoría
+
+    Args:
+        categorias (np.ndarray): Categoría de cada perfil
+        metricas (Dict[str, np.ndarray]): Resultado de calcular_metricas_perfiles
+
+    Returns:
+        Dict[str, np.ndarray]: Métrica -> array por categoría (incluye 'categoria')
+    """
+    con_posts = metricas['posts'] > 0
+    nombres, codigos = np.unique(categorias[con_posts], return_inverse=True)
+    n = len(nombres)
+
+    tasas = metricas['tasa_engagement'][con_posts]
+    con_tasa = ~np.isnan(tasas)
+    percentiles_tasa = percentiles_por_grupo(codigos[con_tasa], tasas[con_tasa], n)
+    percentiles_likes = percentiles_por_grupo(codigos, metricas['likes_p50'][con_posts], n, (0.5,))
+
+    perfiles = np.bincount(codigos, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        proporcion_video = np.bincount(codigos, weights=metricas['proporcion_video'][con_posts], minlength=n) / perfiles
+
+    return {
+        'categoria': nombres,
+        'perfiles': perfiles,
+        'posts': np.bincount(codigos, weights=metricas['posts'][con_posts], minlength=n).astype(np.int64),
+        'tasa_engagement_p50': percentiles_tasa[0.5],
+        'tasa_engagement_p90': percentiles_tasa[0.9],
+        'likes_p50': percentiles_likes[0.5],
+        'proporcion_video': proporcion_video,
+    }
+
+
+def cargar_datos(db_path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Carga perfiles activos y sus posts en arrays
+
+    Returns:
+        Tuple[Dict, Dict]: (perfiles: username/seguidores/categoria,
+                            posts: codigos/likes/comentarios/es_video)
+    """
+    with sqlite3.connect(db_path) as conn:
+        filas = conn.execute('''
+            SELECT username, COALESCE(cantidad_seguidores, 0), COALESCE(categoria, ?)
+            FROM usuarios_unicos
+            WHERE perfil_inactivo = FALSE
+        ''', (SIN_CATEGORIA,)).fetchall()
+        usernames, seguidores, categorias = zip(*filas) if filas else ((), (), ())
+        indice = {username: i for i, username in enumerate(usernames)}
+
+        filas = conn.execute('''
+            SELECT username, subtipo_post IN ('reel', 'video'),
+                   COALESCE(cantidad_likes, 0), COALESCE(cantidad_comentarios, 0)
+            FROM media_urls
+            WHERE tipo_media = 'post'
+        ''').fetchall()
+
+    post_usernames, es_video, likes, comentarios = zip(*filas) if filas else ((), (), (), ())
+    codigos = np.fromiter((indice.get(u, -1) for u in post_usernames), dtype=np.int64, count=len(post_usernames))
+    conocidos = codigos >= 0  # Descarta posts de perfiles inactivos o inexistentes
+
+    perfiles = {
+        'username': np.array(usernames, dtype=object),
+        'seguidores': np.array(seguidores, dtype=np.float64),
+        'categoria': np.array(categorias, dtype=object),
+    }
+    posts = {
+        'codigos': codigos[conocidos],
+        'likes': np.array(likes, dtype=np.float64)[conocidos],
+        'comentarios': np.array(comentarios, dtype=np.float64)[conocidos],
+        'es_video': np.array(es_video, dtype=np.float64)[conocidos],
+    }
+    return perfiles, posts
+
+
+def _a_sql(valor):
+    """Convierte escalares de NumPy a tipos de SQLite (NaN -> NULL)"""
+    if isinstance(valor, float) and valor != valor:
+        return None
+    return valor
+
+
+def guardar_resumen(db_path: str, perfiles: Dict[str, np.ndarray], metricas: Dict[str, np.ndarray],
+                    categorias: Dict[str, np.ndarray]) -> None:
+    """Reemplaza el contenido de engagement_perfiles y engagement_categorias en una transacción"""
+    con_posts = metricas['posts'] > 0
+    columnas_perfil = ['posts', 'likes_promedio', 'likes_p50', 'likes_p90', 'comentarios_promedio',
+                       'comentarios_p50', 'comentarios_p90', 'tasa_engagement', 'proporcion_video']
+    filas_perfiles = zip(
+        perfiles['username'][con_posts].tolist(),
+        perfiles['categoria'][con_posts].tolist(),
+        perfiles['seguidores'][con_posts].astype(np.int64).tolist(),
+        *(metricas[c][con_posts].tolist() for c in columnas_perfil),
+    )
+    columnas_categoria = ['categoria', 'perfiles', 'posts', 'tasa_engagement_p50',
+                          'tasa_engagement_p90', 'likes_p50', 'proporcion_video']
+    filas_categorias = zip(*(categorias[c].tolist() for c in columnas_categoria))
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('DELETE FROM engagement_perfiles')
+        conn.executemany(f'''
+            INSERT INTO engagement_perfiles (username, categoria, seguidores, {', '.join(columnas_perfil)})
+            VALUES ({', '.join('?' * (len(columnas_perfil) + 3))})
+        ''', (tuple(map(_a_sql, fila)) for fila in filas_perfiles))
+        conn.execute('DELETE FROM engagement_categorias')
+        conn.executemany(f'''
+            INSERT INTO engagement_categorias ({', '.join(columnas_categoria)})
+            VALUES ({', '.join('?' * len(columnas_categoria))})
+        ''', (tuple(map(_a_sql, fila)) for fila in filas_categorias))
+        conn.commit()
+
+
+def calcular_engagement(db_path: str = None) -> Tuple[int, int]:
+    """
+    Calcula y guarda el resumen de engagement de todos los perfiles activos
+
+    Args:
+        db_path (str, optional): Ruta a la base de datos
+
+    Returns:
+        Tuple[int, int]: (perfiles con posts, categorías) resumidos
+    """
+    db = InstagramDatabase(db_path or OUTPUT_CONFIG['database_file'])  # Aplica migraciones pendientes
+
+    perfiles, posts = cargar_datos(db.db_path)
+    metricas = calcular_metricas_perfiles(posts['codigos'], posts['likes'], posts['comentarios'],
+                                          posts['es_video'], perfiles['seguidores'])
+    categorias = calcular_metricas_categorias(perfiles['categoria'], metricas)
+    guardar_resumen(db.db_path, perfiles, metricas, categorias)
+
+    con_posts = int((metricas['posts'] > 0).sum())
+    logger.info(f"[+] Engagement calculado: {len(posts['codigos'])} posts, {con_posts} perfiles, "
+                f"{len(categorias['categoria'])} categorías")
+    return con_posts, len(categorias['categoria'])
+
+
+def main():
+    """Calcula el resumen de engagement y muestra los perfiles con mayor tasa"""
+    parser = argparse.ArgumentParser(description='Resumen de engagement vectorizado de todos los perfiles')
+    parser.add_argument('--db', default=None, help='Ruta a la base de datos')
+    parser.add_argument('--top', type=int, default=10, help='Perfiles a mostrar')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        db_path = args.db or OUTPUT_CONFIG['database_file']
+        calcular_engagement(db_path)
+        with sqlite3.connect(db_path) as conn:
+            filas = conn.execute('''
+                SELECT username, categoria, posts, likes_p50, tasa_engagement, proporcion_video
+                FROM engagement_perfiles
+                WHERE tasa_engagement IS NOT NULL
+                ORDER BY tasa_engagement DESC
+                LIMIT ?
+            ''', (args.top,)).fetchall()
+        print(f"\n🏆 Top {args.top} por tasa de engagement")
+        for username, categoria, posts, likes_p50, tasa, video in filas:
+            print(f"   @{username} ({categoria}): {tasa:.2%} | {posts} posts | "
+                  f"mediana likes {likes_p50:,.0f} | video {video:.0%}")
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
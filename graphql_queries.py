@@ -0,0 +1,206 @@
+import json
+import os
+from typing import Callable, Dict, Optional
+from urllib.parse import urlencode, quote_plus
+
+from config import GRAPHQL_CONFIG
+
+# ==============================================================================
+# REGISTRO DE CONSULTAS GRAPHQL CON PLANTILLAS PRE-CODIFICADAS
+# ==============================================================================
+
+GRAPHQL_URL = "https://www.instagram.com/graphql/query"
+
+# Headers fijos de las consultas GraphQL (los tokens se agregan por sesión)
+HEADERS_BASE = {
+    'accept': '*/*',
+    'accept-language': 'es-419,es;q=0.9,es-ES;q=0.8,en;q=0.7,en-GB;q=0.6,en-US;q=0.5',
+    'content-type': 'application/x-www-form-urlencoded',
+    'origin': 'https://www.instagram.com',
+    'priority': 'u=1, i',
+    'referer': 'https://www.instagram.com/',
+    'sec-ch-prefers-color-scheme': 'dark',
+    'sec-ch-ua': '"Not)A;Brand";v="8", "Chromium";v="138", "Microsoft Edge";v="138"',
+    'sec-ch-ua-full-version-list': '"Not)A;Brand";v="8.0.0.0", "Chromium";v="138.0.7204.184", "Microsoft Edge";v="138.0.3351.121"',
+    'sec-ch-ua-mobile': '?1',
+    'sec-ch-ua-model': '"Nexus 5"',
+    'sec-ch-ua-platform': '"Android"',
+    'sec-ch-ua-platform-version': '"6.0"',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-origin',
+    'user-agent': 'Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Mobile Safari/537.36 Edg/138.0.0.0',
+    'x-asbd-id': '359341',
+    'x-bloks-version-id': '4fd52d0e0985dd463fefe21d18f1609258ecf3c799cc7f12f6c4363b56697384',
+    'x-ig-app-id': '1217981644879628',
+    'x-root-field-name': 'fetch__XDTUserDict'
+}
+
+# Campos fijos del payload (sin tokens, __req, doc_id ni variables)
+PAYLOAD_BASE = {
+    'av': '17841476332219581',
+    '__d': 'www',
+    '__user': '0',
+    '__a': '1',
+    '__hs': '20302.HYP%3Ainstagram_web_pkg.2.1...0',
+    'dpr': '2',
+    '__ccg': 'EXCELLENT',
+    '__rev': '1025456124',
+    '__s': 'azx7hm%3Av651wx%3Ajjbnoc',
+    '__hsi': '7534071026151167731',
+    '__dyn': '7xeUjG1mxu1syUbFp41twpUnwgU7SbzEdF8aUco2qwJxS0k24o0B-q1ew6ywaq0yE462mcw5Mx62G5UswoEcE7O2l0Fwqo31w9a9wtUd8-U2zxe2GewGw9a361qw8Xxm16wUwtE1wEbUGdwtUd-2u2J0bS1LwTwKG1pg2fwxyo6O1FwlA3a3zhA6bwIxe6V89F8uwm8jxK2K2G0EoKmUhw4UxWawOwgV8',
+    '__csr': 'hk4c5sIdiiWeWkp4my9OFliOZZm_GGlbnl8FQW_jqWWXrHZelBAGKQWAUxqjH9mGh9mtyGKcZ2rVtlmVCqfXmWupfAGm8QqUDhEOEnjqVHBGUGcAAx2hpoO4ojS7aDBzqxi5BAhUB5VeV8lyoyAWyQElABzoC4ayu79V8S4Uiw05vaw2bU25o30K1NA80qu584No0zapo1lU3zwwP1uuE0Z-07gVE4e7UKlF2cU1Iodo6Z2UTo1n86dwVg8UJCOwkcw3pc0nCpO08Vk7k0tdw09oK06480aHo',
+    '__hsdp': 'gngpiOl4cZSxIajNnhshkxk2p6kKnjmEFEj9bae42bzXy98hzIywDwSzC9xpwCx22t7oTzVFNiwxD9AIU92zoCp3U6wwaob9QEaoe8hz8hwNwTgkefy8fUW0BopwXzUphGXAyopDwda7o10U6d05uwjE2vw2a821xa1eG3K3S1Hw8u0R8W0CE521mg8iw4pwxwLwhjzo6a0Jo562C',
+    '__hblp': '1i7Q1YwJK9xN6mmcG12xKU2BCwv8bFFEC69E5a68Dgbbx22qAUSfGm8wGK2h2Ebk4ayohwNAG1rBGES2up3ojxy9wKwLxC5Q1chGBWyo-9DDwgE6i2a7ojwe-10wygiw8S0Lo4W3K18xG0Bo1gE4uu2K1fBBz85-2mu3S1HwVwjo3kzE2qAwiVoS11o8iwdm13wxzo6ix0N0oogwai68dqxq4E',
+    '__sjsp': 'gngpiOl4cZSDPMFf5t5N5i5g9ApiVtdqyCxcAIwYg8K4Uyi4o7meoC3-48a9QeU-qskE8pOpbe2ydw3nEdE',
+    '__comet_req': '7',
+    'jazoest': '26195',
+    '__spin_r': '1025456124',
+    '__spin_b': 'trunk',
+    '__spin_t': '1754162606',
+    'fb_api_caller_class': 'RelayModern',
+    'server_timestamps': 'true',
+}
+
+
+class ConsultaGraphQL:
+    """Declaración de un tipo de consulta GraphQL"""
+
+    def __init__(self, tipo: str, friendly_name: str, crn: str, req: int,
+                 construir_variables: Callable[..., dict]):
+        """
+        Args:
+            tipo (str): Clave de la consulta ("user", "highlights", "posts", ...)
+            friendly_name (str): Valor de fb_api_req_friendly_name
+            crn (str): Valor de __crn
+            req (int): Valor de __req
+            construir_variables (Callable): Recibe user_id/username y devuelve el dict de variables
+        """
+        self.tipo = tipo
+        self.friendly_name = friendly_name
+        self.crn = crn
+        self.req = req
+        self.construir_variables = construir_variables
+
+
+REGISTRO_CONSULTAS: Dict[str, ConsultaGraphQL] = {}
+
+
+def registrar_consulta(consulta: ConsultaGraphQL) -> ConsultaGraphQL:
+    """Registra (o reemplaza) un tipo de consulta en el registro global"""
+    REGISTRO_CONSULTAS[consulta.tipo] = consulta
+    return consulta
+
+
+def cargar_doc_ids() -> Dict[str, str]:
+    """
+    Carga los doc_ids desde config, con override opcional desde un archivo JSON
+
+    Returns:
+        Dict[str, str]: doc_id por tipo de consulta
+    """
+    doc_ids = dict(GRAPHQL_CONFIG['doc_ids'])
+
+    archivo = GRAPHQL_CONFIG.get('archivo_doc_ids')
+    if archivo and os.path.exists(archivo):
+        with open(archivo, 'r', encoding='utf-8') as f:
+            doc_ids.update(json.load(f))
+
+    return doc_ids
+
+
+# ==============================================================================
+# CONSULTAS REGISTRADAS
+# ==============================================================================
+
+def _variables_usuario(user_id: str = None, username: str = None) -> dict:
+    return {"id": user_id, "render_surface": "PROFILE"}
+
+
+def _variables_highlights(user_id: str = None, username: str = None) -> dict:
+    return {"user_id": user_id}
+
+
+def _variables_posts(user_id: str = None, username: str = None) -> dict:
+    return {
+        "data": {
+            "count": 12,
+            "include_reel_media_seen_timestamp": True,
+            "include_relationship_info": True,
+            "latest_besties_reel_media": True,
+            "latest_reel_media": True
+        },
+        "username": username,
+        "__relay_internal__pv__PolarisIsLoggedInrelayprovider": True,
+        "__relay_internal__pv__PolarisShareSheetV3relayprovider": True
+    }
+
+
+registrar_consulta(ConsultaGraphQL(
+    'user', 'PolarisProfilePageContentQuery', 'comet.igweb.PolarisFeedRoute', 3, _variables_usuario))
+registrar_consulta(ConsultaGraphQL(
+    'highlights', 'PolarisProfileStoryHighlightsTrayContentQuery', 'comet.igweb.PolarisProfilePostsTabRoute', 5, _variables_highlights))
+registrar_consulta(ConsultaGraphQL(
+    'posts', 'PolarisProfilePostsQuery', 'comet.igweb.PolarisProfilePostsTabRoute', 7, _variables_posts))
+
+
+# ==============================================================================
+# PLANTILLAS POR SESIÓN
+# ==============================================================================
+
+class PlantillasGraphQL:
+    """
+    Headers y cuerpos pre-codificados para una sesión autenticada.
+
+    La parte estática del cuerpo (hashes, versiones, friendly name, __crn, doc_id)
+    y los tokens se codifican una sola vez al crear la sesión; por request solo
+    se codifican las variables.
+    """
+
+    def __init__(self, tokens: Dict, doc_ids: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            tokens (Dict): Tokens de autenticación (csrf_token, fb_lsd, fb_dtsg)
+            doc_ids (Dict, optional): doc_id por tipo de consulta (por defecto, desde config)
+        """
+        self.doc_ids = doc_ids or cargar_doc_ids()
+
+        self.headers = dict(HEADERS_BASE)
+        self.headers['x-csrftoken'] = tokens['csrf_token']
+        self.headers['x-fb-lsd'] = tokens['fb_lsd']
+
+        self._tokens_codificados = urlencode({
+            'fb_dtsg': tokens['fb_dtsg'],
+            'lsd': tokens['fb_lsd'],
+        })
+        self._base_codificada = urlencode(PAYLOAD_BASE)
+        self._cuerpos_estaticos: Dict[str, str] = {}
+
+    def _cuerpo_estatico(self, tipo: str) -> str:
+        cuerpo = self._cuerpos_estaticos.get(tipo)
+        if cuerpo is None:
+            consulta = REGISTRO_CONSULTAS[tipo]
+            especificos = urlencode({
+                '__req': str(consulta.req),
+                '__crn': consulta.crn,
+                'fb_api_req_friendly_name': consulta.friendly_name,
+                'doc_id': self.doc_ids[tipo],
+            })
+            cuerpo = f"{self._base_codificada}&{self._tokens_codificados}&{especificos}"
+            self._cuerpos_estaticos[tipo] = cuerpo
+        return cuerpo
+
+    def construir_cuerpo(self, tipo: str, user_id: str = None, username: str = None) -> str:
+        """
+        Construye el cuerpo urlencoded de una consulta
+
+        Args:
+            tipo (str): Tipo de consulta registrado
+            user_id (str, optional): ID del usuario
+            username (str, optional): Username del usuario
+
+        Returns:
+            str: Cuerpo listo para enviar como application/x-www-form-urlencoded
+        """
+        variables = REGISTRO_CONSULTAS[tipo].construir_variables(user_id=user_id, username=username)
+        return f"{self._cuerpo_estatico(tipo)}&variables={quote_plus(json.dumps(variables))}"
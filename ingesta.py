@@ -0,0 +1,206 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from config import INGESTA_CONFIG, OUTPUT_CONFIG
+from database import InstagramDatabase
+from logger import configurar_logging, obtener_logger, detener_logging
+
+logger = obtener_logger('ingesta')
+
+# ==============================================================================
+# IMPORTACIÓN MASIVA DE USERNAMES (CSV / NDJSON / TEXTO PLANO)
+# ==============================================================================
+
+# Usernames de Instagram: letras, números, puntos y guiones bajos, hasta 30 caracteres
+PATRON_USERNAME = re.compile(r'^[a-z0-9._]{1,30}$')
+PATRON_URL_PERFIL = re.compile(r'instagram\.com/([^/?#]+)', re.IGNORECASE)
+
+FORMATOS = ('csv', 'ndjson', 'txt')
+EXTENSIONES = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.txt': 'txt'}
+
+
+def normalizar_username(valor) -> Optional[str]:
+    """
+    Normaliza un username (minúsculas, sin '@' inicial ni URL de perfil) y lo valida
+
+    Args:
+        valor: Valor leído de la fuente
+
+    Returns:
+        Optional[str]: Username normalizado, o None si no es válido
+    """
+    if not isinstance(valor, str):
+        return None
+
+    username = valor.strip()
+    coincidencia = PATRON_URL_PERFIL.search(username)
+    if coincidencia:
+        username = coincidencia.group(1)
+    username = username.lstrip('@').strip().lower()
+
+    if not PATRON_USERNAME.match(username) or username.startswith('.') or username.endswith('.'):
+        return None
+    return username
+
+
+def detectar_formato(primera_linea: str) -> str:
+    """Deduce el formato de una fuente sin extensión (stdin) a partir de su primera línea"""
+    linea = primera_linea.lstrip()
+    if linea.startswith('{') or linea.startswith('"'):
+        return 'ndjson'
+    if ',' in linea:
+        return 'csv'
+    return 'txt'
+
+
+def _leer_csv(lineas: Iterable[str], columna: str) -> Iterator[str]:
+    lector = csv.reader(lineas)
+    encabezado = next(lector, None)
+    if encabezado is None:
+        return
+
+    nombres = [celda.strip().lower() for celda in encabezado]
+    if columna in nombres:
+        indice = nombres.index(columna)
+    else:
+        # Sin encabezado reconocible: el username es la primera columna y la fila es un dato
+        indice = 0
+        yield encabezado[0] if encabezado else ''
+
+    for fila in lector:
+        if len(fila) > indice:
+            yield fila[indice]
+
+
+def _leer_ndjson(lineas: Iterable[str], columna: str) -> Iterator:
+    for linea in lineas:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError:
+            yield None
+            continue
+        yield registro.get(columna) if isinstance(registro, dict) else registro
+
+
+def leer_usernames(flujo: TextIO, formato: Optional[str] = None,
+                   columna: Optional[str] = None) -> Iterator[Optional[str]]:
+    """
+    Lee valores crudos de username de un flujo de texto, en streaming
+
+    Args:
+        flujo (TextIO): Archivo abierto o sys.stdin
+        formato (str, optional): 'csv', 'ndjson' o 'txt' (se detecta si no se indica)
+        columna (str, optional): Columna (CSV) o clave (NDJSON) del username
+
+    Yields:
+        Valores sin normalizar (None para líneas ilegibles)
+    """
+    columna = (columna or INGESTA_CONFIG['columna']).lower()
+    primera = flujo.readline()
+    if not primera:
+        return
+    lineas = itertools.chain([primera], flujo)
+    formato = formato or detectar_formato(primera)
+
+    if formato == 'csv':
+        yield from _leer_csv(lineas, columna)
+    elif formato == 'ndjson':
+        yield from _leer_ndjson(lineas, columna)
+    else:
+        for linea in lineas:
+            if linea.strip():
+                yield linea
+
+
+def importar_usuarios(valores: Iterable, db: InstagramDatabase, tamano_lote: Optional[int] = None) -> Dict[str, int]:
+    """
+    Normaliza, valida y deduplica usernames en memoria y los agrega en lotes
+
+    Args:
+        valores (Iterable): Valores crudos (de leer_usernames o una lista)
+        db (InstagramDatabase): Base de datos destino
+        tamano_lote (int, optional): Filas por transacción (por defecto, de config)
+
+    Returns:
+        Dict[str, int]: Conteos de agregados, ya_existian, duplicados e invalidos
+    """
+    conteos = {'agregados': 0, 'ya_existian': 0, 'duplicados': 0, 'invalidos': 0}
+    vistos = set()
+
+    def validos():
+        for valor in valores:
+            username = normalizar_username(valor)
+            if username is None:
+                conteos['invalidos'] += 1
+            elif username in vistos:
+                conteos['duplicados'] += 1
+            else:
+                vistos.add(username)
+                yield username
+
+    agregados, existentes = db.agregar_usuarios_masivo(validos(), tamano_lote or INGESTA_CONFIG['lote'])
+    conteos['agregados'] = agregados
+    conteos['ya_existian'] = existentes
+    return conteos
+
+
+def importar_archivo(ruta: str, db: InstagramDatabase, formato: Optional[str] = None,
+                     columna: Optional[str] = None) -> Dict[str, int]:
+    """
+    Importa usernames desde un archivo ('-' para stdin)
+
+    Args:
+        ruta (str): Ruta del archivo o '-'
+        db (InstagramDatabase): Base de datos destino
+        formato (str, optional): Formato; si no se indica, se deduce de la extensión o el contenido
+        columna (str, optional): Columna (CSV) o clave (NDJSON) del username
+
+    Returns:
+        Dict[str, int]: Conteos de importar_usuarios
+    """
+    if ruta == '-':
+        return importar_usuarios(leer_usernames(sys.stdin, formato, columna), db)
+
+    formato = formato or EXTENSIONES.get(os.path.splitext(ruta)[1].lower())
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        return importar_usuarios(leer_usernames(archivo, formato, columna), db)
+
+
+def registrar_resumen(conteos: Dict[str, int]) -> None:
+    """Muestra el resumen de una importación"""
+    logger.info("\n📊 Resumen:")
+    logger.info(f"   ✅ Agregados: {conteos['agregados']}")
+    logger.info(f"   ⚠️ Ya existían: {conteos['ya_existian']}")
+    logger.info(f"   🔁 Duplicados en la entrada: {conteos['duplicados']}")
+    logger.info(f"   ❌ Inválidos: {conteos['invalidos']}")
+
+
+def main():
+    """Importa usernames desde la línea de comandos"""
+    parser = argparse.ArgumentParser(description='Importa usernames en masa a usuarios_unicos')
+    parser.add_argument('archivo', help="Archivo CSV/NDJSON/TXT, o '-' para leer de stdin")
+    parser.add_argument('--formato', choices=FORMATOS, default=None, help='Formato de la entrada')
+    parser.add_argument('--columna', default=None, help='Columna (CSV) o clave (NDJSON) del username')
+    parser.add_argument('--db', default=None, help='Ruta a la base de datos')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        db = InstagramDatabase(args.db or OUTPUT_CONFIG['database_file'])
+        conteos = importar_archivo(args.archivo, db, formato=args.formato, columna=args.columna)
+        registrar_resumen(conteos)
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,21 @@ Script de inicialización de base de datos para Instagram Scraper
 Inicializa la base de datos con perfiles públicos famosos si está vacía
 """
 
-from database import inicializar_con_perfiles_famosos
+from database import inicializar_con_perfiles_famosos, InstagramDatabase
+from logger import configurar_logging
+import argparse
 import os
 import sys
 
 def main():
     """Función principal de inicialización"""
+    parser = argparse.ArgumentParser(description='Inicializa la base de datos del scraper')
+    parser.add_argument('--reconstruir-busqueda', action='store_true',
+                        help='Reconstruye el índice de búsqueda de texto completo (usuarios_fts)')
+    args = parser.parse_args()
+    
+    configurar_logging()
+    
     print("🚀 INICIALIZADOR DE BASE DE DATOS - Instagram Scraper")
     print("="*60)
     
@@ -23,6 +32,11 @@ def main():
     else:
         print(f"[*] No se encontró base de datos, se creará: {db_path}")
     
+    if args.reconstruir_busqueda:
+        if not InstagramDatabase(db_path).reconstruir_indice_busqueda():
+            sys.exit(1)
+        return
+    
     # Inicializar con perfiles famosos
     try:
         success = inicializar_con_perfiles_famosos(db_path)
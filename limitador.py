@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Optional
+
+from config import LIMITE_TASA_CONFIG
+
+# ==============================================================================
+# PRESUPUESTO DE REQUESTS COMPARTIDO (TOKEN BUCKET)
+# ==============================================================================
+
+class LimitadorTasa:
+    """
+    Token bucket compartido por todas las requests a la API de una sesión.
+
+    Las etapas secuenciales ya esperan entre perfiles, pero las que lanzan requests en
+    paralelo (contenido de destacadas) podrían ráfaguear sin control; con un único
+    limitador el ritmo total queda acotado sin importar cuántos hilos pidan a la vez.
+    Es seguro entre hilos: cada llamada reserva su turno bajo el lock y duerme fuera de él.
+    """
+
+    def __init__(self, por_segundo: Optional[float] = None, rafaga: Optional[int] = None):
+        """
+        Args:
+            por_segundo (float, optional): Requests por segundo sostenidas (por defecto, de config)
+            rafaga (int, optional): Requests que pueden salir seguidas tras un periodo inactivo
+        """
+        self.por_segundo = por_segundo or LIMITE_TASA_CONFIG['requests_por_segundo']
+        self.rafaga = rafaga or LIMITE_TASA_CONFIG['rafaga']
+        self._disponibles = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        self.concedidas = 0  # Requests autorizadas desde la creación (para presupuestos por ejecución)
+
+    def adquirir(self) -> float:
+        """
+        Espera hasta que haya presupuesto para una request
+
+        Returns:
+            float: Segundos esperados
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            self._disponibles = min(self.rafaga, self._disponibles + (ahora - self._ultimo) * self.por_segundo)
+            self._ultimo = ahora
+            self._disponibles -= 1
+            self.concedidas += 1
+            espera = -self._disponibles / self.por_segundo if self._disponibles < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+        return espera
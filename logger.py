@@ -0,0 +1,186 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from typing import Optional
+
+from config import LOGGING_CONFIG
+
+# ==============================================================================
+# LOGGING CENTRALIZADO Y REPORTE DE PROGRESO
+# ==============================================================================
+
+NOMBRE_LOGGER_RAIZ = 'instagram_scraper'
+
+_listener_jsonl = None
+
+
+class _ConsolaHandler(logging.StreamHandler):
+    """Handler de consola que no pisa la línea de progreso activa"""
+
+    linea_progreso_activa = False
+
+    def emit(self, record):
+        if _ConsolaHandler.linea_progreso_activa:
+            self.stream.write('\n')
+            _ConsolaHandler.linea_progreso_activa = False
+        super().emit(record)
+
+
+class _FormateadorJSON(logging.Formatter):
+    """Formatea cada registro como una línea JSON"""
+
+    def format(self, record):
+        entrada = {
+            'ts': round(record.created, 3),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        datos = getattr(record, 'datos', None)
+        if datos is not None:
+            entrada['datos'] = datos
+        if record.exc_info:
+            entrada['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(entrada, ensure_ascii=False, default=str)
+
+
+def configurar_logging(nivel: Optional[str] = None, modo_silencioso: Optional[bool] = None,
+                       archivo_jsonl: Optional[str] = None) -> logging.Logger:
+    """
+    Configura el logger raíz del scraper (consola + sink JSON-lines opcional)
+
+    Args:
+        nivel (str, optional): Nivel de consola ('DEBUG', 'INFO', ...)
+        modo_silencioso (bool, optional): Si True, la consola solo muestra warnings
+            y el progreso se reporta en una única línea
+        archivo_jsonl (str, optional): Archivo donde escribir los logs en JSON-lines
+
+    Returns:
+        logging.Logger: Logger raíz configurado
+    """
+    global _listener_jsonl
+
+    nivel = (nivel or LOGGING_CONFIG['nivel']).upper()
+    if modo_silencioso is None:
+        modo_silencioso = LOGGING_CONFIG['modo_silencioso']
+    archivo_jsonl = archivo_jsonl or LOGGING_CONFIG['archivo_jsonl']
+
+    logger = logging.getLogger(NOMBRE_LOGGER_RAIZ)
+    detener_logging()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+
+    consola = _ConsolaHandler(sys.stdout)
+    consola.setLevel(logging.WARNING if modo_silencioso else getattr(logging, nivel, logging.INFO))
+    consola.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(consola)
+
+    # El sink JSON-lines escribe desde un hilo en segundo plano vía QueueListener
+    if archivo_jsonl:
+        cola = queue.SimpleQueue()
+        archivo = logging.FileHandler(archivo_jsonl, encoding='utf-8')
+        archivo.setFormatter(_FormateadorJSON())
+        _listener_jsonl = logging.handlers.QueueListener(cola, archivo, respect_handler_level=False)
+        _listener_jsonl.start()
+
+        handler_cola = logging.handlers.QueueHandler(cola)
+        handler_cola.setLevel(getattr(logging, LOGGING_CONFIG['nivel_jsonl'].upper(), logging.DEBUG))
+        logger.addHandler(handler_cola)
+
+    return logger
+
+
+def detener_logging() -> None:
+    """Vacía y detiene el hilo del sink JSON-lines si está activo"""
+    global _listener_jsonl
+
+    if _listener_jsonl is not None:
+        _listener_jsonl.stop()
+        for handler in _listener_jsonl.handlers:
+            handler.close()
+        _listener_jsonl = None
+
+
+def obtener_logger(nombre: str) -> logging.Logger:
+    """
+    Devuelve un logger hijo del logger raíz del scraper
+
+    Args:
+        nombre (str): Nombre del módulo
+
+    Returns:
+        logging.Logger: Logger del módulo
+    """
+    return logging.getLogger(f"{NOMBRE_LOGGER_RAIZ}.{nombre}")
+
+
+class ProgresoBatch:
+    """Línea de progreso única y limitada en frecuencia, con throughput y ETA"""
+
+    def __init__(self, total: Optional[int] = None, activo: Optional[bool] = None,
+                 intervalo: Optional[float] = None, stream=None):
+        """
+        Args:
+            total (int, optional): Total de perfiles esperados (None si se desconoce)
+            activo (bool, optional): Si renderizar la línea (por defecto, en modo silencioso)
+            intervalo (float, optional): Segundos mínimos entre renders
+            stream: Stream de salida (stdout por defecto)
+        """
+        self.total = total
+        self.activo = LOGGING_CONFIG['modo_silencioso'] if activo is None else activo
+        self.intervalo = intervalo if intervalo is not None else LOGGING_CONFIG['intervalo_progreso']
+        self.stream = stream or sys.stdout
+        self.inicio = time.monotonic()
+        self.ultimo_render = 0.0
+        self.procesados = 0
+        self.exitosos = 0
+        self.fallidos = 0
+
+    def actualizar(self, exito: bool) -> None:
+        """Registra un perfil procesado y re-renderiza si pasó el intervalo"""
+        self.procesados += 1
+        if exito:
+            self.exitosos += 1
+        else:
+            self.fallidos += 1
+
+        ahora = time.monotonic()
+        if ahora - self.ultimo_render >= self.intervalo:
+            self.ultimo_render = ahora
+            self._render(ahora)
+
+    def _render(self, ahora: float) -> None:
+        if not self.activo:
+            return
+
+        transcurrido = max(ahora - self.inicio, 1e-9)
+        por_minuto = self.procesados / transcurrido * 60
+
+        if self.total:
+            restantes = max(self.total - self.procesados, 0)
+            eta = restantes / (self.procesados / transcurrido) if self.procesados else 0
+            avance = f"{self.procesados}/{self.total}"
+            eta_txt = time.strftime('%H:%M:%S', time.gmtime(eta))
+        else:
+            avance = str(self.procesados)
+            eta_txt = '--:--:--'
+
+        linea = (f"\r⏳ {avance} | ✅ {self.exitosos} ❌ {self.fallidos} | "
+                 f"{por_minuto:.1f} perfiles/min | ETA {eta_txt}")
+        self.stream.write(linea)
+        self.stream.flush()
+        _ConsolaHandler.linea_progreso_activa = True
+
+    def finalizar(self) -> None:
+        """Renderiza el estado final y cierra la línea de progreso"""
+        self._render(time.monotonic())
+        if self.activo and _ConsolaHandler.linea_progreso_activa:
+            self.stream.write('\n')
+            self.stream.flush()
+            _ConsolaHandler.linea_progreso_activa = False
@@ -1,15 +1,92 @@
-import requests
 import json
 import time
 import re
 import os
 import getpass
+from contextlib import contextmanager
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import TimeoutException
+from config import CHROMEDRIVER_PATH, LOGIN_CONFIG
+from transport import crear_sesion
+
+# ==============================================================================
+# NAVEGADOR: RESOLUCIÓN DEL DRIVER, PERFIL REUTILIZABLE Y CARGA LIVIANA
+# ==============================================================================
+
+def resolver_chromedriver():
+    """
+    Devuelve la ruta de chromedriver sin consultar la red si ya se conoce
+    
+    Orden: config.CHROMEDRIVER_PATH, la ruta cacheada por una ejecución anterior y, como
+    último recurso, webdriver-manager (que verifica versiones por red); su resultado se cachea.
+    """
+    if CHROMEDRIVER_PATH and os.path.isfile(CHROMEDRIVER_PATH):
+        return CHROMEDRIVER_PATH
+    
+    cache = LOGIN_CONFIG['cache_driver']
+    if os.path.exists(cache):
+        with open(cache) as f:
+            ruta = f.read().strip()
+        if os.path.isfile(ruta):
+            return ruta
+    
+    from webdriver_manager.chrome import ChromeDriverManager
+    ruta = ChromeDriverManager().install()
+    try:
+        with open(cache, 'w') as f:
+            f.write(ruta)
+    except OSError as e:
+        print(f"[!] No se pudo cachear la ruta de chromedriver: {e}")
+    return ruta
+
+
+def crear_driver(headless=True):
+    """Crea el Chrome de login: perfil persistente, carga 'eager' y sin imágenes"""
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36')
+    
+    # Perfil reutilizable: conserva cookies (y la sesión) entre ejecuciones
+    if LOGIN_CONFIG['directorio_perfil']:
+        options.add_argument(f"--user-data-dir={os.path.abspath(LOGIN_CONFIG['directorio_perfil'])}")
+    
+    # No esperar a que terminen de cargar imágenes y subrecursos: los tokens están en el HTML
+    options.page_load_strategy = LOGIN_CONFIG['estrategia_carga']
+    if LOGIN_CONFIG['bloquear_imagenes']:
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        options.add_argument('--blink-settings=imagesEnabled=false')
+    
+    service = Service(resolver_chromedriver())
+    return webdriver.Chrome(service=service, options=options)
+
+
+class TiemposLogin:
+    """Duración de cada fase del login, para mostrar el desglose al final"""
+    
+    def __init__(self):
+        self.fases = []
+    
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases.append((nombre, time.perf_counter() - inicio))
+    
+    def mostrar(self):
+        total = sum(duracion for _, duracion in self.fases)
+        detalle = ' | '.join(f"{nombre} {duracion:.1f}s" for nombre, duracion in self.fases)
+        print(f"[⏱️] Login en {total:.1f}s: {detalle}")
 
 # ==============================================================================
 # MÓDULO DE LOGIN CENTRALIZADO PARA INSTAGRAM
@@ -23,8 +100,14 @@ class InstagramLogin:
         self.username = None
         self.password = None
     
-    def get_credentials(self):
-        """Obtiene credenciales del usuario con prompt seguro"""
+    def get_credentials(self, interactivo=True):
+        """
+        Obtiene credenciales del usuario con prompt seguro
+        
+        Sin `interactivo` no pregunta nada (re-autenticación en un batch desatendido): usa las
+        credenciales guardadas si existen, o devuelve (None, None) y solo queda reutilizar la
+        sesión del perfil de Chrome.
+        """
         print("=== CREDENCIALES DE INSTAGRAM ===")
         
         # Intentar cargar credenciales guardadas
@@ -34,7 +117,7 @@ class InstagramLogin:
                     saved_creds = json.load(f)
                 
                 print(f"[*] Se encontraron credenciales guardadas para: {saved_creds.get('username', 'N/A')}")
-                use_saved = input("¿Usar credenciales guardadas? (s/n): ").lower().strip()
+                use_saved = input("¿Usar credenciales guardadas? (s/n): ").lower().strip() if interactivo else 's'
                 
                 if use_saved in ['s', 'si', 'y', 'yes', '']:
                     self.username = saved_creds['username']
@@ -44,6 +127,10 @@ class InstagramLogin:
             except Exception as e:
                 print(f"[!] Error leyendo credenciales guardadas: {e}")
         
+        if not interactivo:
+            print("[!] Sin credenciales guardadas: solo se puede reutilizar la sesión del perfil de Chrome")
+            return None, None
+        
         # Pedir credenciales nuevas
         print("\n[*] Ingresa tus credenciales de Instagram:")
         self.username = input("Username: ").strip()
@@ -68,99 +155,123 @@ class InstagramLogin:
         
         return self.username, self.password
     
-    def authenticate(self, headless=True):
+    def authenticate(self, headless=True, interactivo=True):
         """
         Proceso completo de autenticación:
         1. Obtiene credenciales del usuario
-        2. Hace login con Selenium
+        2. Hace login con Selenium (o reutiliza la sesión del perfil de Chrome)
         3. Extrae tokens dinámicos
         4. Configura sesión de requests
         5. Devuelve sesión lista para usar
+        
+        Sin `interactivo` nunca lee la consola: si no hay credenciales guardadas ni sesión en el
+        perfil de Chrome, o Instagram pide verificación manual, devuelve False.
         """
         print("=== AUTENTICACIÓN DE INSTAGRAM ===\n")
+        tiempos = TiemposLogin()
         
         # 1. Obtener credenciales
-        username, password = self.get_credentials()
+        username, password = self.get_credentials(interactivo)
+        if not username and not LOGIN_CONFIG['directorio_perfil']:
+            print("[!] Sin credenciales guardadas ni perfil de Chrome: no se puede autenticar sin intervención")
+            return False
         
         # 2. Configurar Selenium
         print(f"\n[*] Iniciando autenticación para: {username}")
         print("[*] Configurando navegador...")
         
-        options = webdriver.ChromeOptions()
-        if headless:
-            options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36')
-        
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
+        with tiempos.fase('driver'):
+            driver = crear_driver(headless)
         
         try:
-            # 3. Hacer login
-            print("[*] Accediendo a Instagram...")
-            driver.get("https://www.instagram.com/accounts/login/")
-            wait = WebDriverWait(driver, 15)
-            
-            # Llenar formulario de login
-            print("[*] Llenando formulario de login...")
-            user_input = wait.until(EC.element_to_be_clickable((By.NAME, 'username')))
-            pass_input = wait.until(EC.element_to_be_clickable((By.NAME, 'password')))
+            wait = WebDriverWait(driver, LOGIN_CONFIG['timeout_espera'])
             
-            user_input.send_keys(username)
-            pass_input.send_keys(password)
-            
-            login_button = driver.find_element(By.XPATH, "//button[@type='submit']")
-            login_button.click()
+            # 3. Hacer login (el perfil de Chrome puede conservar una sesión anterior)
+            print("[*] Accediendo a Instagram...")
+            with tiempos.fase('carga_login'):
+                driver.get("https://www.instagram.com/accounts/login/")
+                wait.until(lambda d: d.get_cookie('sessionid') or d.find_elements(By.NAME, 'username'))
             
-            # Esperar login exitoso
-            print("[*] Esperando confirmación de login...")
-            try:
-                wait.until(EC.presence_of_element_located((By.XPATH, "//a[contains(@href, '/direct/inbox/')]")))
-                print("[+] ¡Login exitoso!")
-            except:
-                # Verificar si hay verificación adicional requerida
-                if "challenge" in driver.current_url or "two_factor" in driver.current_url:
+            if driver.get_cookie('sessionid'):
+                print("[+] Sesión reutilizada del perfil de Chrome")
+            elif not username:
+                print("[!] El perfil de Chrome no tiene sesión y no hay credenciales guardadas")
+                return False
+            else:
+                # Llenar formulario de login
+                print("[*] Llenando formulario de login...")
+                with tiempos.fase('formulario'):
+                    user_input = wait.until(EC.element_to_be_clickable((By.NAME, 'username')))
+                    pass_input = wait.until(EC.element_to_be_clickable((By.NAME, 'password')))
+                    
+                    user_input.send_keys(username)
+                    pass_input.send_keys(password)
+                    
+                    login_button = driver.find_element(By.XPATH, "//button[@type='submit']")
+                    login_button.click()
+                
+                # Esperar login exitoso: cookie de sesión o pedido de verificación
+                print("[*] Esperando confirmación de login...")
+                with tiempos.fase('confirmacion'):
+                    try:
+                        wait.until(lambda d: d.get_cookie('sessionid')
+                                   or "challenge" in d.current_url or "two_factor" in d.current_url)
+                    except TimeoutException:
+                        pass
+                
+                if driver.get_cookie('sessionid'):
+                    print("[+] ¡Login exitoso!")
+                elif "challenge" in driver.current_url or "two_factor" in driver.current_url:
                     print("[!] Se requiere verificación adicional.")
+                    if not interactivo:
+                        print("[!] No se puede completar sin intervención.")
+                        return False
                     print("[!] Por favor, completa la verificación manualmente en el navegador.")
                     input("Presiona Enter cuando hayas completado la verificación...")
                 else:
                     print("[!] Login puede haber fallado. Continuando...")
-                    time.sleep(5)
             
-            # 4. Ir a un perfil para extraer tokens
+            # 4. Ir a un perfil para extraer tokens: se espera a que el HTML traiga los tokens
             print("[*] Extrayendo tokens de autenticación...")
-            driver.get("https://www.instagram.com/instagram/")
-            time.sleep(3)
-            
-            # 5. Extraer valores dinámicos del HTML
-            page_source = driver.page_source
+            with tiempos.fase('carga_tokens'):
+                driver.get("https://www.instagram.com/instagram/")
+                try:
+                    wait.until(lambda d: d.execute_script(
+                        "const html = document.documentElement.innerHTML;"
+                        "return html.includes('DTSGInitialData') && html.includes('LSD');"
+                    ))
+                except TimeoutException:
+                    print("[!] Los tokens no aparecieron a tiempo; se intenta con el HTML actual")
             
-            # Extraer CSRF token
-            csrf_token = self._extract_csrf_token(driver, page_source)
-            
-            # Extraer fb_lsd
-            fb_lsd = self._extract_fb_lsd(page_source)
-            
-            # Extraer fb_dtsg
-            fb_dtsg = self._extract_fb_dtsg(page_source)
-            
-            # Doc ID para GraphQL
-            doc_id = "7663787143717254"  # Doc ID que funciona para PolarisProfilePageContentQuery
-            
-            # 6. Obtener cookies
-            cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
-            
-            # 7. Obtener user agent
-            user_agent = driver.execute_script("return navigator.userAgent;")
+            with tiempos.fase('extraccion'):
+                # 5. Extraer valores dinámicos del HTML
+                page_source = driver.page_source
+                
+                # Extraer CSRF token
+                csrf_token = self._extract_csrf_token(driver, page_source)
+                
+                # Extraer fb_lsd
+                fb_lsd = self._extract_fb_lsd(page_source)
+                
+                # Extraer fb_dtsg
+                fb_dtsg = self._extract_fb_dtsg(page_source)
+                
+                # Doc ID para GraphQL
+                doc_id = "7663787143717254"  # Doc ID que funciona para PolarisProfilePageContentQuery
+                
+                # 6. Obtener cookies (y su expiración, para re-autenticar antes de que caduquen)
+                cookies_navegador = driver.get_cookies()
+                cookies = {cookie['name']: cookie['value'] for cookie in cookies_navegador}
+                expiraciones = {cookie['name']: cookie['expiry'] for cookie in cookies_navegador if 'expiry' in cookie}
+                
+                # 7. Obtener user agent
+                user_agent = driver.execute_script("return navigator.userAgent;")
             
             # 8. Mostrar estado de tokens
             self._show_token_status(csrf_token, fb_lsd, fb_dtsg)
             
-            # 9. Configurar sesión de requests
-            session = requests.Session()
+            # 9. Configurar sesión HTTP (pools, keep-alive y compresión desde TRANSPORT_CONFIG)
+            session = crear_sesion()
             session.cookies.update(cookies)
             
             # Headers importantes
@@ -184,7 +295,8 @@ class InstagramLogin:
                 'fb_lsd': fb_lsd,
                 'fb_dtsg': fb_dtsg,
                 'doc_id': doc_id,
-                'user_agent': user_agent
+                'user_agent': user_agent,
+                'expiraciones': expiraciones
             }
             
             self.session = session
@@ -198,7 +310,9 @@ class InstagramLogin:
             print(f"[!] Error durante la autenticación: {e}")
             return False
         finally:
-            driver.quit()
+            with tiempos.fase('cierre'):
+                driver.quit()
+            tiempos.mostrar()
     
     def _extract_csrf_token(self, driver, page_source):
         """Extrae el CSRF token del HTML"""
@@ -218,6 +332,12 @@ class InstagramLogin:
             if csrf_match:
                 csrf_token = csrf_match.group(1)
         
+        # Método 3: Cookie csrftoken
+        if not csrf_token:
+            cookie = driver.get_cookie('csrftoken')
+            if cookie:
+                csrf_token = cookie['value']
+        
         return csrf_token
     
     def _extract_fb_lsd(self, page_source):
@@ -280,19 +400,20 @@ class InstagramLogin:
 # FUNCIÓN DE CONVENIENCIA
 # ==============================================================================
 
-def get_instagram_session(headless=True):
+def get_instagram_session(headless=True, interactivo=True):
     """
     Función de conveniencia para obtener una sesión autenticada de Instagram
     
     Args:
         headless (bool): Si ejecutar el navegador en modo headless
+        interactivo (bool): Si puede pedir credenciales o confirmaciones por consola
     
     Returns:
         tuple: (session, tokens, username) si es exitoso, (None, None, None) si falla
     """
     login = InstagramLogin()
     
-    if login.authenticate(headless=headless):
+    if login.authenticate(headless=headless, interactivo=interactivo):
         return login.get_session(), login.get_tokens(), login.get_username()
     else:
         return None, None, None
@@ -0,0 +1,566 @@
+import argparse
+import sqlite3
+from typing import Callable, Dict, List, Tuple
+
+from logger import configurar_logging, obtener_logger, detener_logging
+
+logger = obtener_logger('migraciones')
+
+# ==============================================================================
+# MIGRACIONES DE ESQUEMA VERSIONADAS (PRAGMA user_version)
+# ==============================================================================
+#
+# Cada migración se aplica una sola vez, en orden, dentro de una transacción que también
+# actualiza PRAGMA user_version. Las migraciones ya publicadas no se editan: un cambio
+# posterior (por ejemplo, otro predicado para un índice parcial) va en una migración nueva.
+
+def agregar_columnas_faltantes(cursor: sqlite3.Cursor, tabla: str, columnas: Dict[str, str]) -> None:
+    """
+    Agrega a una tabla existente las columnas que aún no tenga
+
+    Args:
+        cursor: Cursor de la conexión activa
+        tabla (str): Nombre de la tabla
+        columnas (Dict[str, str]): Nombre -> definición SQL de cada columna
+    """
+    # table_xinfo incluye las columnas generadas, que table_info oculta
+    cursor.execute(f'PRAGMA table_xinfo({tabla})')
+    existentes = {fila[1] for fila in cursor.fetchall()}
+
+    for nombre, definicion in columnas.items():
+        if nombre not in existentes:
+            cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {nombre} {definicion}')
+
+
+def _m001_esquema_inicial(cursor: sqlite3.Cursor) -> None:
+    """Columnas e índices agregados antes de existir las migraciones"""
+    agregar_columnas_faltantes(cursor, 'usuarios_unicos', {
+        'id_instagram': 'TEXT',
+    })
+    agregar_columnas_faltantes(cursor, 'media_urls', {
+        'hash_contenido': 'TEXT',
+        'ruta_archivo': 'TEXT',
+        'estado_descarga': "TEXT DEFAULT 'pendiente'",
+        'intentos_descarga': 'INTEGER DEFAULT 0',
+        'fecha_descarga': 'TIMESTAMP',
+        'url_expira': 'TIMESTAMP',
+    })
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_username ON media_urls(username)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_tipo ON media_urls(tipo_media)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_fecha ON usuarios_unicos(fecha_scraping)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_descarga ON media_urls(estado_descarga, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_expira ON media_urls(url_expira)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_actualizacion ON usuarios_unicos(ultima_actualizacion, username)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_fecha_username ON usuarios_unicos(fecha_scraping, username)')
+
+
+def _m002_indice_parcial_pendientes(cursor: sqlite3.Cursor) -> None:
+    """
+    Índice parcial para el cursor de usuarios pendientes: solo contiene los perfiles pendientes,
+    ya ordenados por ultima_actualizacion. El WHERE debe coincidir con el de la consulta
+    para que el planificador pueda usarlo.
+    """
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usuarios_pendientes
+        ON usuarios_unicos(ultima_actualizacion, username)
+        WHERE cantidad_seguidores IS NULL
+           OR cantidad_seguidos IS NULL
+           OR cantidad_publicaciones IS NULL
+           OR perfil_inactivo = TRUE
+    ''')
+
+
+def _m003_indices_cubrientes(cursor: sqlite3.Cursor) -> None:
+    """
+    Índices cubrientes para estadísticas y consultas de media (la consulta se resuelve
+    solo con el índice, sin leer la tabla). Se eliminan los índices que pasan a ser prefijo
+    redundante de uno nuevo.
+    """
+    # obtener_estadisticas: conteos de inactivos / privados / negocio en una sola pasada
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usuarios_estadisticas
+        ON usuarios_unicos(perfil_inactivo, perfil_privado, categoria)
+    ''')
+    # Media por usuario y tipo con sus métricas (engagement, reemplazo de media)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_media_usuario_tipo
+        ON media_urls(username, tipo_media, cantidad_likes, cantidad_comentarios)
+    ''')
+    cursor.execute('DROP INDEX IF EXISTS idx_media_username')
+    # Perfiles con media por expirar: el username sale del índice, sin leer la fila
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_expira_usuario ON media_urls(url_expira, username)')
+    cursor.execute('DROP INDEX IF EXISTS idx_media_expira')
+
+
+def _m004_resumen_engagement(cursor: sqlite3.Cursor) -> None:
+    """Tablas de resumen que escribe engagement.py (por perfil y por categoría)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS engagement_perfiles (
+            username TEXT PRIMARY KEY,
+            categoria TEXT,
+            seguidores INTEGER,
+            posts INTEGER,
+            likes_promedio REAL,
+            likes_p50 REAL,
+            likes_p90 REAL,
+            comentarios_promedio REAL,
+            comentarios_p50 REAL,
+            comentarios_p90 REAL,
+            tasa_engagement REAL,
+            proporcion_video REAL,
+            fecha_calculo TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS engagement_categorias (
+            categoria TEXT PRIMARY KEY,
+            perfiles INTEGER,
+            posts INTEGER,
+            tasa_engagement_p50 REAL,
+            tasa_engagement_p90 REAL,
+            likes_p50 REAL,
+            proporcion_video REAL,
+            fecha_calculo TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_engagement_tasa ON engagement_perfiles(tasa_engagement)')
+
+
+def _m005_fallos_perfiles(cursor: sqlite3.Cursor) -> None:
+    """
+    Clasificación de fallos con reintentos programados: tipo del último fallo, intentos
+    consecutivos, fecha desde la que vuelve a ser elegible y estado ('reintentar' con backoff
+    o 'descartado' en caché negativa). El índice parcial de pendientes se recrea con
+    proximo_intento para filtrar los no elegibles sin leer la tabla.
+    """
+    agregar_columnas_faltantes(cursor, 'usuarios_unicos', {
+        'tipo_fallo': 'TEXT',
+        'intentos_fallidos': 'INTEGER DEFAULT 0',
+        'proximo_intento': 'TIMESTAMP',
+        'estado_fallo': 'TEXT',
+    })
+    cursor.execute('DROP INDEX IF EXISTS idx_usuarios_pendientes')
+    cursor.execute('''
+        CREATE INDEX idx_usuarios_pendientes
+        ON usuarios_unicos(ultima_actualizacion, username, proximo_intento)
+        WHERE cantidad_seguidores IS NULL
+           OR cantidad_seguidos IS NULL
+           OR cantidad_publicaciones IS NULL
+           OR perfil_inactivo = TRUE
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_usuarios_fallos ON usuarios_unicos(estado_fallo, tipo_fallo) '
+                   'WHERE estado_fallo IS NOT NULL')
+
+
+def _m006_contenido_destacadas(cursor: sqlite3.Cursor) -> None:
+    """
+    Contenido de las destacadas. media_urls guarda el id de Instagram de cada destacada
+    (id_externo), que se mantiene aunque la fila se reemplace en cada scraping; por él se
+    enlazan `destacadas` (título y portada con los que se obtuvo el contenido, para saltar
+    las que no cambiaron) e `items_destacadas` (un registro por reel de la destacada).
+    """
+    agregar_columnas_faltantes(cursor, 'media_urls', {
+        'id_externo': 'TEXT',
+    })
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_id_externo ON media_urls(id_externo) '
+                   'WHERE id_externo IS NOT NULL')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS destacadas (
+            id_destacada TEXT PRIMARY KEY,
+            username TEXT,
+            titulo TEXT,
+            ruta_portada TEXT,
+            cantidad_items INTEGER DEFAULT 0,
+            fecha_contenido TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (username) REFERENCES usuarios_unicos (username)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_destacadas_username ON destacadas(username)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS items_destacadas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_destacada TEXT NOT NULL,
+            username TEXT,
+            id_item TEXT NOT NULL,
+            orden INTEGER,
+            subtipo TEXT CHECK(subtipo IN ('foto', 'video')),
+            url_media TEXT,
+            url_miniatura TEXT,
+            fecha_publicacion TIMESTAMP,
+            url_expira TIMESTAMP,
+            fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (id_destacada, id_item),
+            FOREIGN KEY (id_destacada) REFERENCES destacadas (id_destacada)
+        )
+    ''')
+
+
+def _m007_detalle_posts(cursor: sqlite3.Cursor) -> None:
+    """
+    Detalle normalizado de los posts, enlazado con media_urls por shortcode (id_externo):
+    un post tiene uno o más recursos (los hijos de un carrusel, o el propio post) y cada
+    recurso sus variantes de imagen y video por resolución, marcando la seleccionada.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS posts (
+            shortcode TEXT PRIMARY KEY,
+            username TEXT,
+            id_post TEXT,
+            tipo TEXT CHECK(tipo IN ('foto', 'video', 'carrusel')),
+            texto TEXT,
+            fecha_publicacion TIMESTAMP,
+            cantidad_recursos INTEGER DEFAULT 1,
+            fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (username) REFERENCES usuarios_unicos (username)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_username ON posts(username, fecha_publicacion)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recursos_post (
+            shortcode TEXT NOT NULL,
+            orden INTEGER NOT NULL,
+            id_recurso TEXT,
+            es_video BOOLEAN DEFAULT FALSE,
+            PRIMARY KEY (shortcode, orden),
+            FOREIGN KEY (shortcode) REFERENCES posts (shortcode)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS variantes_recurso (
+            shortcode TEXT NOT NULL,
+            orden INTEGER NOT NULL,
+            tipo TEXT CHECK(tipo IN ('imagen', 'video')),
+            ancho INTEGER,
+            alto INTEGER,
+            url TEXT,
+            url_expira TIMESTAMP,
+            seleccionada BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (shortcode, orden) REFERENCES recursos_post (shortcode, orden)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_variantes_recurso ON variantes_recurso(shortcode, orden)')
+
+
+def _m008_cambios(cursor: sqlite3.Cursor) -> None:
+    """
+    Registro de cambios (CDC) de perfiles y media, solo de inserción.
+
+    AUTOINCREMENT garantiza que seq nunca se reutilice, aunque la retención archive y borre
+    los eventos más viejos: un consumidor que guarda su último seq no se salta ni repite nada.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cambios (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            entidad TEXT NOT NULL CHECK(entidad IN ('usuario', 'media')),
+            username TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            operacion TEXT NOT NULL CHECK(operacion IN ('alta', 'modificacion', 'baja')),
+            campos TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cambios_fecha ON cambios(fecha)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS consumidores_cambios (
+            consumidor TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL DEFAULT 0,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m009_prioridad_batch(cursor: sqlite3.Cursor) -> None:
+    """
+    Orden por valor de los perfiles y posición de reanudación de los batches.
+
+    nivel_seguidores es una columna generada (virtual, no ocupa espacio) con el escalón de
+    seguidores del perfil, 0 el más alto. Como columna, y no como expresión, el índice parcial
+    permite paginar con keyset sobre (nivel_seguidores, ultima_actualizacion, username) buscando
+    en el índice en lugar de recorrerlo desde el principio en cada página.
+    """
+    agregar_columnas_faltantes(cursor, 'usuarios_unicos', {
+        'nivel_seguidores': '''INTEGER GENERATED ALWAYS AS (
+            CASE WHEN cantidad_seguidores >= 1000000 THEN 0
+                 WHEN cantidad_seguidores >= 100000 THEN 1
+                 WHEN cantidad_seguidores >= 10000 THEN 2
+                 ELSE 3 END
+        ) VIRTUAL''',
+    })
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usuarios_pendientes_nivel
+        ON usuarios_unicos(nivel_seguidores, ultima_actualizacion, username, proximo_intento)
+        WHERE cantidad_seguidores IS NULL
+           OR cantidad_seguidos IS NULL
+           OR cantidad_publicaciones IS NULL
+           OR perfil_inactivo = TRUE
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS posiciones_batch (
+            nombre TEXT PRIMARY KEY,
+            posicion TEXT NOT NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m010_fechas_consulta(cursor: sqlite3.Cursor) -> None:
+    """
+    Fecha de la última respuesta correcta de cada consulta del perfil (usuario, posts y
+    destacadas), para refrescar cada una con su propio intervalo. Son NOT NULL con la época
+    como "nunca consultada" para que el recorrido por consulta vencida pagine con keyset
+    sobre (fecha, username) sin casos especiales para NULL. Los perfiles ya completos toman
+    su fecha_scraping.
+    """
+    for columna in ('fecha_consulta_usuario', 'fecha_consulta_posts', 'fecha_consulta_destacadas'):
+        agregar_columnas_faltantes(cursor, 'usuarios_unicos', {
+            columna: "TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:00'",
+        })
+        cursor.execute(f'''
+            UPDATE usuarios_unicos SET {columna} = fecha_scraping
+            WHERE fecha_scraping IS NOT NULL AND cantidad_seguidores IS NOT NULL
+              AND perfil_inactivo = FALSE
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_usuarios_{columna}
+            ON usuarios_unicos({columna}, username)
+            WHERE id_instagram IS NOT NULL AND NOT perfil_inactivo
+        ''')
+
+
+def _m011_indice_nivel(cursor: sqlite3.Cursor) -> None:
+    """
+    Índice completo para el orden por seguidores con force_rescrape.
+
+    Sin el filtro de pendientes el índice parcial de la migración 009 no aplica, y el planner
+    caía en idx_usuarios_actualizacion ordenando toda la tabla en cada página. Con este
+    índice las páginas del recorrido también buscan por (nivel, ultima_actualizacion, username).
+    """
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_usuarios_nivel
+        ON usuarios_unicos(nivel_seguidores, ultima_actualizacion, username, proximo_intento)
+    ''')
+
+
+def _m012_nivel_sin_seguidores(cursor: sqlite3.Cursor) -> None:
+    """
+    Escalón propio, el primero, para los perfiles sin cantidad_seguidores.
+
+    Con la expresión de la migración 009 los perfiles nunca scrapeados (seguidores NULL) caían
+    en el escalón más bajo, y con el orden 'seguidores' los usernames recién importados
+    esperaban detrás de todo el backlog de re-scrapeo. Ahora van primero (nivel -1): su valor
+    no se conoce hasta scrapearlos. Una columna generada no se puede modificar, así que se
+    eliminan sus índices y la columna y se vuelven a crear.
+    """
+    cursor.execute('DROP INDEX IF EXISTS idx_usuarios_pendientes_nivel')
+    cursor.execute('DROP INDEX IF EXISTS idx_usuarios_nivel')
+    cursor.execute('ALTER TABLE usuarios_unicos DROP COLUMN nivel_seguidores')
+    cursor.execute('''
+        ALTER TABLE usuarios_unicos ADD COLUMN nivel_seguidores INTEGER GENERATED ALWAYS AS (
+            CASE WHEN cantidad_seguidores IS NULL THEN -1
+                 WHEN cantidad_seguidores >= 1000000 THEN 0
+                 WHEN cantidad_seguidores >= 100000 THEN 1
+                 WHEN cantidad_seguidores >= 10000 THEN 2
+                 ELSE 3 END
+        ) VIRTUAL
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_usuarios_pendientes_nivel
+        ON usuarios_unicos(nivel_seguidores, ultima_actualizacion, username, proximo_intento)
+        WHERE cantidad_seguidores IS NULL
+           OR cantidad_seguidos IS NULL
+           OR cantidad_publicaciones IS NULL
+           OR perfil_inactivo = TRUE
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_usuarios_nivel
+        ON usuarios_unicos(nivel_seguidores, ultima_actualizacion, username, proximo_intento)
+    ''')
+
+
+def _m013_lapidas_retencion(cursor: sqlite3.Cursor) -> None:
+    """
+    Marca de archivo para los perfiles inactivos que la retención reduce a lápida.
+
+    La política 'perfiles_inactivos' ya no borra la fila: conserva el username y el estado de
+    fallo (caché negativa) y vacía el resto. fecha_archivado evita volver a archivar la lápida y
+    se limpia cuando el perfil se vuelve a guardar.
+    """
+    agregar_columnas_faltantes(cursor, 'usuarios_unicos', {
+        'fecha_archivado': 'TIMESTAMP',
+    })
+
+
+MIGRACIONES: List[Tuple[int, str, Callable]] = [
+    (1, 'esquema_inicial', _m001_esquema_inicial),
+    (2, 'indice_parcial_pendientes', _m002_indice_parcial_pendientes),
+    (3, 'indices_cubrientes', _m003_indices_cubrientes),
+    (4, 'resumen_engagement', _m004_resumen_engagement),
+    (5, 'fallos_perfiles', _m005_fallos_perfiles),
+    (6, 'contenido_destacadas', _m006_contenido_destacadas),
+    (7, 'detalle_posts', _m007_detalle_posts),
+    (8, 'cambios', _m008_cambios),
+    (9, 'prioridad_batch', _m009_prioridad_batch),
+    (10, 'fechas_consulta', _m010_fechas_consulta),
+    (11, 'indice_nivel', _m011_indice_nivel),
+    (12, 'nivel_sin_seguidores', _m012_nivel_sin_seguidores),
+    (13, 'lapidas_retencion', _m013_lapidas_retencion),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+def version_esquema(conn: sqlite3.Connection) -> int:
+    """Devuelve la versión de esquema registrada en PRAGMA user_version"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def aplicar_migraciones(conn: sqlite3.Connection) -> int:
+    """
+    Aplica en orden las migraciones pendientes, cada una en su propia transacción
+
+    Args:
+        conn (sqlite3.Connection): Conexión a la base de datos (sin transacción abierta)
+
+    Returns:
+        int: Versión de esquema resultante
+    """
+    version = version_esquema(conn)
+    pendientes = [m for m in MIGRACIONES if m[0] > version]
+    if not pendientes:
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    nivel_aislamiento = conn.isolation_level
+    conn.isolation_level = None  # Transacciones explícitas
+    try:
+        for numero, nombre, migracion in pendientes:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                # Otro proceso pudo aplicarla mientras se esperaba el lock
+                if version_esquema(conn) >= numero:
+                    cursor.execute('COMMIT')
+                    continue
+                migracion(cursor)
+                cursor.execute(f'PRAGMA user_version = {numero}')
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                logger.error(f"[!] Falló la migración {numero:03d} ({nombre})")
+                raise
+            logger.info(f"[+] Migración {numero:03d} aplicada: {nombre}")
+            version = numero
+    finally:
+        conn.isolation_level = nivel_aislamiento
+
+    return version
+
+
+# ==============================================================================
+# DIAGNÓSTICO: PLANES DE LAS CONSULTAS CRÍTICAS
+# ==============================================================================
+
+# Consulta crítica -> (SQL representativo, parámetros, índice que debe usar). Las páginas de los
+# cursores keyset no se copian aquí: su SQL lo arma el propio cursor (ver _paginas_cursores)
+CONSULTAS_CRITICAS = {
+    'estadisticas_usuarios': ('''
+        SELECT COUNT(*),
+               COALESCE(SUM(perfil_inactivo = TRUE), 0),
+               COALESCE(SUM(perfil_privado = TRUE), 0),
+               COUNT(categoria)
+        FROM usuarios_unicos
+    ''', (), 'idx_usuarios_estadisticas'),
+    'media_por_usuario': ('''
+        SELECT tipo_media, cantidad_likes, cantidad_comentarios FROM media_urls
+        WHERE username = ?
+    ''', ('',), 'idx_media_usuario_tipo'),
+    'media_por_expirar': ('''
+        SELECT m.username, MIN(m.url_expira) FROM media_urls m
+        WHERE m.url_expira <= datetime('now', '+12 hours')
+        GROUP BY +m.username
+    ''', (), 'idx_media_expira_usuario'),
+}
+
+
+def plan_consulta(conn: sqlite3.Connection, sql: str, parametros: tuple = ()) -> List[str]:
+    """Devuelve las líneas de EXPLAIN QUERY PLAN de una consulta"""
+    return [fila[-1] for fila in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros).fetchall()]
+
+
+def _paginas_cursores() -> Dict[str, Tuple[str, List, str]]:
+    """
+    Páginas de los cursores keyset de database.py a mitad de recorrido, con el índice que deben usar
+
+    El SQL sale de consulta_pagina() de cada cursor, así que se verifica exactamente lo que
+    ejecuta el recorrido (con la condición de keyset, que es la que debe buscar en el índice).
+    """
+    from database import CursorConsultaVencida, CursorPendientes
+
+    def pendientes(orden: str, force_rescrape: bool) -> CursorPendientes:
+        return CursorPendientes('', posicion={
+            'fase': 1, 'orden': orden, 'force_rescrape': force_rescrape, 'inicio': '',
+            'ultima_clave': [0, '', ''] if orden == 'seguidores' else ['', ''],
+        })
+
+    def vencida(consulta: str) -> CursorConsultaVencida:
+        return CursorConsultaVencida('', consulta, None, posicion={
+            'consulta': consulta, 'corte': '', 'ultima_clave': ['', ''],
+        })
+
+    cursores = {
+        'usuarios_pendientes': (pendientes('antiguedad', False), 'idx_usuarios_pendientes'),
+        'usuarios_pendientes_nivel': (pendientes('seguidores', False), 'idx_usuarios_pendientes_nivel'),
+        'rescrape_antiguedad': (pendientes('antiguedad', True), 'idx_usuarios_actualizacion'),
+        'rescrape_nivel': (pendientes('seguidores', True), 'idx_usuarios_nivel'),
+        'consulta_vencida_user': (vencida('user'), 'idx_usuarios_fecha_consulta_usuario'),
+        'consulta_vencida_posts': (vencida('posts'), 'idx_usuarios_fecha_consulta_posts'),
+        'consulta_vencida_highlights': (vencida('highlights'), 'idx_usuarios_fecha_consulta_destacadas'),
+    }
+    return {nombre: cursor.consulta_pagina() + (indice,) for nombre, (cursor, indice) in cursores.items()}
+
+
+def verificar_planes(conn: sqlite3.Connection) -> Dict[str, Tuple[bool, List[str]]]:
+    """
+    Verifica con EXPLAIN QUERY PLAN que cada consulta crítica use su índice
+
+    Returns:
+        Dict[str, Tuple[bool, List[str]]]: Consulta -> (usa el índice esperado, plan)
+    """
+    resultado = {}
+    for nombre, (sql, parametros, indice) in {**_paginas_cursores(), **CONSULTAS_CRITICAS}.items():
+        plan = plan_consulta(conn, sql, parametros)
+        resultado[nombre] = (any(indice in linea for linea in plan), plan)
+    return resultado
+
+
+def main():
+    """Aplica las migraciones pendientes y muestra los planes de las consultas críticas"""
+    from config import OUTPUT_CONFIG
+
+    parser = argparse.ArgumentParser(description='Migraciones de esquema y diagnóstico de índices')
+    parser.add_argument('--db', default=None, help='Ruta a la base de datos')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        from database import InstagramDatabase
+
+        # Abrir la base aplica las migraciones pendientes
+        db = InstagramDatabase(args.db or OUTPUT_CONFIG['database_file'])
+        with sqlite3.connect(db.db_path) as conn:
+            logger.info(f"📐 Versión de esquema: {version_esquema(conn)} (actual: {VERSION_ACTUAL})")
+            fallos = 0
+            for nombre, (usa_indice, plan) in verificar_planes(conn).items():
+                fallos += not usa_indice
+                logger.info(f"{'✅' if usa_indice else '❌'} {nombre}: {' | '.join(plan)}")
+        if fallos:
+            raise SystemExit(1)
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set
+
+from config import OUTPUT_CONFIG, RETENCION_CONFIG
+from logger import configurar_logging, obtener_logger, detener_logging
+
+logger = obtener_logger('retencion')
+
+# ==============================================================================
+# RETENCIÓN, ARCHIVO Y COMPACTACIÓN DE LA BASE SQLITE
+# ==============================================================================
+#
+# Las filas viejas se archivan en archivos NDJSON comprimidos (<directorio>/<tabla>/<política>-
+# <fecha>.ndjson.gz) antes de borrarse de la base operativa. Las páginas liberadas se devuelven
+# al sistema de archivos con PRAGMA incremental_vacuum en pasadas acotadas; un VACUUM completo
+# solo se hace para convertir una base existente a auto_vacuum incremental.
+
+# Política -> especificación
+#   tabla: tabla de la que se archivan filas
+#   columna_fecha: timestamp que determina la antigüedad de la fila
+#   condicion: filtro SQL adicional (tipo de fila)
+#   conservar: columnas que quedan en una lápida en lugar de borrar la fila (vacío = se borra)
+#   columna_archivo: columna con la ruta del archivo descargado de la fila (None = sin archivos)
+POLITICAS_RETENCION: Dict[str, Dict] = {}
+
+# Marca de las lápidas (migración 013): la condición de la política la excluye para no volver a
+# archivar la misma fila, y se limpia cuando el perfil se vuelve a guardar
+COLUMNA_ARCHIVADO = 'fecha_archivado'
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def registrar_politica(nombre: str, tabla: str, columna_fecha: str, condicion: str = '1',
+                       conservar: Sequence[str] = (), columna_archivo: Optional[str] = None) -> None:
+    """
+    Registra una política de retención (la antigüedad en días sale de RETENCION_CONFIG['politicas'])
+
+    Args:
+        nombre (str): Nombre de la política
+        tabla (str): Tabla de la que se archivan filas
+        columna_fecha (str): Columna de timestamp que determina la antigüedad
+        condicion (str): Filtro SQL adicional sobre la fila
+        conservar (Sequence[str]): Columnas que quedan en una lápida (la tabla debe tener
+            COLUMNA_ARCHIVADO y la condición excluir las filas ya marcadas); vacío = borrar la fila
+        columna_archivo (str, optional): Columna con la ruta del archivo descargado de la fila
+    """
+    POLITICAS_RETENCION[nombre] = {
+        'tabla': tabla,
+        'columna_fecha': columna_fecha,
+        'condicion': condicion,
+        'conservar': tuple(conservar),
+        'columna_archivo': columna_archivo,
+    }
+
+
+registrar_politica('media_posts', 'media_urls', 'fecha_scraping', "tipo_media = 'post'",
+                   columna_archivo='ruta_archivo')
+registrar_politica('media_destacadas', 'media_urls', 'fecha_scraping', "tipo_media = 'destacada'",
+                   columna_archivo='ruta_archivo')
+# La lápida conserva la caché negativa y el estado de fallo: sin ella, volver a importar la
+# lista de usernames encolaría de nuevo los perfiles inexistentes o descartados. También conserva
+# cantidad_seguidores para no mover el perfil de escalón en el orden por seguidores.
+registrar_politica('perfiles_inactivos', 'usuarios_unicos', 'ultima_actualizacion',
+                   f'perfil_inactivo = TRUE AND {COLUMNA_ARCHIVADO} IS NULL',
+                   conservar=('username', 'perfil_inactivo', 'cantidad_seguidores', 'fecha_scraping',
+                              'ultima_actualizacion', 'tipo_fallo', 'intentos_fallidos', 'proximo_intento', 'estado_fallo'))
+registrar_politica('cambios', 'cambios', 'fecha')
+
+
+def _dejar_lapidas(conn: sqlite3.Connection, tabla: str, conservar: Sequence[str], filtro: str,
+                   rowids: List[int], corte: str) -> int:
+    """
+    Vacía las columnas no conservadas de las filas archivadas y las marca con COLUMNA_ARCHIVADO
+
+    Returns:
+        int: Filas reducidas a lápida
+    """
+    # table_xinfo marca las columnas generadas con hidden 2 o 3 (no se pueden asignar). Las
+    # NOT NULL vuelven a su valor por defecto (la época en las fechas de consulta, migración 010)
+    asignaciones = ''.join(
+        f"{nombre} = {defecto if no_nulo else 'NULL'}, "
+        for _, nombre, _, no_nulo, defecto, _, oculta in conn.execute(f'PRAGMA table_xinfo({tabla})')
+        if oculta == 0 and nombre not in conservar and nombre != COLUMNA_ARCHIVADO
+        and not (no_nulo and defecto is None)
+    )
+    return conn.executemany(
+        f'UPDATE {tabla} SET {asignaciones}{COLUMNA_ARCHIVADO} = CURRENT_TIMESTAMP WHERE rowid = ? AND {filtro}',
+        ((rowid, corte) for rowid in rowids)).rowcount
+
+
+def _archivos_sin_referencias(conn: sqlite3.Connection, tabla: str, columna_archivo: str, rutas: Set[str]) -> Set[str]:
+    """
+    Rutas que ya no referencia ninguna fila de la tabla
+
+    El almacén de media es direccionado por contenido: un archivo compartido con una fila que
+    sigue en la base (otro perfil, o la misma imagen re-firmada) no se puede borrar.
+    """
+    sin_referencias = set(rutas)
+    cursor = conn.execute(f'SELECT {columna_archivo} FROM {tabla} WHERE {columna_archivo} IS NOT NULL')
+    while sin_referencias:
+        filas = cursor.fetchmany(RETENCION_CONFIG['lote'])
+        if not filas:
+            break
+        sin_referencias.difference_update(ruta for ruta, in filas)
+    return sin_referencias
+
+
+def _borrar_archivos(rutas: Set[str]) -> int:
+    """Borra los archivos indicados (los que ya no existen se ignoran) y devuelve cuántos borró"""
+    borrados = 0
+    for ruta in rutas:
+        try:
+            os.remove(ruta)
+            borrados += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[!] No se pudo borrar {ruta}: {e}")
+    return borrados
+
+
+def archivar(db_path: str, politica: str, dias: Optional[float] = None, directorio: Optional[str] = None,
+             simular: bool = False) -> int:
+    """
+    Archiva en NDJSON comprimido y borra las filas de una política más viejas que `dias`
+
+    El archivo se escribe y se cierra antes de borrar. El borrado repite el filtro con el
+    mismo corte, así que una fila actualizada mientras tanto no se borra. Las políticas con
+    columnas a conservar dejan una lápida en lugar de borrar la fila, y las que tienen
+    columna_archivo borran (o, con borrar_archivos desactivado, informan) los archivos
+    descargados que ya no referencia ninguna fila.
+
+    Args:
+        db_path (str): Ruta a la base de datos
+        politica (str): Nombre de la política registrada
+        dias (float, optional): Antigüedad mínima (por defecto, de config)
+        directorio (str, optional): Directorio raíz del archivo (por defecto, de config)
+        simular (bool): Si True, solo cuenta las filas que se archivarían
+
+    Returns:
+        int: Filas archivadas (o que se archivarían)
+    """
+    especificacion = POLITICAS_RETENCION[politica]
+    dias = dias if dias is not None else RETENCION_CONFIG['politicas'].get(politica)
+    if dias is None:
+        logger.debug(f"Política '{politica}' desactivada")
+        return 0
+
+    tabla = especificacion['tabla']
+    filtro = f"({especificacion['condicion']}) AND {especificacion['columna_fecha']} < ?"
+
+    with sqlite3.connect(db_path) as conn:
+        corte = conn.execute("SELECT datetime('now', ?)", (f'-{dias} days',)).fetchone()[0]
+
+        if simular:
+            total = conn.execute(f'SELECT COUNT(*) FROM {tabla} WHERE {filtro}', (corte,)).fetchone()[0]
+            logger.info(f"[~] {politica}: {total} filas de {tabla} anteriores a {corte}")
+            return total
+
+        ruta = None
+        rowids = []
+        rutas_archivos = set()
+        columna_archivo = especificacion['columna_archivo']
+        cursor = conn.execute(f'SELECT rowid, * FROM {tabla} WHERE {filtro} ORDER BY rowid', (corte,))
+        columnas = [d[0] for d in cursor.description[1:]]
+        indice_archivo = columnas.index(columna_archivo) + 1 if columna_archivo else None
+
+        archivo = None
+        try:
+            while True:
+                filas = cursor.fetchmany(RETENCION_CONFIG['lote'])
+                if not filas:
+                    break
+                if archivo is None:
+                    carpeta = os.path.join(directorio or RETENCION_CONFIG['directorio_archivo'], tabla)
+                    os.makedirs(carpeta, exist_ok=True)
+                    ruta = os.path.join(carpeta, f"{politica}-{datetime.now():%Y%m%d-%H%M%S}.ndjson.gz")
+                    archivo = gzip.open(ruta, 'wt', encoding='utf-8')
+                for fila in filas:
+                    rowids.append(fila[0])
+                    if indice_archivo and fila[indice_archivo]:
+                        rutas_archivos.add(fila[indice_archivo])
+                    archivo.write(json.dumps(dict(zip(columnas, fila[1:])), ensure_ascii=False, default=str))
+                    archivo.write('\n')
+        except BaseException:
+            if archivo is not None:
+                archivo.close()
+                os.remove(ruta)
+            raise
+
+        if archivo is None:
+            logger.info(f"[+] {politica}: sin filas anteriores a {corte}")
+            return 0
+        archivo.close()
+
+        # Borrado en una sola transacción, con el mismo filtro que la lectura
+        if especificacion['conservar']:
+            borradas = _dejar_lapidas(conn, tabla, especificacion['conservar'], filtro, rowids, corte)
+        else:
+            borradas = conn.executemany(f'DELETE FROM {tabla} WHERE rowid = ? AND {filtro}',
+                                        ((rowid, corte) for rowid in rowids)).rowcount
+        # Las referencias se buscan antes del commit, con la escritura aún bloqueada
+        huerfanos = _archivos_sin_referencias(conn, tabla, columna_archivo, rutas_archivos) if rutas_archivos else set()
+        conn.commit()
+
+    logger.info(f"[+] {politica}: {borradas} filas de {tabla} archivadas en {ruta}")
+    if huerfanos:
+        if RETENCION_CONFIG['borrar_archivos']:
+            logger.info(f"[+] {politica}: {_borrar_archivos(huerfanos)} archivos de media sin referencias borrados")
+        else:
+            logger.warning(f"⚠️ {politica}: {len(huerfanos)} archivos de media quedaron sin referencias "
+                           f"(sus rutas están en {columna_archivo} de {ruta})")
+    return borradas
+
+
+def archivar_todo(db_path: str, politicas: Optional[Sequence[str]] = None, simular: bool = False) -> Dict[str, int]:
+    """Aplica las políticas indicadas (por defecto, todas las activas en config)"""
+    politicas = politicas or [p for p in POLITICAS_RETENCION if RETENCION_CONFIG['politicas'].get(p) is not None]
+    return {politica: archivar(db_path, politica, simular=simular) for politica in politicas}
+
+
+def estado_archivo(db_path: str) -> Dict:
+    """
+    Tamaño del archivo de base de datos según sus páginas
+
+    Returns:
+        Dict: page_size, paginas, paginas_libres, bytes, bytes_libres y auto_vacuum
+    """
+    with sqlite3.connect(db_path) as conn:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+        libres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    return {
+        'page_size': page_size,
+        'paginas': paginas,
+        'paginas_libres': libres,
+        'bytes': paginas * page_size,
+        'bytes_libres': libres * page_size,
+        'auto_vacuum': auto_vacuum,
+    }
+
+
+def compactar(db_path: str, paginas: Optional[int] = None, completo: bool = False) -> Dict:
+    """
+    Devuelve páginas libres al sistema de archivos
+
+    Con auto_vacuum incremental ejecuta PRAGMA incremental_vacuum (acotado a `paginas`, o todas
+    si es None). Si la base aún no es incremental, o con `completo`, hace un VACUUM completo que
+    además la convierte a auto_vacuum incremental.
+
+    Returns:
+        Dict: Estado del archivo antes y después ('antes', 'despues')
+    """
+    antes = estado_archivo(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if completo or antes['auto_vacuum'] != AUTO_VACUUM_INCREMENTAL:
+            logger.info("[~] VACUUM completo (convierte la base a auto_vacuum incremental)...")
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        else:
+            # El pragma libera páginas a medida que se recorre su resultado
+            conn.execute(f'PRAGMA incremental_vacuum({int(paginas or 0)})').fetchall()
+    finally:
+        conn.close()
+
+    despues = estado_archivo(db_path)
+    liberado = antes['bytes'] - despues['bytes']
+    logger.info(f"[+] Compactación: {antes['bytes'] / 2**20:.1f} MB -> {despues['bytes'] / 2**20:.1f} MB "
+                f"({liberado / 2**20:.1f} MB liberados)")
+    return {'antes': antes, 'despues': despues}
+
+
+def mantenimiento(db_path: str) -> Dict:
+    """
+    Mantenimiento programado (se ejecuta al final de cada batch de scraping)
+
+    - Si la fracción de páginas libres supera 'umbral_libre', hace una pasada acotada de
+      incremental_vacuum ('paginas_vacuum' páginas).
+    - Si el archivo supera 'presupuesto_mb', aplica las políticas de retención (si
+      'archivar_al_exceder') y compacta todas las páginas libres.
+
+    Returns:
+        Dict: Estado final del archivo
+    """
+    estado = estado_archivo(db_path)
+    incremental = estado['auto_vacuum'] == AUTO_VACUUM_INCREMENTAL
+
+    if incremental and estado['paginas'] and \
+            estado['paginas_libres'] / estado['paginas'] >= RETENCION_CONFIG['umbral_libre']:
+        estado = compactar(db_path, paginas=RETENCION_CONFIG['paginas_vacuum'])['despues']
+
+    presupuesto = RETENCION_CONFIG['presupuesto_mb'] * 2**20
+    if presupuesto and estado['bytes'] > presupuesto:
+        logger.warning(f"⚠️ La base ocupa {estado['bytes'] / 2**20:.1f} MB "
+                       f"(presupuesto: {RETENCION_CONFIG['presupuesto_mb']} MB). Compactando...")
+        if RETENCION_CONFIG['archivar_al_exceder']:
+            archivar_todo(db_path)
+        estado = compactar(db_path)['despues']
+        if estado['bytes'] > presupuesto:
+            logger.warning("⚠️ La base sigue por encima del presupuesto: revisar las políticas de retención")
+
+    return estado
+
+
+def reporte_tamanos(db_path: str) -> List[Dict]:
+    """
+    Tamaño de cada tabla e índice según la tabla virtual dbstat
+
+    Returns:
+        List[Dict]: nombre, tipo, tabla, bytes, bytes_sin_usar y paginas, de mayor a menor
+    """
+    with sqlite3.connect(db_path) as conn:
+        try:
+            filas = conn.execute('''
+                SELECT s.name, COALESCE(m.type, 'interno'), COALESCE(m.tbl_name, s.name),
+                       SUM(s.pgsize), SUM(s.unused), COUNT(*)
+                FROM dbstat s
+                LEFT JOIN sqlite_master m ON m.name = s.name
+                GROUP BY s.name
+                ORDER BY SUM(s.pgsize) DESC
+            ''').fetchall()
+        except sqlite3.OperationalError as e:
+            logger.error(f"[!] dbstat no disponible en esta compilación de SQLite: {e}")
+            return []
+
+    return [
+        {'nombre': nombre, 'tipo': tipo, 'tabla': tabla, 'bytes': tamano, 'bytes_sin_usar': sin_usar, 'paginas': paginas}
+        for nombre, tipo, tabla, tamano, sin_usar, paginas in filas
+    ]
+
+
+def mostrar_reporte(db_path: str) -> None:
+    """Muestra el tamaño del archivo y de cada tabla e índice"""
+    estado = estado_archivo(db_path)
+    modo = 'incremental' if estado['auto_vacuum'] == AUTO_VACUUM_INCREMENTAL else f"modo {estado['auto_vacuum']}"
+    print(f"\n💾 {db_path}: {estado['bytes'] / 2**20:.1f} MB "
+          f"({estado['paginas']} páginas de {estado['page_size']} B, "
+          f"{estado['bytes_libres'] / 2**20:.1f} MB libres, auto_vacuum {modo}, "
+          f"presupuesto {RETENCION_CONFIG['presupuesto_mb']} MB)")
+    print(f"\n{'Objeto':<36} {'Tipo':<8} {'Tabla':<22} {'MB':>9} {'Sin usar':>9}")
+    for fila in reporte_tamanos(db_path):
+        print(f"{fila['nombre']:<36} {fila['tipo']:<8} {fila['tabla']:<22} "
+              f"{fila['bytes'] / 2**20:>9.2f} {fila['bytes_sin_usar'] / 2**20:>9.2f}")
+
+
+def main():
+    """Retención, compactación y reporte de tamaños desde la línea de comandos"""
+    parser = argparse.ArgumentParser(description='Retención, archivo y compactación de la base SQLite')
+    parser.add_argument('--db', default=None, help='Ruta a la base de datos')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('reporte', help='Tamaño de tablas e índices')
+    archivar_parser = sub.add_parser('archivar', help='Archiva y borra filas viejas según las políticas')
+    archivar_parser.add_argument('--politica', action='append', choices=sorted(POLITICAS_RETENCION),
+                                 help='Política a aplicar (repetible; por defecto, todas las activas)')
+    archivar_parser.add_argument('--dias', type=float, default=None, help='Antigüedad mínima (sobrescribe config)')
+    archivar_parser.add_argument('--simular', action='store_true', help='Solo contar las filas afectadas')
+    compactar_parser = sub.add_parser('compactar', help='Devuelve páginas libres al sistema de archivos')
+    compactar_parser.add_argument('--paginas', type=int, default=None, help='Máximo de páginas a liberar')
+    compactar_parser.add_argument('--completo', action='store_true', help='VACUUM completo')
+    sub.add_parser('mantenimiento', help='Vacuum incremental y control del presupuesto de tamaño')
+    args = parser.parse_args()
+
+    configurar_logging()
+    try:
+        from database import InstagramDatabase
+
+        db_path = InstagramDatabase(args.db or OUTPUT_CONFIG['database_file']).db_path
+        if args.comando == 'reporte':
+            mostrar_reporte(db_path)
+        elif args.comando == 'archivar':
+            if args.dias is not None:
+                for politica in args.politica or POLITICAS_RETENCION:
+                    archivar(db_path, politica, dias=args.dias, simular=args.simular)
+            else:
+                archivar_todo(db_path, args.politica, simular=args.simular)
+        elif args.comando == 'compactar':
+            compactar(db_path, paginas=args.paginas, completo=args.completo)
+        else:
+            mantenimiento(db_path)
+    finally:
+        detener_logging()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,31 @@
-import requests
+import argparse
 import json
+import logging
+import os
 import time
 import random
-from typing import List, Dict, Optional
-from login import get_instagram_session
-from database import InstagramDatabase
-from config import SCRAPING_CONFIG, OUTPUT_CONFIG
+import sqlite3
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional
+from urllib.parse import urlencode
+from database import InstagramDatabase, FALLOS_PERMANENTES
+from config import (SCRAPING_CONFIG, OUTPUT_CONFIG, CIRCUIT_BREAKER_CONFIG, RESPUESTAS_CONFIG,
+                    DESTACADAS_CONFIG, POSTS_CONFIG, CAMBIOS_CONFIG, REFRESCO_CONFIG)
+from graphql_queries import GRAPHQL_URL, PlantillasGraphQL, cargar_doc_ids
+from circuit_breaker import CircuitBreaker
+from deadline import Deadline, PresupuestoBatch, TiempoExcedido, timeout_requests
+from sesion import MonitorSesion, SesionInvalida
+from limitador import LimitadorTasa
+from ingesta import importar_usuarios, importar_archivo, registrar_resumen
+from logger import configurar_logging, obtener_logger, ProgresoBatch, detener_logging
+
+logger = obtener_logger('scraper')
+
+# Consultas GraphQL de un perfil, en el orden en que se piden (claves de REFRESCO_CONFIG)
+CONSULTAS_PERFIL = ('user', 'highlights', 'posts')
 
 # ==============================================================================
 # INSTAGRAM SCRAPER DE PERFILES - CON POSTS E HIGHLIGHTS
@@ -26,21 +46,42 @@ class ScraperPerfil:
         self.session = None
         self.tokens = None
         self.username = None
+        self.plantillas = None
         
-        # Doc IDs hardcodeados (actualizados)
-        self.DOC_IDS = {
-            'user': '24059491867034637',
-            'highlights': '9814547265267853', 
-            'posts': '24312092678414792'
-        }
+        # Doc IDs desde config (GRAPHQL_CONFIG / doc_ids.json)
+        self.DOC_IDS = cargar_doc_ids()
+        
+        # Circuit breaker por tipo de consulta
+        self.breaker = CircuitBreaker()
+        
+        # Expiración de cookies y detección de sesión inválida (re-autenticación automática).
+        # La generación cambia con cada login: los hilos que ven la sesión inválida a la vez
+        # re-autentican una sola vez
+        self.monitor = MonitorSesion()
+        self.generacion_sesion = 0
+        self._lock_sesion = threading.Lock()
+        
+        # Presupuesto de requests compartido por todas las etapas (incluidas las paralelas)
+        self.limitador = LimitadorTasa()
+        
+        # Deadline del perfil en curso (None fuera de un perfil)
+        self.deadline = None
+        
+        # Tipo del último fallo de get_user_id_from_username (None si obtuvo el id)
+        self.fallo_perfil = None
+        
+        # Archivo de respuestas crudas para re-extraer offline (archivo_respuestas.py)
+        self.archivo = None
+        if RESPUESTAS_CONFIG['activo']:
+            from archivo_respuestas import ArchivoRespuestas
+            self.archivo = ArchivoRespuestas()
     
     def debug_log(self, message: str, data=None):
         """Log de debug si está activado el modo debug"""
         if self.debug_mode:
-            timestamp = time.strftime("%H:%M:%S")
-            print(f"🔍 [{timestamp}] DEBUG: {message}")
             if data:
-                print(f"    Data: {json.dumps(data, indent=2, ensure_ascii=False, default=str)[:300]}...")
+                message += f"\n    Data: {json.dumps(data, indent=2, ensure_ascii=False, default=str)[:300]}..."
+            logger.debug(f"🔍 DEBUG: {message}")
     
     def format_number(self, value) -> str:
         """
@@ -58,28 +99,205 @@ class ScraperPerfil:
             return f"{value:,}"
         return str(value)
     
-    def autenticar(self, headless: bool = True) -> bool:
+    def autenticar(self, headless: bool = True, interactivo: bool = True) -> bool:
         """
         Realiza la autenticación con Instagram
         
         Args:
             headless (bool): Si ejecutar en modo headless
+            interactivo (bool): Si el login puede pedir credenciales por consola (False a mitad
+                de un batch: solo credenciales guardadas o la sesión del perfil de Chrome)
             
         Returns:
             bool: True si la autenticación fue exitosa
         """
-        print("[*] Iniciando proceso de autenticación...")
-        session, tokens, username = get_instagram_session(headless=headless)
+        from login import get_instagram_session
+        
+        logger.info("[*] Iniciando proceso de autenticación...")
+        session, tokens, username = get_instagram_session(headless=headless, interactivo=interactivo)
         
         if not session or not tokens:
-            print("[!] No se pudo obtener la sesión autenticada")
+            logger.error("[!] No se pudo obtener la sesión autenticada")
             return False
         
         self.session = session
         self.tokens = tokens
         self.username = username
+        self.plantillas = PlantillasGraphQL(tokens, self.DOC_IDS)
+        self.monitor.actualizar(tokens)
+        self.generacion_sesion += 1
+        
+        logger.info(f"[+] Autenticado como: {username}")
+        return True
+    
+    def refrescar_tokens(self) -> bool:
+        """
+        Recarga los doc_ids y reconstruye las plantillas con la sesión actual (tras disparar el breaker)
+        
+        Si se actualizó doc_ids.json, con eso alcanza: no se relanza el navegador. La sesión se
+        verifica con una request a web_profile_info, y solo si resulta inválida _solicitar
+        re-autentica (sin prompts, dentro de max_reautenticaciones).
+        
+        Returns:
+            bool: True si la sesión sigue (o volvió a ser) válida
+        """
+        if not self.session or not self.tokens:
+            return self._autenticar_desatendido()
+        
+        logger.warning("[*] Recargando doc_ids y plantillas de la sesión actual...")
+        self.DOC_IDS = cargar_doc_ids()
+        self.plantillas = PlantillasGraphQL(self.tokens, self.DOC_IDS)
+        self.breaker.reiniciar()
+        
+        url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={self.username or 'instagram'}"
+        try:
+            self._solicitar('GET', url, 'perfil')
+        except SesionInvalida as e:
+            logger.error(f"🔐 {e}")
+            return False
+        except Exception as e:
+            # Un fallo de red no demuestra que la sesión caducó: si persiste, el breaker vuelve a dispararse
+            logger.warning(f"[!] No se pudo verificar la sesión tras recargar doc_ids: {e}")
+        return True
+    
+    def _autenticar_desatendido(self) -> bool:
+        """
+        Re-autentica sin prompts y recarga los doc_ids (por si se actualizó doc_ids.json)
+        
+        Un batch desatendido no puede quedar esperando credenciales en la consola: se usan las
+        guardadas o la sesión del perfil de Chrome, y si no alcanzan devuelve False.
+        """
+        self.DOC_IDS = cargar_doc_ids()
+        autenticado = self.autenticar(headless=SCRAPING_CONFIG['headless'], interactivo=False)
+        self.breaker.reiniciar()
+        return autenticado
+    
+    def reautenticar(self, motivo: str, generacion: Optional[int] = None) -> bool:
+        """
+        Re-autentica a mitad del batch porque la sesión dejó de servir
+        
+        La cola de trabajo queda en pausa mientras dura el login (los hilos de contenido de
+        destacadas esperan el lock); ese tiempo no se descuenta del deadline del perfil en curso.
+        
+        Args:
+            motivo (str): Por qué se considera inválida la sesión (para el log)
+            generacion (int, optional): Generación de sesión con la que se envió la request fallida
+            
+        Returns:
+            bool: True si se obtuvo una sesión nueva
+        """
+        with self._lock_sesion:
+            if generacion is not None and generacion != self.generacion_sesion:
+                return True  # Otro hilo ya re-autenticó mientras esta request estaba en vuelo
+            return self._reautenticar(motivo)
+    
+    def _reautenticar(self, motivo: str) -> bool:
+        """Re-autentica si quedan intentos (llamar con _lock_sesion tomado)"""
+        if not self.monitor.puede_reautenticar():
+            logger.error(f"🔐 Sesión inválida ({motivo}) y se agotaron las "
+                         f"{self.monitor.max_reautenticaciones} re-autenticaciones de la ejecución")
+            return False
+        self.monitor.reautenticaciones += 1
+        logger.warning(f"🔐 Sesión inválida ({motivo}). Pausando la cola para re-autenticar "
+                       f"({self.monitor.reautenticaciones}/{self.monitor.max_reautenticaciones})...")
+        inicio = time.monotonic()
+        autenticado = self._autenticar_desatendido()
+        if self.deadline:
+            self.deadline.extender(time.monotonic() - inicio)
+        return autenticado
+    
+    def _solicitar(self, metodo: str, url: str, etapa: str,
+                   construir: Callable[[], Dict] = dict) -> 'requests.Response':
+        """
+        Envía una request autenticada; si la sesión caducó, re-autentica y la repite
+        
+        Args:
+            metodo (str): Método HTTP
+            url (str): URL de destino
+            etapa (str): Consulta en curso
+            construir (Callable): Devuelve los kwargs de la request; se vuelve a llamar al repetirla
+                porque headers y cuerpo llevan los tokens de la sesión
+            
+        Returns:
+            requests.Response: Respuesta de la solicitud
+            
+        Raises:
+            SesionInvalida: Si no se pudo re-autenticar o la sesión nueva tampoco sirve
+            TiempoExcedido: Si la request supera su timeout o el deadline ya venció
+        """
+        generacion = self.generacion_sesion
+        motivo = self.monitor.por_expirar()
+        if motivo and not self.reautenticar(motivo, generacion):
+            raise SesionInvalida(f"No se pudo renovar la sesión antes de '{etapa}': {motivo}")
+        
+        response = self._enviar(metodo, url, etapa, **construir())
+        motivo = self.monitor.respuesta_invalida(response)
+        if motivo is None:
+            return response
+        
+        if not self.reautenticar(motivo, generacion):
+            raise SesionInvalida(f"Sesión inválida en '{etapa}': {motivo}")
+        response = self._enviar(metodo, url, etapa, **construir())
+        motivo = self.monitor.respuesta_invalida(response)
+        if motivo:
+            raise SesionInvalida(f"La sesión nueva tampoco es válida en '{etapa}': {motivo}")
+        return response
+    
+    def _enviar(self, metodo: str, url: str, etapa: str, **kwargs) -> 'requests.Response':
+        """
+        Envía una request con timeout de conexión/lectura, acotado por el deadline del perfil
+        
+        Args:
+            metodo (str): Método HTTP
+            url (str): URL de destino
+            etapa (str): Consulta en curso (para el mensaje de error)
+            
+        Returns:
+            requests.Response: Respuesta de la solicitud
+            
+        Raises:
+            TiempoExcedido: Si la request supera su timeout o el deadline ya venció
+        """
+        import requests
+        
+        self.limitador.adquirir()
+        kwargs['timeout'] = timeout_requests(self.deadline, etapa)
+        try:
+            return self.session.request(metodo, url, **kwargs)
+        except requests.exceptions.Timeout as e:
+            raise TiempoExcedido(f"Timeout en '{etapa}': {e}") from e
+    
+    def _archivar(self, username: str, tipo: str, response) -> None:
+        """Guarda el cuerpo crudo de una respuesta 200 en el archivo (un fallo no corta el scraping)"""
+        if self.archivo is None or response.status_code != 200:
+            return
+        try:
+            self.archivo.guardar(username, tipo, response.content)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ No se pudo archivar la respuesta '{tipo}' de @{username}: {e}")
+    
+    def _esperar(self, segundos: float, etapa: str) -> None:
+        """Espera respetando el deadline del perfil (cancela si la espera no cabe)"""
+        if self.deadline:
+            self.deadline.dormir(segundos, etapa)
+        else:
+            time.sleep(segundos)
+    
+    def _esperar_rate_limit(self, etapa: str, segundos: float = 60) -> bool:
+        """
+        Espera tras un 429 si la espera cabe en el deadline del perfil
         
-        print(f"[+] Autenticado como: {username}")
+        Un rate limit no se cobra al perfil: si la espera no cabe, en lugar de cancelarlo por
+        timeout (que sí cuenta como fallo) se devuelve el 429 a la etapa sin esperar.
+        
+        Returns:
+            bool: True si esperó y se puede repetir la request
+        """
+        if self.deadline and segundos >= self.deadline.restante():
+            logger.warning(f"[!] La espera de {segundos:g}s por rate limit en '{etapa}' no cabe en el deadline "
+                           "del perfil. Se deja para el próximo intento.")
+            return False
+        self._esperar(segundos, etapa)
         return True
     
     def get_user_id_from_username(self, username: str) -> Optional[str]:
@@ -92,153 +310,92 @@ class ScraperPerfil:
         Returns:
             Optional[str]: User ID si se encuentra, None si no
         """
+        import requests
+        
         url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
+        self.fallo_perfil = None
         
         try:
-            response = self.session.get(url)
+            response = self._solicitar('GET', url, 'perfil')
             response.raise_for_status()
+            self._archivar(username, 'perfil', response)
             
             data = response.json()
             user_id = data.get('data', {}).get('user', {}).get('id')
             
             if user_id:
+                self.breaker.registrar('perfil', True)
                 self.debug_log(f"User ID obtenido para @{username}: {user_id}")
                 return user_id
             else:
-                print(f"❌ No se pudo encontrar el user_id para '{username}'")
+                # Sin usuario en una respuesta 200: el perfil no existe o cambió de nombre
+                self.breaker.registrar('perfil', False)
+                self.fallo_perfil = 'no_encontrado'
+                logger.warning(f"❌ No se pudo encontrar el user_id para '{username}'")
                 return None
                 
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 404:
-                print(f"[!] Perfil '{username}' no encontrado (404)")
+                # Un 404 es un resultado válido del endpoint, no un fallo sistémico
+                self.breaker.registrar('perfil', True)
+                self.fallo_perfil = 'no_encontrado'
+                logger.warning(f"[!] Perfil '{username}' no encontrado (404)")
             elif e.response.status_code == 429:
-                print(f"[!] Error HTTP 429 para '{username}' - Rate limit alcanzado. Esperando...")
-                time.sleep(60)  # Esperar 1 minuto antes de continuar
+                self.fallo_perfil = 'rate_limit'
+                logger.warning(f"[!] Error HTTP 429 para '{username}' - Rate limit alcanzado. Esperando...")
+                # Esperar 1 minuto antes de continuar (dentro del deadline del perfil)
+                self._esperar_rate_limit('perfil')
             else:
-                print(f"[!] Error HTTP {e.response.status_code} para '{username}'")
+                self.breaker.registrar('perfil', False)
+                self.fallo_perfil = 'http'
+                logger.warning(f"[!] Error HTTP {e.response.status_code} para '{username}'")
             return None
+        except (TiempoExcedido, SesionInvalida):
+            raise
         except Exception as e:
-            print(f"[!] Error obteniendo ID para '{username}': {e}")
+            self.breaker.registrar('perfil', False)
+            self.fallo_perfil = 'red'
+            logger.error(f"[!] Error obteniendo ID para '{username}': {e}")
             return None
     
-    def make_graphql_request(self, user_id: str, req_type: int, doc_id: str, query_type: str = "user", username: str = None) -> requests.Response:
+    def make_graphql_request(self, query_type: str, user_id: str, username: str = None) -> 'requests.Response':
         """
-        Hace una solicitud GraphQL con los parámetros específicos para cada tipo de consulta
+        Hace una solicitud GraphQL usando las plantillas pre-codificadas de la sesión
         
         Args:
+            query_type (str): Tipo de consulta registrado ("user", "highlights", "posts", ...)
             user_id (str): ID del usuario
-            req_type (int): Tipo de request (__req)
-            doc_id (str): Document ID
-            query_type (str): Tipo de consulta ("user", "highlights", "posts")
             username (str): Username (necesario para posts)
             
         Returns:
             requests.Response: Respuesta de la solicitud
+            
+        Raises:
+            TiempoExcedido: Si la consulta supera su timeout o el deadline del perfil
+            SesionInvalida: Si la sesión caducó y no se pudo re-autenticar
         """
-        headers = {
-            'accept': '*/*',
-            'accept-language': 'es-419,es;q=0.9,es-ES;q=0.8,en;q=0.7,en-GB;q=0.6,en-US;q=0.5',
-            'content-type': 'application/x-www-form-urlencoded',
-            'origin': 'https://www.instagram.com',
-            'priority': 'u=1, i',
-            'referer': 'https://www.instagram.com/',
-            'sec-ch-prefers-color-scheme': 'dark',
-            'sec-ch-ua': '"Not)A;Brand";v="8", "Chromium";v="138", "Microsoft Edge";v="138"',
-            'sec-ch-ua-full-version-list': '"Not)A;Brand";v="8.0.0.0", "Chromium";v="138.0.7204.184", "Microsoft Edge";v="138.0.3351.121"',
-            'sec-ch-ua-mobile': '?1',
-            'sec-ch-ua-model': '"Nexus 5"',
-            'sec-ch-ua-platform': '"Android"',
-            'sec-ch-ua-platform-version': '"6.0"',
-            'sec-fetch-dest': 'empty',
-            'sec-fetch-mode': 'cors',
-            'sec-fetch-site': 'same-origin',
-            'user-agent': 'Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Mobile Safari/537.36 Edg/138.0.0.0',
-            'x-asbd-id': '359341',
-            'x-bloks-version-id': '4fd52d0e0985dd463fefe21d18f1609258ecf3c799cc7f12f6c4363b56697384',
-            'x-csrftoken': self.tokens['csrf_token'],
-            'x-fb-lsd': self.tokens['fb_lsd'],
-            'x-ig-app-id': '1217981644879628',
-            'x-root-field-name': 'fetch__XDTUserDict'
-        }
-        
-        # Payload base
-        payload = {
-            'av': '17841476332219581',
-            '__d': 'www',
-            '__user': '0',
-            '__a': '1',
-            '__req': str(req_type),
-            '__hs': '20302.HYP%3Ainstagram_web_pkg.2.1...0',
-            'dpr': '2',
-            '__ccg': 'EXCELLENT',
-            '__rev': '1025456124',
-            '__s': 'azx7hm%3Av651wx%3Ajjbnoc',
-            '__hsi': '7534071026151167731',
-            '__dyn': '7xeUjG1mxu1syUbFp41twpUnwgU7SbzEdF8aUco2qwJxS0k24o0B-q1ew6ywaq0yE462mcw5Mx62G5UswoEcE7O2l0Fwqo31w9a9wtUd8-U2zxe2GewGw9a361qw8Xxm16wUwtE1wEbUGdwtUd-2u2J0bS1LwTwKG1pg2fwxyo6O1FwlA3a3zhA6bwIxe6V89F8uwm8jxK2K2G0EoKmUhw4UxWawOwgV8',
-            '__csr': 'hk4c5sIdiiWeWkp4my9OFliOZZm_GGlbnl8FQW_jqWWXrHZelBAGKQWAUxqjH9mGh9mtyGKcZ2rVtlmVCqfXmWupfAGm8QqUDhEOEnjqVHBGUGcAAx2hpoO4ojS7aDBzqxi5BAhUB5VeV8lyoyAWyQElABzoC4ayu79V8S4Uiw05vaw2bU25o30K1NA80qu584No0zapo1lU3zwwP1uuE0Z-07gVE4e7UKlF2cU1Iodo6Z2UTo1n86dwVg8UJCOwkcw3pc0nCpO08Vk7k0tdw09oK06480aHo',
-            '__hsdp': 'gngpiOl4cZSxIajNnhshkxk2p6kKnjmEFEj9bae42bzXy98hzIywDwSzC9xpwCx22t7oTzVFNiwxD9AIU92zoCp3U6wwaob9QEaoe8hz8hwNwTgkefy8fUW0BopwXzUphGXAyopDwda7o10U6d05uwjE2vw2a821xa1eG3K3S1Hw8u0R8W0CE521mg8iw4pwxwLwhjzo6a0Jo562C',
-            '__hblp': '1i7Q1YwJK9xN6mmcG12xKU2BCwv8bFFEC69E5a68Dgbbx22qAUSfGm8wGK2h2Ebk4ayohwNAG1rBGES2up3ojxy9wKwLxC5Q1chGBWyo-9DDwgE6i2a7ojwe-10wygiw8S0Lo4W3K18xG0Bo1gE4uu2K1fBBz85-2mu3S1HwVwjo3kzE2qAwiVoS11o8iwdm13wxzo6ix0N0oogwai68dqxq4E',
-            '__sjsp': 'gngpiOl4cZSDPMFf5t5N5i5g9ApiVtdqyCxcAIwYg8K4Uyi4o7meoC3-48a9QeU-qskE8pOpbe2ydw3nEdE',
-            '__comet_req': '7',
-            'fb_dtsg': self.tokens['fb_dtsg'],
-            'jazoest': '26195',
-            'lsd': self.tokens['fb_lsd'],
-            '__spin_r': '1025456124',
-            '__spin_b': 'trunk',
-            '__spin_t': '1754162606',
-            '__crn': 'comet.igweb.PolarisFeedRoute',
-            'fb_api_caller_class': 'RelayModern',
-            'fb_api_req_friendly_name': 'PolarisProfilePageContentQuery',
-            'server_timestamps': 'true',
-            'doc_id': doc_id
-        }
-        
-        # Configurar parámetros específicos según el tipo de consulta
-        if query_type == "highlights":
-            payload['fb_api_req_friendly_name'] = 'PolarisProfileStoryHighlightsTrayContentQuery'
-            payload['__crn'] = 'comet.igweb.PolarisProfilePostsTabRoute'
-            payload['variables'] = json.dumps({"user_id": user_id})
-        elif query_type == "posts":
-            payload['fb_api_req_friendly_name'] = 'PolarisProfilePostsQuery'
-            payload['__crn'] = 'comet.igweb.PolarisProfilePostsTabRoute'
-            payload['variables'] = json.dumps({
-                "data": {
-                    "count": 12,
-                    "include_reel_media_seen_timestamp": True,
-                    "include_relationship_info": True,
-                    "latest_besties_reel_media": True,
-                    "latest_reel_media": True
-                },
-                "username": username,
-                "__relay_internal__pv__PolarisIsLoggedInrelayprovider": True,
-                "__relay_internal__pv__PolarisShareSheetV3relayprovider": True
-            })
-        else:  # user
-            payload['variables'] = json.dumps({
-                "id": user_id,
-                "render_surface": "PROFILE"
-            })
+        def construir() -> Dict:
+            # Se reconstruye al repetir tras re-autenticar: headers y cuerpo llevan los tokens
+            body = self.plantillas.construir_cuerpo(query_type, user_id=user_id, username=username)
+            return {'headers': self.plantillas.headers, 'data': body}
         
         self.debug_log(f"GraphQL request para {query_type}", {
             'user_id': user_id,
-            'doc_id': doc_id,
-            'req_type': req_type
+            'doc_id': self.plantillas.doc_ids[query_type]
         })
         
-        response = self.session.post("https://www.instagram.com/graphql/query", 
-                                   headers=headers, data=payload)
+        response = self._solicitar('POST', GRAPHQL_URL, query_type, construir)
         
-        # Manejar rate limiting
+        # Manejar rate limiting: reintentar una vez si la espera cabe en el deadline
         if response.status_code == 429:
-            print(f"[!] Rate limit alcanzado en GraphQL request para {query_type}. Esperando 60s...")
-            time.sleep(60)
-            # Reintentar una vez
-            response = self.session.post("https://www.instagram.com/graphql/query", 
-                                       headers=headers, data=payload)
+            logger.warning(f"[!] Rate limit alcanzado en GraphQL request para {query_type}.")
+            if self._esperar_rate_limit(query_type):
+                response = self._solicitar('POST', GRAPHQL_URL, query_type, construir)
         
         return response
     
-    def extract_user_data(self, data: dict) -> dict:
+    @staticmethod
+    def extract_user_data(data: dict) -> dict:
         """Extrae datos de usuario de la respuesta"""
         user_data = data['data']['user']
         return {
@@ -259,8 +416,58 @@ class ScraperPerfil:
             'media_count': user_data.get('media_count')
         }
     
-    def extract_posts_data(self, data: dict) -> list:
-        """Extrae datos de posts de la respuesta"""
+    @staticmethod
+    def seleccionar_candidato(candidatos: List[Dict], politica: str = None, minimo: int = None) -> Dict:
+        """
+        Elige una variante (imagen o video) según POSTS_CONFIG['politica_candidato']
+        
+        Args:
+            candidatos (List[Dict]): Variantes con url, ancho y alto, en el orden del payload
+            politica (str, optional): 'primera', 'mayor' o 'menor_sobre' (por defecto, de config)
+            minimo (int, optional): Ancho mínimo para 'menor_sobre' (por defecto, de config)
+            
+        Returns:
+            Dict: Variante elegida ({} si no hay candidatos)
+        """
+        if not candidatos:
+            return {}
+        politica = politica or POSTS_CONFIG['politica_candidato']
+        minimo = minimo or POSTS_CONFIG['resolucion_minima']
+        if politica == 'primera':
+            return candidatos[0]
+        mayor = max(candidatos, key=lambda c: c['ancho'] or 0)
+        if politica == 'menor_sobre':
+            suficientes = [c for c in candidatos if (c['ancho'] or 0) >= minimo]
+            return min(suficientes, key=lambda c: c['ancho']) if suficientes else mayor
+        return mayor
+    
+    @staticmethod
+    def _extraer_recurso(item: dict) -> Dict:
+        """Variantes de imagen y video de un post (o de un hijo de carrusel), marcando las elegidas"""
+        def variantes(lista) -> List[Dict]:
+            candidatos = [{'url': v.get('url'), 'ancho': v.get('width'), 'alto': v.get('height')}
+                          for v in lista or [] if v.get('url')]
+            elegida = ScraperPerfil.seleccionar_candidato(candidatos)
+            for candidato in candidatos:
+                candidato['seleccionada'] = candidato is elegida
+            return candidatos
+        
+        return {
+            'id_recurso': str(item.get('pk') or item.get('id') or ''),
+            'es_video': item.get('media_type') == 2,
+            'imagenes': variantes((item.get('image_versions2') or {}).get('candidates')),
+            'videos': variantes(item.get('video_versions')),
+        }
+    
+    @staticmethod
+    def extract_posts_data(data: dict) -> list:
+        """
+        Extrae datos de posts de la respuesta
+        
+        Además de los campos básicos captura, sin requests extra, lo que ya trae el payload:
+        hijos del carrusel, todas las variantes de imagen/video, fecha y texto. thumbnail_url y
+        video_url son las variantes elegidas por POSTS_CONFIG['politica_candidato'].
+        """
         posts_list = []
         if data and 'data' in data and data['data']:
             if 'xdt_api__v1__feed__user_timeline_graphql_connection' in data['data']:
@@ -268,17 +475,29 @@ class ScraperPerfil:
                 for edge in post_edges:
                     node = edge.get('node', {})
                     if node:
+                        principal = ScraperPerfil._extraer_recurso(node)
+                        hijos = [ScraperPerfil._extraer_recurso(hijo) for hijo in node.get('carousel_media') or []]
+                        recursos = hijos or [principal]
+                        imagen = ScraperPerfil.seleccionar_candidato(principal['imagenes'] or recursos[0]['imagenes'])
+                        video = ScraperPerfil.seleccionar_candidato(principal['videos'])
                         post_data = {
                             'shortcode': node.get('code'),
-                            'thumbnail_url': node.get('image_versions2', {}).get('candidates', [{}])[0].get('url'),
+                            'thumbnail_url': imagen.get('url'),
+                            'video_url': video.get('url'),
                             'is_video': node.get('media_type') == 2,
+                            'tipo': 'carrusel' if hijos else ('video' if node.get('media_type') == 2 else 'foto'),
                             'like_count': node.get('like_count'),
-                            'comment_count': node.get('comment_count')
+                            'comment_count': node.get('comment_count'),
+                            'fecha_publicacion': node.get('taken_at'),
+                            'texto': (node.get('caption') or {}).get('text'),
+                            'id_post': str(node.get('pk') or node.get('id') or ''),
+                            'recursos': recursos,
                         }
                         posts_list.append(post_data)
         return posts_list
     
-    def extract_highlights_data(self, data: dict) -> list:
+    @staticmethod
+    def extract_highlights_data(data: dict) -> list:
         """Extrae datos de highlights de la respuesta"""
         highlights_list = []
         if data and 'data' in data and data['data']:
@@ -295,148 +514,373 @@ class ScraperPerfil:
                         highlights_list.append(highlight_data)
         return highlights_list
     
-    def scrape_user_complete(self, username: str) -> Dict:
+    def _registrar_consulta(self, tipo: str, exito: bool, extracted_data: Dict) -> None:
+        """Registra el resultado de una consulta en el breaker y marca el perfil afectado"""
+        self.breaker.registrar(tipo, exito)
+        if exito:
+            # Las consultas correctas renuevan su fecha en la BD (intervalos de REFRESCO_CONFIG)
+            extracted_data.setdefault('consultas_ok', []).append(tipo)
+        else:
+            extracted_data.setdefault('consultas_fallidas', []).append(tipo)
+    
+    def _fetch_user_stage(self, user_id: str, username: str, extracted_data: Dict) -> bool:
         """
-        Scrapea un usuario completo (datos básicos, posts e highlights)
+        Obtiene los datos y métricas del perfil y los agrega a extracted_data
+        
+        Si falla, extracted_data lleva 'error' y 'tipo_fallo' ('rate_limit', 'consulta', 'http' o 'parseo').
         
-        Args:
-            username (str): Username del usuario a scrapear
-            
         Returns:
-            Dict: Datos completos del usuario
+            bool: True si la consulta respondió correctamente
         """
-        print(f"\n[*] Scrapeando usuario completo: @{username}")
-        
-        # 1. Obtener user_id
-        user_id = self.get_user_id_from_username(username)
-        if not user_id:
-            return {'username': username, 'error': 'User ID not found'}
-        
-        extracted_data = {'username': username}
-        
-        # 2. Obtener datos de usuario (__req = 3)
-        print("[*] Obteniendo datos de usuario...")
+        logger.debug("[*] Obteniendo datos de usuario...")
         try:
-            response_user = self.make_graphql_request(user_id, 3, self.DOC_IDS['user'], "user")
+            response_user = self.make_graphql_request("user", user_id)
             if response_user.status_code == 429:
-                print(f"[!] Rate limit alcanzado para '{username}'. Saltando usuario.")
-                return {'username': username, 'error': 'Rate limit (429)'}
+                logger.warning(f"[!] Rate limit alcanzado para '{username}'. Saltando usuario.")
+                extracted_data['error'] = 'Rate limit (429)'
+                extracted_data['tipo_fallo'] = 'rate_limit'
+                return False
             elif response_user.status_code == 200:
+                self._archivar(username, 'user', response_user)
                 data_user = response_user.json()
                 if 'errors' not in data_user and 'data' in data_user and data_user['data']['user']:
+                    self._registrar_consulta('user', True, extracted_data)
                     user_info = self.extract_user_data(data_user)
                     extracted_data.update(user_info)
                     
-                    # Mostrar información detallada del usuario
-                    print("✓ Datos de usuario obtenidos:")
-                    print(f"   👤 Username: @{user_info.get('username', 'N/A')}")
-                    print(f"   👤 Nombre completo: {user_info.get('full_name', 'N/A')}")
-                    print(f"   📝 Biografía: {(user_info.get('biography') or 'Sin biografía')[:50]}{'...' if len(user_info.get('biography', '')) > 50 else ''}")
-                    print(f"   👥 Seguidores: {self.format_number(user_info.get('follower_count'))}")
-                    print(f"   👤 Siguiendo: {self.format_number(user_info.get('following_count'))}")
-                    print(f"   📸 Posts: {self.format_number(user_info.get('media_count'))}")
-                    print(f"   🔒 Privado: {'Sí' if user_info.get('is_private') else 'No'}")
-                    print(f"   🏢 Negocio: {'Sí' if user_info.get('is_business') else 'No'}")
-                    if user_info.get('category'):
-                        print(f"   📂 Categoría: {user_info.get('category')}")
-                    if user_info.get('external_url'):
-                        print(f"   🔗 Link externo: {user_info.get('external_url')}")
+                    # Mostrar información detallada del usuario (solo en nivel DEBUG)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        biografia = user_info.get('biography') or 'Sin biografía'
+                        lineas = [
+                            "✓ Datos de usuario obtenidos:",
+                            f"   👤 Username: @{user_info.get('username', 'N/A')}",
+                            f"   👤 Nombre completo: {user_info.get('full_name', 'N/A')}",
+                            f"   📝 Biografía: {biografia[:50]}{'...' if len(biografia) > 50 else ''}",
+                            f"   👥 Seguidores: {self.format_number(user_info.get('follower_count'))}",
+                            f"   👤 Siguiendo: {self.format_number(user_info.get('following_count'))}",
+                            f"   📸 Posts: {self.format_number(user_info.get('media_count'))}",
+                            f"   🔒 Privado: {'Sí' if user_info.get('is_private') else 'No'}",
+                            f"   🏢 Negocio: {'Sí' if user_info.get('is_business') else 'No'}",
+                        ]
+                        if user_info.get('category'):
+                            lineas.append(f"   📂 Categoría: {user_info.get('category')}")
+                        if user_info.get('external_url'):
+                            lineas.append(f"   🔗 Link externo: {user_info.get('external_url')}")
+                        logger.debug("\n".join(lineas))
+                    return True
                 else:
-                    print("✗ Error en respuesta de datos de usuario")
+                    self._registrar_consulta('user', False, extracted_data)
+                    logger.warning(f"✗ Error en respuesta de datos de usuario para '{username}'")
                     extracted_data['error'] = 'User data response error'
+                    extracted_data['tipo_fallo'] = 'consulta'
             else:
-                print(f"✗ Error HTTP obteniendo datos de usuario: {response_user.status_code}")
+                self._registrar_consulta('user', False, extracted_data)
+                logger.warning(f"✗ Error HTTP obteniendo datos de usuario de '{username}': {response_user.status_code}")
                 extracted_data['error'] = f'HTTP {response_user.status_code}'
+                extracted_data['tipo_fallo'] = 'http'
+        except (TiempoExcedido, SesionInvalida):
+            raise
         except Exception as e:
-            print(f"✗ Error parseando datos de usuario: {e}")
+            self._registrar_consulta('user', False, extracted_data)
+            logger.error(f"✗ Error parseando datos de usuario de '{username}': {e}")
             extracted_data['error'] = str(e)
+            extracted_data['tipo_fallo'] = 'parseo'
+        return False
+    
+    def _fetch_highlights_stage(self, user_id: str, username: str, extracted_data: Dict) -> bool:
+        """
+        Obtiene los highlights de un perfil y los guarda en extracted_data['highlights']
+        
+        La clave solo se agrega si la consulta respondió: sin ella se conserva la media guardada.
         
-        # 3. Obtener highlights (__req = 5)
-        print("[*] Obteniendo highlights...")
+        Returns:
+            bool: True si la consulta respondió correctamente
+        """
+        logger.debug("[*] Obteniendo highlights...")
         try:
-            response_highlights = self.make_graphql_request(user_id, 5, self.DOC_IDS['highlights'], "highlights")
+            response_highlights = self.make_graphql_request("highlights", user_id)
             if response_highlights.status_code == 429:
-                print(f"[!] Rate limit en highlights para '{username}'. Saltando highlights.")
-                extracted_data['highlights'] = []
+                logger.warning(f"[!] Rate limit en highlights para '{username}'. Saltando highlights.")
+                # Un rate limit no indica doc_id obsoleto: no cuenta en el breaker
+                extracted_data.setdefault('consultas_fallidas', []).append('highlights')
+                return False
             elif response_highlights.status_code == 200:
+                self._archivar(username, 'highlights', response_highlights)
                 data_highlights = response_highlights.json()
                 if 'errors' not in data_highlights:
+                    self._registrar_consulta('highlights', True, extracted_data)
                     highlights = self.extract_highlights_data(data_highlights)
                     extracted_data['highlights'] = highlights
-                    print(f"✓ {len(highlights)} highlights obtenidos")
-                    if highlights:
-                        print("   📚 Highlights encontrados:")
-                        for i, highlight in enumerate(highlights[:5], 1):  # Mostrar solo los primeros 5
-                            title = highlight.get('title', 'Sin título')
-                            print(f"      {i}. {title}")
-                        if len(highlights) > 5:
-                            print(f"      ... y {len(highlights) - 5} más")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        lineas = [f"✓ {len(highlights)} highlights obtenidos"]
+                        if highlights:
+                            lineas.append("   📚 Highlights encontrados:")
+                            for i, highlight in enumerate(highlights[:5], 1):  # Mostrar solo los primeros 5
+                                lineas.append(f"      {i}. {highlight.get('title', 'Sin título')}")
+                            if len(highlights) > 5:
+                                lineas.append(f"      ... y {len(highlights) - 5} más")
+                        logger.debug("\n".join(lineas))
+                    return True
                 else:
-                    print("✗ Error en respuesta de highlights")
-                    extracted_data['highlights'] = []
+                    self._registrar_consulta('highlights', False, extracted_data)
+                    logger.warning(f"✗ Error en respuesta de highlights para '{username}'")
             else:
-                print(f"✗ Error HTTP obteniendo highlights: {response_highlights.status_code}")
-                extracted_data['highlights'] = []
+                self._registrar_consulta('highlights', False, extracted_data)
+                logger.warning(f"✗ Error HTTP obteniendo highlights de '{username}': {response_highlights.status_code}")
+        except (TiempoExcedido, SesionInvalida):
+            raise
         except Exception as e:
-            print(f"✗ Error parseando highlights: {e}")
-            extracted_data['highlights'] = []
+            self._registrar_consulta('highlights', False, extracted_data)
+            logger.error(f"✗ Error parseando highlights de '{username}': {e}")
+        return False
+    
+    def _fetch_posts_stage(self, user_id: str, username: str, extracted_data: Dict) -> bool:
+        """
+        Obtiene los posts recientes de un perfil y los guarda en extracted_data['posts']
         
-        # 4. Obtener posts (__req = 7)
-        if 'username' in extracted_data and not extracted_data.get('error'):
-            print("[*] Obteniendo posts...")
-            try:
-                response_posts = self.make_graphql_request(user_id, 7, self.DOC_IDS['posts'], "posts", username)
-                if response_posts.status_code == 429:
-                    print(f"[!] Rate limit en posts para '{username}'. Saltando posts.")
-                    extracted_data['posts'] = []
-                elif response_posts.status_code == 200:
-                    data_posts = response_posts.json()
-                    if 'errors' not in data_posts:
-                        posts = self.extract_posts_data(data_posts)
-                        extracted_data['posts'] = posts
-                        print(f"✓ {len(posts)} posts obtenidos")
+        La clave solo se agrega si la consulta respondió: sin ella se conserva la media guardada.
+        
+        Returns:
+            bool: True si la consulta respondió correctamente
+        """
+        logger.debug("[*] Obteniendo posts...")
+        try:
+            response_posts = self.make_graphql_request("posts", user_id, username)
+            if response_posts.status_code == 429:
+                logger.warning(f"[!] Rate limit en posts para '{username}'. Saltando posts.")
+                # Un rate limit no indica doc_id obsoleto: no cuenta en el breaker
+                extracted_data.setdefault('consultas_fallidas', []).append('posts')
+                return False
+            elif response_posts.status_code == 200:
+                self._archivar(username, 'posts', response_posts)
+                data_posts = response_posts.json()
+                if 'errors' not in data_posts:
+                    self._registrar_consulta('posts', True, extracted_data)
+                    posts = self.extract_posts_data(data_posts)
+                    extracted_data['posts'] = posts
+                    if logger.isEnabledFor(logging.DEBUG):
+                        lineas = [f"✓ {len(posts)} posts obtenidos"]
                         if posts:
                             # Calcular estadísticas de posts
                             total_likes = sum(post.get('like_count', 0) for post in posts if post.get('like_count'))
                             total_comments = sum(post.get('comment_count', 0) for post in posts if post.get('comment_count'))
                             videos = sum(1 for post in posts if post.get('is_video'))
                             photos = len(posts) - videos
+                            avg_likes = total_likes / len(posts) if total_likes > 0 else 0
                             
-                            print("   📊 Estadísticas de posts:")
-                            print(f"      📸 Fotos: {photos} | 🎥 Videos: {videos}")
-                            print(f"      ❤️ Total likes: {self.format_number(total_likes)}")
-                            print(f"      💬 Total comentarios: {self.format_number(total_comments)}")
-                            if posts:
-                                avg_likes = total_likes / len(posts) if total_likes > 0 else 0
-                                print(f"      📈 Promedio likes: {self.format_number(int(avg_likes))}")
-                    else:
-                        print("✗ Error en respuesta de posts")
-                        extracted_data['posts'] = []
+                            lineas.extend([
+                                "   📊 Estadísticas de posts:",
+                                f"      📸 Fotos: {photos} | 🎥 Videos: {videos}",
+                                f"      ❤️ Total likes: {self.format_number(total_likes)}",
+                                f"      💬 Total comentarios: {self.format_number(total_comments)}",
+                                f"      📈 Promedio likes: {self.format_number(int(avg_likes))}",
+                            ])
+                        logger.debug("\n".join(lineas))
+                    return True
                 else:
-                    print(f"✗ Error HTTP obteniendo posts: {response_posts.status_code}")
-                    extracted_data['posts'] = []
+                    self._registrar_consulta('posts', False, extracted_data)
+                    logger.warning(f"✗ Error en respuesta de posts para '{username}'")
+            else:
+                self._registrar_consulta('posts', False, extracted_data)
+                logger.warning(f"✗ Error HTTP obteniendo posts de '{username}': {response_posts.status_code}")
+        except (TiempoExcedido, SesionInvalida):
+            raise
+        except Exception as e:
+            self._registrar_consulta('posts', False, extracted_data)
+            logger.error(f"✗ Error parseando posts de '{username}': {e}")
+        return False
+    
+    @staticmethod
+    def extract_highlight_items(data: dict) -> Dict[str, list]:
+        """Extrae los items de cada destacada de una respuesta de reels_media (id del reel -> items)"""
+        reels = data.get('reels') or {reel.get('id'): reel for reel in data.get('reels_media') or []}
+        contenido = {}
+        for id_reel, reel in reels.items():
+            items = []
+            for item in (reel or {}).get('items') or []:
+                es_video = item.get('media_type') == 2
+                miniatura = (item.get('image_versions2') or {}).get('candidates', [{}])[0].get('url')
+                video = (item.get('video_versions') or [{}])[0].get('url')
+                items.append({
+                    'id_item': str(item.get('pk') or item.get('id')),
+                    'es_video': es_video,
+                    'url_media': video if es_video and video else miniatura,
+                    'url_miniatura': miniatura,
+                    'fecha_publicacion': item.get('taken_at'),
+                })
+            contenido[str(id_reel)] = items
+        return contenido
+    
+    @staticmethod
+    def _id_reel(id_destacada: str) -> str:
+        """Id que espera reels_media para una destacada del tray ('highlight:<id>')"""
+        id_destacada = str(id_destacada)
+        return id_destacada if id_destacada.startswith('highlight:') else f'highlight:{id_destacada}'
+    
+    def _fetch_highlight_contents_stage(self, username: str, extracted_data: Dict) -> bool:
+        """
+        Obtiene los items de las destacadas nuevas o cambiadas en extracted_data['contenido_destacadas']
+        
+        Las destacadas con el mismo título y portada que en el último scraping se saltan. El resto
+        se pide a reels_media en lotes de DESTACADAS_CONFIG['ids_por_request'] ids, repartidos entre
+        DESTACADAS_CONFIG['workers'] hilos; cada request pasa por el limitador compartido.
+        
+        Returns:
+            bool: True si todos los lotes respondieron correctamente
+        """
+        highlights = extracted_data.get('highlights') or []
+        sin_cambios = self.db.destacadas_sin_cambios(username, highlights)
+        pendientes = [h['id'] for h in highlights if h.get('id') and h['id'] not in sin_cambios]
+        extracted_data['contenido_destacadas'] = {}
+        if not pendientes:
+            logger.debug(f"[*] Contenido de destacadas sin cambios ({len(sin_cambios)} saltadas)")
+            return True
+        
+        logger.debug(f"[*] Obteniendo contenido de {len(pendientes)} destacadas ({len(sin_cambios)} sin cambios)...")
+        n = DESTACADAS_CONFIG['ids_por_request']
+        lotes = [pendientes[i:i + n] for i in range(0, len(pendientes), n)]
+        
+        def pedir(lote: List[str]):
+            url = "https://www.instagram.com/api/v1/feed/reels_media/?" + urlencode(
+                [('reel_ids', self._id_reel(id_destacada)) for id_destacada in lote])
+            return self._solicitar('GET', url, 'contenido_destacadas')
+        
+        # Solo las requests van en paralelo; archivo, breaker y parseo se manejan en este hilo
+        with ThreadPoolExecutor(max_workers=min(DESTACADAS_CONFIG['workers'], len(lotes))) as pool:
+            respuestas = list(pool.map(pedir, lotes))
+        
+        exito = True
+        for lote, response in zip(lotes, respuestas):
+            try:
+                if response.status_code != 200:
+                    logger.warning(f"✗ Error HTTP obteniendo contenido de destacadas de '{username}': "
+                                   f"{response.status_code}")
+                    exito = False
+                    continue
+                self._archivar(username, 'contenido_destacadas', response)
+                contenido = self.extract_highlight_items(response.json())
+                # Solo se registran las destacadas presentes en la respuesta (las demás se piden la próxima vez)
+                for id_destacada in lote:
+                    items = contenido.get(self._id_reel(id_destacada))
+                    if items is not None:
+                        extracted_data['contenido_destacadas'][id_destacada] = items
             except Exception as e:
-                print(f"✗ Error parseando posts: {e}")
-                extracted_data['posts'] = []
+                logger.error(f"✗ Error parseando contenido de destacadas de '{username}': {e}")
+                exito = False
+        
+        self._registrar_consulta('contenido_destacadas', exito, extracted_data)
+        logger.debug(f"✓ {sum(map(len, extracted_data['contenido_destacadas'].values()))} items de "
+                     f"{len(extracted_data['contenido_destacadas'])} destacadas obtenidos")
+        return exito
+    
+    def scrape_user_complete(self, username: str, consultas: Optional[List[str]] = None) -> Dict:
+        """
+        Scrapea un usuario completo (datos básicos, posts e highlights)
+        
+        Sin `consultas`, se saltan las que siguen vigentes según REFRESCO_CONFIG: sus datos
+        se conservan en la BD y el resultado no trae su clave ('posts', 'highlights'), o trae
+        los datos de usuario guardados. Si no se pide la consulta de usuario, se usa el
+        id_instagram guardado y también se omite web_profile_info.
+        
+        Todas las consultas del perfil comparten un deadline (SCRAPING_CONFIG['deadline_perfil']);
+        si se agota, o una request supera su timeout, el perfil se cancela y el resultado
+        lleva tipo_fallo='timeout' para que quede pendiente en lugar de guardarse incompleto.
+        Si la sesión caducó y no se pudo re-autenticar, el resultado lleva tipo_fallo='sesion'.
+        
+        Args:
+            username (str): Username del usuario a scrapear
+            consultas (List[str], optional): Consultas a pedir de CONSULTAS_PERFIL (por defecto, las vencidas)
+            
+        Returns:
+            Dict: Datos completos del usuario
+        """
+        self.deadline = Deadline()
+        try:
+            return self._scrape_user_stages(username, consultas)
+        except TiempoExcedido as e:
+            logger.warning(f"⏱️ @{username} cancelado: {e}")
+            return {'username': username, 'error': str(e), 'tipo_fallo': 'timeout'}
+        except SesionInvalida as e:
+            logger.error(f"🔐 @{username} cancelado: {e}")
+            return {'username': username, 'error': str(e), 'tipo_fallo': 'sesion'}
+        finally:
+            self.deadline = None
+    
+    def _scrape_user_stages(self, username: str, consultas: Optional[List[str]] = None) -> Dict:
+        """Ejecuta las consultas de scrape_user_complete dentro del deadline ya iniciado"""
+        logger.debug(f"[*] Scrapeando usuario completo: @{username}")
+        
+        id_guardado, vigentes = self.db.estado_consultas(username, REFRESCO_CONFIG)
+        if consultas is None:
+            consultas = [consulta for consulta in CONSULTAS_PERFIL if consulta not in vigentes]
+        # Sin id guardado no hay con qué pedir las demás: la consulta de usuario lo resuelve
+        if not id_guardado and 'user' not in consultas:
+            consultas = ['user'] + list(consultas)
+        pedir = set(consultas)
+        if len(pedir) < len(CONSULTAS_PERFIL):
+            logger.debug(f"[*] Consultas vigentes (se conservan): "
+                         f"{', '.join(c for c in CONSULTAS_PERFIL if c not in pedir)}")
+        
+        # 1. Obtener user_id (el guardado, si no se repite la consulta de usuario)
+        user_id = self.get_user_id_from_username(username) if 'user' in pedir else id_guardado
+        if not user_id:
+            resultado = {'username': username, 'error': 'User ID not found', 'tipo_fallo': self.fallo_perfil}
+            if self.breaker.ultimo_fallo('perfil'):
+                resultado['consultas_fallidas'] = ['perfil']
+            return resultado
+        
+        extracted_data = {'username': username, 'user_id': user_id}
+        
+        # 2. Obtener datos de usuario (o, si siguen vigentes, tomarlos de la BD)
+        if 'user' in pedir:
+            if not self._fetch_user_stage(user_id, username, extracted_data) and \
+                    extracted_data.get('tipo_fallo') == 'rate_limit':
+                return {'username': username, 'error': 'Rate limit (429)', 'tipo_fallo': 'rate_limit'}
         else:
-            print("✗ No se pudo obtener username, saltando consulta de posts")
-            extracted_data['posts'] = []
+            extracted_data.update(self.db.datos_usuario_guardados(username))
+        
+        # 3. Obtener highlights (y, si está activo, el contenido de las nuevas o cambiadas)
+        if 'highlights' in pedir:
+            if self._fetch_highlights_stage(user_id, username, extracted_data) and DESTACADAS_CONFIG['activo']:
+                self._fetch_highlight_contents_stage(username, extracted_data)
         
-        # Mostrar resumen final
+        # 4. Obtener posts
+        if 'posts' in pedir:
+            if 'username' in extracted_data and not extracted_data.get('error'):
+                self._fetch_posts_stage(user_id, username, extracted_data)
+            else:
+                logger.debug("✗ No se pudo obtener username, saltando consulta de posts")
+        
+        # Resumen final: una línea por perfil en INFO
         if not extracted_data.get('error'):
-            print(f"\n📋 RESUMEN COMPLETO - @{username}")
-            print("="*50)
-            print(f"👥 Seguidores: {self.format_number(extracted_data.get('follower_count'))}")
-            print(f"👤 Siguiendo: {self.format_number(extracted_data.get('following_count'))}")
-            print(f"📸 Posts totales: {self.format_number(extracted_data.get('media_count'))}")
-            print(f"📸 Posts extraídos: {len(extracted_data.get('posts', []))}")
-            print(f"📚 Highlights: {len(extracted_data.get('highlights', []))}")
-            print(f"🔒 Perfil privado: {'Sí' if extracted_data.get('is_private') else 'No'}")
-            if extracted_data.get('category'):
-                print(f"📂 Categoría: {extracted_data.get('category')}")
+            def conteo(clave: str):
+                if clave in extracted_data:
+                    return len(extracted_data[clave])
+                return 'sin respuesta de' if clave in pedir else 'vigentes'
+            
+            resumen = (f"✓ @{username}: {self.format_number(extracted_data.get('follower_count'))} seguidores, "
+                       f"{conteo('posts')} posts, {conteo('highlights')} highlights")
+            if extracted_data.get('is_private'):
+                resumen += " (privado)"
+            logger.info(resumen)
         
         return extracted_data
     
+    @staticmethod
+    def adaptar_para_guardar(user_data: Dict) -> Dict:
+        """Adapta los datos extraídos a lo que espera insertar_usuario (copia)"""
+        adapted_user_data = user_data.copy()
+        
+        # Asegurar que full_name existe, usar username como fallback si está vacío
+        if not adapted_user_data.get('full_name'):
+            adapted_user_data['full_name'] = adapted_user_data.get('username')
+        
+        # Asegurar que is_business existe
+        if 'is_business' not in adapted_user_data:
+            adapted_user_data['is_business'] = adapted_user_data.get('account_type') == 3
+        
+        return adapted_user_data
+    
     def save_user_to_database(self, user_data: Dict) -> bool:
         """
         Guarda los datos del usuario en la base de datos
@@ -450,19 +894,16 @@ class ScraperPerfil:
         try:
             username = user_data.get('username')
             if not username:
-                print("❌ No se puede guardar: falta username")
+                logger.error("❌ No se puede guardar: falta username")
                 return False
             
-            # Adaptar datos para que coincidan con lo que espera insertar_usuario
-            adapted_user_data = user_data.copy()
-            
-            # Asegurar que full_name existe, usar username como fallback si está vacío
-            if not adapted_user_data.get('full_name'):
-                adapted_user_data['full_name'] = username
+            # Fallo transitorio: se conservan los datos previos y solo se programa el reintento.
+            # Los permanentes (perfil inexistente) se guardan como inactivos en caché negativa.
+            tipo_fallo = user_data.get('tipo_fallo') or 'desconocido'
+            if user_data.get('error') and tipo_fallo not in FALLOS_PERMANENTES:
+                return self.db.registrar_fallo(username, tipo_fallo)
             
-            # Asegurar que is_business existe
-            if 'is_business' not in adapted_user_data:
-                adapted_user_data['is_business'] = adapted_user_data.get('account_type') == 3
+            adapted_user_data = self.adaptar_para_guardar(user_data)
             
             # Guardar usuario
             self.db.insertar_usuario(adapted_user_data)
@@ -470,120 +911,463 @@ class ScraperPerfil:
             # Guardar media URLs (posts e highlights)
             self.db.insertar_media_urls(username, adapted_user_data)
             
+            # Contenido de las destacadas (solo si se pidió en este scraping)
+            if 'contenido_destacadas' in user_data:
+                self.db.guardar_contenido_destacadas(username, user_data.get('highlights', []),
+                                                     user_data['contenido_destacadas'])
+            
             # Obtener conteos para el mensaje
             posts_count = len(user_data.get('posts', []))
             highlights_count = len(user_data.get('highlights', []))
             
-            print(f"✅ Usuario @{username} guardado en BD ({posts_count} posts, {highlights_count} highlights)")
+            logger.debug(f"✅ Usuario @{username} guardado en BD ({posts_count} posts, {highlights_count} highlights)")
             return True
             
         except Exception as e:
-            print(f"❌ Error guardando usuario en BD: {e}")
+            logger.error(f"❌ Error guardando usuario en BD: {e}")
             return False
     
-    def scrape_pending_users(self) -> None:
-        """Scrapea todos los usuarios pendientes en la base de datos"""
-        print("\n" + "="*60)
-        print("🚀 SCRAPER DE PERFILES - USUARIOS PENDIENTES")
-        print("="*60)
+    def scrape_pending_users(self, max_minutos: Optional[float] = None, max_requests: Optional[int] = None,
+                             max_perfiles: Optional[int] = None, orden: Optional[str] = None,
+                             reanudar: Optional[bool] = None, solo: Optional[str] = None) -> None:
+        """
+        Scrapea los usuarios pendientes en la base de datos, dentro de los límites de la ejecución
+        
+        Al alcanzar un límite (o con Ctrl+C) se detiene entre perfiles: guarda los perfiles
+        diferidos y la posición del cursor, y la próxima ejecución continúa desde ahí.
+        
+        Con `solo`, en lugar de los pendientes recorre los perfiles ya scrapeados cuya consulta
+        `solo` venció (REFRESCO_CONFIG) y pide únicamente esa, con el id guardado.
+        
+        Args:
+            max_minutos (float, optional): Tiempo de pared máximo (por defecto, de config)
+            max_requests (int, optional): Requests a la API máximas (por defecto, de config)
+            max_perfiles (int, optional): Perfiles procesados máximos (por defecto, de config)
+            orden (str, optional): 'antiguedad' o 'seguidores' (por defecto, de config)
+            reanudar (bool, optional): Si continuar un batch anterior detenido (por defecto, de config)
+            solo (str, optional): Consulta de CONSULTAS_PERFIL a refrescar en todos los perfiles vencidos
+        """
+        if solo is not None and solo not in CONSULTAS_PERFIL:
+            raise ValueError(f"Consulta inválida: {solo} (válidas: {', '.join(CONSULTAS_PERFIL)})")
+        
+        logger.info("\n" + "="*60)
+        logger.info(f"🚀 SCRAPER DE PERFILES - {f'SOLO CONSULTA {solo.upper()}' if solo else 'USUARIOS PENDIENTES'}")
+        logger.info("="*60)
+        
+        force_rescrape = SCRAPING_CONFIG['force_rescrape']
+        orden = orden or SCRAPING_CONFIG['orden_pendientes']
+        reanudar = SCRAPING_CONFIG['reanudar_batch'] if reanudar is None else reanudar
+        presupuesto = PresupuestoBatch(
+            max_minutos if max_minutos is not None else SCRAPING_CONFIG['max_minutos_batch'],
+            max_requests if max_requests is not None else SCRAPING_CONFIG['max_requests_batch'],
+            max_perfiles if max_perfiles is not None else SCRAPING_CONFIG['max_perfiles_batch'],
+        )
+        
+        # Posición de un batch anterior que no terminó: solo sirve con el mismo orden y modo
+        nombre_batch = f'solo_{solo}' if solo else 'pendientes'
+        posicion = self.db.obtener_posicion_batch(nombre_batch) if reanudar else None
+        if posicion and not solo and \
+                (posicion.get('orden'), posicion.get('force_rescrape')) != (orden, force_rescrape):
+            logger.info("[*] La posición guardada es de otro orden o modo: se empieza un recorrido nuevo")
+            posicion = None
+        cola = deque(posicion.pop('cola', [])) if posicion else deque()  # Reintentos, antes que el resto del cursor
         
-        # Obtener usuarios pendientes
-        pending_usernames = self.db.obtener_usuarios_para_scrapear(force_rescrape=SCRAPING_CONFIG['force_rescrape'])
+        # Cursor por páginas sobre los pendientes (o los vencidos de la consulta `solo`): no
+        # materializa el backlog y toma los usernames agregados durante la ejecución
+        if solo:
+            pendientes = self.db.iterar_consultas_vencidas(solo, REFRESCO_CONFIG.get(solo), posicion=posicion)
+        else:
+            pendientes = self.db.iterar_usuarios_pendientes(force_rescrape=force_rescrape, posicion=posicion,
+                                                            orden=orden)
+        consultas = [solo] if solo else None
+        total = pendientes.contar() + len(cola)
         
-        if not pending_usernames:
-            print("✅ No hay usuarios pendientes para scrapear")
+        if not total:
+            logger.info("✅ No hay usuarios pendientes para scrapear")
+            self.db.guardar_posicion_batch(nombre_batch, None)
             return
         
-        print(f"📋 Usuarios pendientes: {len(pending_usernames)}")
-        for username in pending_usernames:
-            print(f"   - @{username}")
+        if posicion:
+            logger.info(f"📍 Reanudando el batch anterior ({len(cola)} perfiles en cola de reintento)")
+        logger.info(f"📋 Usuarios pendientes: {total}")
         
         # Autenticar
         if not self.autenticar(headless=SCRAPING_CONFIG['headless']):
-            print("❌ Error en autenticación. Abortando.")
+            logger.error("❌ Error en autenticación. Abortando.")
             return
         
         # Scrapear cada usuario
         successful = 0
         failed = 0
+        siguientes = iter(pendientes)
+        progreso = ProgresoBatch(total=total)
+        requests_inicio = self.limitador.concedidas
         
-        for i, username in enumerate(pending_usernames, 1):
-            print(f"\n[{i}/{len(pending_usernames)}] Scrapeando @{username}...")
-            
-            try:
-                # Scrapear usuario completo
-                user_data = self.scrape_user_complete(username)
+        # Perfiles con consultas fallidas: no se guardan (ni se marcan inactivos) hasta
+        # descartar un fallo sistémico de doc_id/tokens. Elementos: (índice, user_data)
+        diferidos = deque()
+        refrescos = 0
+        detenido = False
+        limite = None  # Motivo de una detención limpia (límite de la ejecución o Ctrl+C)
+        en_curso = None
+        pausar = False  # Solo se espera entre perfiles si el anterior hizo requests
+        timeouts = 0
+        i = 0
+        
+        try:
+            while True:
+                limite = presupuesto.agotado()
+                if limite:
+                    logger.warning(f"⏹️ Límite de la ejecución alcanzado: {limite}. Deteniendo batch.")
+                    break
                 
-                # Si hay error de rate limit, aumentar el delay
-                if user_data.get('error') == 'Rate limit (429)':
-                    print(f"⏳ Rate limit detectado. Esperando 120s adicionales...")
-                    time.sleep(120)  # Esperar 2 minutos adicionales
-                    failed += 1
-                elif self.save_user_to_database(user_data):
-                    successful += 1
-                else:
-                    failed += 1
+                username = cola.popleft() if cola else next(siguientes, None)
+                if username is None:
+                    break
+                en_curso = username
+                i += 1
+                if i > total:  # Usernames agregados durante la ejecución
+                    total = progreso.total = i
                 
                 # Delay entre usuarios
-                if i < len(pending_usernames):
+                if pausar:
                     delay = random.uniform(SCRAPING_CONFIG['delay_min'], SCRAPING_CONFIG['delay_max'])
-                    print(f"⏳ Esperando {delay:.1f}s antes del siguiente usuario...")
+                    logger.debug(f"⏳ Esperando {delay:.1f}s antes del siguiente usuario...")
                     time.sleep(delay)
+                
+                logger.info(f"[{i}/{total}] Scrapeando @{username}...")
+                exito = False
+                requests_previas = self.limitador.concedidas
+                
+                try:
+                    # Scrapear usuario completo (o solo las consultas vencidas)
+                    user_data = self.scrape_user_complete(username, consultas)
                     
-            except Exception as e:
-                print(f"❌ Error scrapeando @{username}: {e}")
-                failed += 1
+                    if user_data.get('tipo_fallo') == 'sesion':
+                        # Sin sesión no tiene sentido seguir: el perfil vuelve a la cola y queda pendiente
+                        logger.error("🛑 Sesión inválida y sin posibilidad de re-autenticar. Deteniendo batch.")
+                        cola.appendleft(username)
+                        en_curso = None
+                        detenido = True
+                        break
+                    
+                    # Si hay error de rate limit, aumentar el delay (no cuenta como fallo del perfil).
+                    # La espera no pasa del tiempo que le queda a la ejecución
+                    if user_data.get('tipo_fallo') == 'rate_limit':
+                        restante = presupuesto.restante()
+                        espera = 120 if restante is None else min(120, restante)
+                        logger.warning(f"⏳ Rate limit detectado. Esperando {espera:.0f}s adicionales...")
+                        time.sleep(espera)
+                        if espera < 120:
+                            # Se agotó el tiempo de la ejecución (se detiene al volver al inicio
+                            # del ciclo): el perfil limitado se reintenta al reanudar
+                            cola.appendleft(username)
+                    elif user_data.get('tipo_fallo') == 'timeout':
+                        # No se guardan datos: el perfil queda pendiente, con backoff antes del próximo intento
+                        self.db.registrar_fallo(username, 'timeout')
+                        timeouts += 1
+                    elif user_data.get('consultas_fallidas'):
+                        diferidos.append((i, user_data))
+                    elif self.save_user_to_database(user_data):
+                        exito = not user_data.get('error')
+                
+                except Exception as e:
+                    logger.error(f"❌ Error scrapeando @{username}: {e}")
+                
+                en_curso = None
+                pausar = self.limitador.concedidas > requests_previas
+                if exito:
+                    successful += 1
+                else:
+                    failed += 1
+                progreso.actualizar(exito)
+                presupuesto.registrar_perfil(self.limitador.concedidas - requests_inicio)
+                
+                tipo_disparado = self.breaker.disparado()
+                if tipo_disparado:
+                    logger.error(f"🛑 Circuit breaker disparado: {self.breaker.tasa_error(tipo_disparado):.0%} de error "
+                                 f"en consultas '{tipo_disparado}' (doc_id obsoleto o tokens expirados)")
+                    
+                    if refrescos >= CIRCUIT_BREAKER_CONFIG['max_refrescos']:
+                        logger.error("🛑 El problema persiste tras refrescar tokens. Deteniendo batch.")
+                        detenido = True
+                        break
+                    refrescos += 1
+                    
+                    pausa = CIRCUIT_BREAKER_CONFIG['pausa_segundos']
+                    logger.warning(f"⏸️ Pausando batch {pausa}s antes de refrescar tokens...")
+                    time.sleep(pausa)
+                    
+                    if not self.refrescar_tokens():
+                        logger.error("🛑 No se pudieron refrescar los tokens. Deteniendo batch.")
+                        detenido = True
+                        break
+                    
+                    # Reintentar primero los perfiles afectados
+                    reintentos = [datos['username'] for _, datos in diferidos]
+                    cola.extendleft(reversed(reintentos))
+                    total += len(reintentos)
+                    progreso.total = total
+                    diferidos.clear()
+                else:
+                    # Fallos que ya pasaron una ventana completa sin disparar el breaker son aislados
+                    while diferidos and diferidos[0][0] <= i - self.breaker.ventana:
+                        _, datos = diferidos.popleft()
+                        self.save_user_to_database(datos)
+        
+        except KeyboardInterrupt:
+            # El perfil interrumpido no se guardó: vuelve a la cola de la posición guardada
+            limite = 'interrumpido por el usuario'
+            logger.warning("⏹️ Interrumpido por el usuario. Guardando lo pendiente y la posición...")
+            if en_curso:
+                cola.appendleft(en_curso)
+        
+        if detenido:
+            # Los diferidos no se guardan (podrían ser un fallo sistémico): se reintentan al reanudar
+            cola.extendleft(reversed([datos['username'] for _, datos in diferidos]))
+            logger.warning(f"⚠️ {len(cola) + pendientes.contar()} perfiles quedan pendientes "
+                           "para la próxima ejecución (los afectados no se marcaron como inactivos)")
+        else:
+            for _, datos in diferidos:
+                self.save_user_to_database(datos)
+        
+        # Posición para la próxima ejecución (o borrarla si el recorrido terminó)
+        if detenido or limite:
+            self.db.guardar_posicion_batch(nombre_batch, dict(pendientes.posicion or {}, cola=list(cola)))
+        else:
+            self.db.guardar_posicion_batch(nombre_batch, None)
+        
+        progreso.finalizar()
         
         # Resumen final
-        print(f"\n" + "="*60)
-        print("📊 RESUMEN FINAL")
-        print("="*60)
-        print(f"✅ Exitosos: {successful}")
-        print(f"❌ Fallidos: {failed}")
-        print(f"📁 Base de datos: {self.db_path}")
+        logger.info("\n" + "="*60)
+        logger.info("📊 RESUMEN FINAL")
+        logger.info("="*60)
+        logger.info(f"✅ Exitosos: {successful}")
+        logger.info(f"❌ Fallidos: {failed}")
+        if timeouts:
+            logger.info(f"⏱️ Cancelados por timeout (quedan pendientes): {timeouts}")
+        if self.monitor.reautenticaciones:
+            logger.info(f"🔐 Re-autenticaciones por sesión inválida: {self.monitor.reautenticaciones}")
+        logger.info(f"🌐 Requests: {self.limitador.concedidas - requests_inicio} | "
+                    f"Duración: {(time.monotonic() - presupuesto.inicio) / 60:.1f} min")
+        if limite:
+            logger.info(f"⏹️ Detenido por límite ({limite}): la próxima ejecución continúa desde aquí")
+        logger.info(f"📁 Base de datos: {self.db_path}")
         
         if OUTPUT_CONFIG['save_csv']:
             self.db.exportar_a_csv()
-            print(f"📄 CSV exportado: {OUTPUT_CONFIG['csv_file']}")
+            logger.info(f"📄 CSV exportado: {OUTPUT_CONFIG['csv_file']}")
+        
+        # Vacuum incremental y control del presupuesto de tamaño de la base
+        from retencion import mantenimiento
+        try:
+            mantenimiento(self.db_path)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Mantenimiento de la base omitido: {e}")
+    
+    def refresh_expiring_media(self, horas: float = None) -> None:
+        """
+        Refresca solo las URLs de media firmadas que están por expirar
+        
+        Usa el id_instagram guardado, por lo que omite web_profile_info y la consulta
+        de usuario: por perfil solo se repiten las consultas de highlights y posts.
+        
+        Args:
+            horas (float, optional): Horizonte de expiración (por defecto, de config)
+        """
+        horas = horas if horas is not None else SCRAPING_CONFIG['horas_antes_expiracion']
+        perfiles = self.db.obtener_perfiles_media_por_expirar(horas)
+        
+        if not perfiles:
+            logger.info(f"✅ No hay URLs de media que expiren en las próximas {horas}h")
+            return
+        
+        logger.info(f"🔄 Perfiles con media por expirar en {horas}h: {len(perfiles)}")
+        
+        if not self.session and not self.autenticar(headless=SCRAPING_CONFIG['headless']):
+            logger.error("❌ Error en autenticación. Abortando.")
+            return
+        
+        refrescados = 0
+        fallidos = 0
+        progreso = ProgresoBatch(total=len(perfiles))
+        
+        for i, (username, user_id) in enumerate(perfiles, 1):
+            logger.info(f"[{i}/{len(perfiles)}] Refrescando media de @{username}...")
+            media = {'username': username}
+            
+            self.deadline = Deadline()
+            try:
+                highlights_ok = self._fetch_highlights_stage(user_id, username, media)
+                posts_ok = self._fetch_posts_stage(user_id, username, media)
+            except TiempoExcedido as e:
+                logger.warning(f"⏱️ Refresco de @{username} cancelado: {e}")
+                highlights_ok = posts_ok = False
+            except SesionInvalida as e:
+                logger.error(f"🛑 {e}. Deteniendo refresco.")
+                break
+            finally:
+                self.deadline = None
+            
+            # Solo se reemplaza la media si ambas consultas respondieron; si no, se conservan los links actuales
+            exito = highlights_ok and posts_ok and self.db.insertar_media_urls(username, media)
+            if exito:
+                refrescados += 1
+            else:
+                fallidos += 1
+            progreso.actualizar(exito)
+            
+            tipo_disparado = self.breaker.disparado()
+            if tipo_disparado:
+                logger.error(f"🛑 Circuit breaker disparado en consultas '{tipo_disparado}'. Deteniendo refresco.")
+                break
+            
+            if i < len(perfiles):
+                time.sleep(random.uniform(SCRAPING_CONFIG['delay_min'], SCRAPING_CONFIG['delay_max']))
+        
+        progreso.finalizar()
+        logger.info(f"🔄 Media refrescada: {refrescados} perfiles | ❌ Fallidos: {fallidos}")
     
     def add_users_to_database(self, usernames: List[str]) -> None:
         """
-        Agrega usuarios a la base de datos
+        Agrega usuarios a la base de datos (normalizados, deduplicados y en lotes)
         
         Args:
             usernames (List[str]): Lista de usernames a agregar
         """
-        print(f"\n[*] Agregando {len(usernames)} usuarios a la base de datos...")
+        logger.info(f"\n[*] Agregando {len(usernames)} usuarios a la base de datos...")
+        registrar_resumen(importar_usuarios(usernames, self.db))
+        logger.info(f"   📁 Base de datos: {self.db_path}")
+    
+    def add_users_from_file(self, ruta: str) -> None:
+        """
+        Agrega usuarios desde un archivo CSV/NDJSON/TXT ('-' para stdin)
         
-        added = 0
-        existing = 0
+        Args:
+            ruta (str): Ruta del archivo
+        """
+        logger.info(f"\n[*] Importando usuarios desde {ruta}...")
+        registrar_resumen(importar_archivo(ruta, self.db))
+        logger.info(f"   📁 Base de datos: {self.db_path}")
+
+def mostrar_estadisticas(db: InstagramDatabase):
+    """Imprime el resumen de la base de datos (opción 3 del menú y subcomando 'estadisticas')"""
+    stats = db.obtener_estadisticas()
+    print(f"\n📊 ESTADÍSTICAS DE BASE DE DATOS")
+    print(f"="*40)
+    print(f"👥 Total usuarios: {stats['total_usuarios']}")
+    print(f"✅ Activos: {stats['usuarios_activos']}")
+    print(f"❌ Inactivos: {stats['usuarios_inactivos']}")
+    print(f"🔒 Privados: {stats['usuarios_privados']}")
+    print(f"🏢 Negocios: {stats['usuarios_negocio']}")
+    print(f"🖼️ Total media URLs: {stats['total_media']}")
+    print(f"📁 Archivo BD: {db.db_path}")
+
+def exportar(db: InstagramDatabase, formato: str, archivo: Optional[str] = None) -> bool:
+    """Exporta la base a CSV (usuarios) o JSON (usuarios + media) sin pasar por el scraper"""
+    if formato == 'json':
+        return db.exportar_datos_completos_json(archivo or 'datos_completos.json')
+    return db.exportar_a_csv(archivo or OUTPUT_CONFIG.get('csv_file', 'usuarios_export.csv'))
+
+def seguir_cambios(db: InstagramDatabase, desde: Optional[int] = None, consumidor: Optional[str] = None,
+                   entidad: Optional[str] = None, limite: Optional[int] = None, seguir: bool = False) -> int:
+    """
+    Escribe en stdout, como NDJSON, los eventos del registro de cambios posteriores a un offset
+    
+    Con un consumidor, el offset se lee de la base y se confirma después de escribir cada lote:
+    si el proceso muere a mitad, el siguiente arranque repite como mucho un lote (al menos una vez).
+    
+    Args:
+        db (InstagramDatabase): Base de datos
+        desde (int, optional): Último seq ya procesado; tiene prioridad sobre el offset guardado
+        consumidor (str, optional): Nombre con el que se guarda el offset
+        entidad (str, optional): Solo eventos de 'usuario' o de 'media'
+        limite (int, optional): Máximo de eventos a escribir
+        seguir (bool): Si True, sigue esperando eventos nuevos (como tail -f) hasta Ctrl+C
         
-        for username in usernames:
-            username = username.strip()
-            if not username:
-                continue
-                
-            if self.db.verificar_usuario_completo(username):
-                print(f"   ⚠️ @{username} ya existe en BD")
-                existing += 1
-            else:
-                # Agregar usuario inicial (solo username)
-                self.db.agregar_usuarios_iniciales([username])
-                print(f"   ✅ @{username} agregado")
-                added += 1
-        
-        print(f"\n📊 Resumen:")
-        print(f"   ✅ Agregados: {added}")
-        print(f"   ⚠️ Ya existían: {existing}")
-        print(f"   📁 Base de datos: {self.db_path}")
+    Returns:
+        int: Eventos escritos
+    """
+    if desde is None:
+        desde = db.obtener_offset_consumidor(consumidor) if consumidor else 0
+    
+    escritos = 0
+    try:
+        while limite is None or escritos < limite:
+            lote = CAMBIOS_CONFIG['lote'] if limite is None else min(CAMBIOS_CONFIG['lote'], limite - escritos)
+            eventos = db.leer_cambios(desde, lote, entidad)
+            if eventos:
+                sys.stdout.write(''.join(json.dumps(evento, ensure_ascii=False) + '\n' for evento in eventos))
+                sys.stdout.flush()
+                desde = eventos[-1]['seq']
+                escritos += len(eventos)
+                if consumidor:
+                    db.guardar_offset_consumidor(consumidor, desde)
+            if len(eventos) < lote:
+                if not seguir:
+                    break
+                time.sleep(CAMBIOS_CONFIG['intervalo_seguir'])
+    except KeyboardInterrupt:
+        pass
+    return escritos
 
 def main():
-    """Función principal con menú interactivo"""
+    """Función principal: subcomandos (estadisticas, exportar, cambios, scrapear) o menú interactivo"""
+    parser = argparse.ArgumentParser(description='Scraper de perfiles de Instagram')
+    parser.add_argument('--db', default=OUTPUT_CONFIG['database_file'], help='Ruta de la base SQLite')
+    subcomandos = parser.add_subparsers(dest='comando')
+    subcomandos.add_parser('estadisticas', help='Mostrar estadísticas de la base y salir')
+    p_exportar = subcomandos.add_parser('exportar', help='Exportar la base a CSV o JSON y salir')
+    p_exportar.add_argument('--formato', choices=['csv', 'json'], default='csv')
+    p_exportar.add_argument('--archivo', help='Archivo destino (por defecto el de OUTPUT_CONFIG)')
+    p_cambios = subcomandos.add_parser('cambios', help='Escribir el registro de cambios como NDJSON en stdout')
+    p_cambios.add_argument('--desde', type=int, help='Último seq ya procesado (por defecto, el del consumidor o 0)')
+    p_cambios.add_argument('--consumidor', help='Nombre con el que se guarda el offset entre ejecuciones')
+    p_cambios.add_argument('--entidad', choices=['usuario', 'media'], help='Solo eventos de esta entidad')
+    p_cambios.add_argument('--limite', type=int, help='Máximo de eventos a escribir')
+    p_cambios.add_argument('--seguir', action='store_true', help='Seguir esperando eventos nuevos (Ctrl+C para salir)')
+    p_scrapear = subcomandos.add_parser('scrapear', help='Scrapear los pendientes sin menú, dentro de límites')
+    p_scrapear.add_argument('--max-minutos', type=float, help='Tiempo de pared máximo de la ejecución')
+    p_scrapear.add_argument('--max-requests', type=int, help='Requests a la API máximas')
+    p_scrapear.add_argument('--max-perfiles', type=int, help='Perfiles procesados máximos')
+    p_scrapear.add_argument('--orden', choices=['antiguedad', 'seguidores'], help='Orden de la cola de pendientes')
+    p_scrapear.add_argument('--sin-reanudar', action='store_true', help='Ignorar la posición de un batch anterior detenido')
+    p_scrapear.add_argument('--solo', choices=CONSULTAS_PERFIL,
+                            help='Refrescar solo esta consulta en los perfiles donde venció (REFRESCO_CONFIG)')
+    args = parser.parse_args()
+    
+    # stdout es del NDJSON: sin configurar_logging, los warnings y errores van a stderr
+    if args.comando == 'cambios':
+        seguir_cambios(InstagramDatabase(args.db), args.desde, args.consumidor, args.entidad,
+                       args.limite, args.seguir)
+        return
+    
+    configurar_logging()
+    
+    # Los subcomandos ligeros no construyen el scraper: ni sesión, ni requests, ni Selenium
+    if args.comando == 'estadisticas':
+        mostrar_estadisticas(InstagramDatabase(args.db))
+        detener_logging()
+        return
+    if args.comando == 'exportar':
+        exito = exportar(InstagramDatabase(args.db), args.formato, args.archivo)
+        detener_logging()
+        raise SystemExit(0 if exito else 1)
+
+    # Batch sin menú, para ventanas de mantenimiento o cron: se detiene al primer límite alcanzado
+    if args.comando == 'scrapear':
+        ScraperPerfil(db_path=args.db).scrape_pending_users(
+            args.max_minutos, args.max_requests, args.max_perfiles, args.orden,
+            reanudar=False if args.sin_reanudar else None, solo=args.solo)
+        detener_logging()
+        return
+    
     # Inicializar base de datos con perfiles famosos si está vacía
     from database import inicializar_con_perfiles_famosos
-    inicializar_con_perfiles_famosos()
+    inicializar_con_perfiles_famosos(args.db)
     
-    scraper = ScraperPerfil(debug_mode=False)
+    scraper = ScraperPerfil(db_path=args.db, debug_mode=False)
     
     while True:
         print("\n" + "="*60)
@@ -593,34 +1377,30 @@ def main():
         print("2. ➕ Agregar usuarios a BD")
         print("3. 📊 Ver estadísticas de BD")
         print("4. 🔍 Scrapear usuario específico")
-        print("5. ❌ Salir")
+        print("5. ⬇️ Descargar media pendiente")
+        print("6. 🔄 Refrescar URLs de media por expirar")
+        print("7. 🔎 Buscar perfiles por palabras clave")
+        print("8. ❌ Salir")
         print("="*60)
         
         try:
-            opcion = input("Selecciona una opción (1-5): ").strip()
+            opcion = input("Selecciona una opción (1-8): ").strip()
             
             if opcion == "1":
                 scraper.scrape_pending_users()
                 
             elif opcion == "2":
-                usernames_input = input("\nIngresa usernames separados por comas: ").strip()
-                if usernames_input:
+                usernames_input = input("\nIngresa usernames separados por comas (o la ruta de un archivo CSV/NDJSON/TXT): ").strip()
+                if usernames_input and os.path.isfile(usernames_input):
+                    scraper.add_users_from_file(usernames_input)
+                elif usernames_input:
                     usernames = [u.strip() for u in usernames_input.split(',')]
                     scraper.add_users_to_database(usernames)
                 else:
                     print("❌ No se ingresaron usernames")
                     
             elif opcion == "3":
-                stats = scraper.db.obtener_estadisticas()
-                print(f"\n📊 ESTADÍSTICAS DE BASE DE DATOS")
-                print(f"="*40)
-                print(f"👥 Total usuarios: {stats['total_usuarios']}")
-                print(f"✅ Activos: {stats['usuarios_activos']}")
-                print(f"❌ Inactivos: {stats['usuarios_inactivos']}")
-                print(f"🔒 Privados: {stats['usuarios_privados']}")
-                print(f"🏢 Negocios: {stats['usuarios_negocio']}")
-                print(f"🖼️ Total media URLs: {stats['total_media']}")
-                print(f"📁 Archivo BD: {scraper.db_path}")
+                mostrar_estadisticas(scraper.db)
                 
             elif opcion == "4":
                 username = input("\nIngresa el username a scrapear: ").strip()
@@ -630,7 +1410,7 @@ def main():
                             print("❌ Error en autenticación")
                             continue
                     
-                    user_data = scraper.scrape_user_complete(username)
+                    user_data = scraper.scrape_user_complete(username, list(CONSULTAS_PERFIL))
                     print(f"\n📋 DATOS EXTRAÍDOS:")
                     print("="*40)
                     print(json.dumps(user_data, indent=2, ensure_ascii=False))
@@ -642,17 +1422,40 @@ def main():
                     print("❌ No se ingresó username")
                     
             elif opcion == "5":
+                from downloader import DescargadorMedia
+                descargados, fallidos = DescargadorMedia(scraper.db_path).descargar_pendientes()
+                print(f"\n⬇️ Descargados: {descargados} | ❌ Fallidos: {fallidos}")
+                
+            elif opcion == "6":
+                scraper.refresh_expiring_media()
+                
+            elif opcion == "7":
+                consulta = input("\nPalabras clave (nombre, biografía, categoría): ").strip()
+                if consulta:
+                    resultados = scraper.db.buscar_perfiles(consulta, limite=20)
+                    print(f"\n🔎 {len(resultados)} resultados para '{consulta}':")
+                    for perfil in resultados:
+                        print(f"   @{perfil['username']} - {perfil['nombre_persona'] or ''} "
+                              f"({scraper.format_number(perfil['cantidad_seguidores'])} seguidores)")
+                        if perfil['fragmento_biografia']:
+                            print(f"      {perfil['fragmento_biografia']}")
+                else:
+                    print("❌ No se ingresaron palabras clave")
+                    
+            elif opcion == "8":
                 print("👋 ¡Hasta luego!")
                 break
                 
             else:
-                print("❌ Opción inválida. Selecciona 1-5.")
+                print("❌ Opción inválida. Selecciona 1-8.")
                 
         except KeyboardInterrupt:
             print("\n\n👋 Interrumpido por el usuario. ¡Hasta luego!")
             break
         except Exception as e:
             print(f"❌ Error inesperado: {e}")
+    
+    detener_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,92 @@
+import re
+import time
+from typing import Dict, Optional
+
+from config import SESION_CONFIG
+
+# ==============================================================================
+# SALUD DE LA SESIÓN AUTENTICADA
+# ==============================================================================
+
+_CODIGO_ERROR = re.compile(rb'"code":\s*(\d+)')
+
+# Bytes iniciales de la respuesta donde se buscan los marcadores de error (los
+# payloads de error de Instagram son cortos; los de datos empiezan por {"data":...)
+_CABECERA = 2048
+
+
+class SesionInvalida(Exception):
+    """La sesión caducó y no se pudo re-autenticar (o la re-autenticación no la recuperó)"""
+
+
+class MonitorSesion:
+    """
+    Detecta cuándo la sesión autenticada dejó de servir.
+
+    Si las cookies o csrf_token/fb_dtsg caducan a mitad de un batch, todas las requests
+    siguientes fallan; sin este monitor esos fallos se registrarían como errores de perfil
+    hasta el final. Revisa la expiración de las cookies críticas antes de cada request y
+    clasifica las respuestas (401/403, redirección al login, errores GraphQL de "no
+    autenticado") para que el scraper re-autentique y repita la request afectada.
+    """
+
+    def __init__(self, max_reautenticaciones: Optional[int] = None):
+        """
+        Args:
+            max_reautenticaciones (int, optional): Re-autenticaciones permitidas (por defecto, de config)
+        """
+        self.max_reautenticaciones = max_reautenticaciones or SESION_CONFIG['max_reautenticaciones']
+        self.reautenticaciones = 0
+        self.expiraciones: Dict[str, float] = {}
+
+    def actualizar(self, tokens: Dict) -> None:
+        """Toma las expiraciones de cookies de una sesión recién autenticada"""
+        self.expiraciones = {
+            nombre: expiracion for nombre, expiracion in (tokens.get('expiraciones') or {}).items()
+            if nombre in SESION_CONFIG['cookies_criticas']
+        }
+
+    def por_expirar(self) -> Optional[str]:
+        """
+        Verifica si alguna cookie crítica expira dentro del margen configurado
+
+        Returns:
+            Optional[str]: Motivo (para el log), o None si la sesión sigue vigente
+        """
+        limite = time.time() + SESION_CONFIG['margen_expiracion']
+        for nombre, expiracion in self.expiraciones.items():
+            if expiracion <= limite:
+                return f"la cookie '{nombre}' expira en {max(0, expiracion - time.time()):.0f}s"
+        return None
+
+    def respuesta_invalida(self, response) -> Optional[str]:
+        """
+        Clasifica una respuesta como fallo de autenticación
+
+        Args:
+            response: Respuesta de requests (o del adaptador httpx de transport.py)
+
+        Returns:
+            Optional[str]: Motivo (para el log), o None si la respuesta no indica sesión inválida
+        """
+        if response.status_code in SESION_CONFIG['estados_http']:
+            return f"HTTP {response.status_code}"
+
+        url = str(response.url)
+        for ruta in SESION_CONFIG['rutas_login']:
+            if ruta in url:
+                return f"redirección a {ruta}"
+
+        cabecera = response.content[:_CABECERA]
+        for mensaje in SESION_CONFIG['mensajes_error']:
+            if mensaje.encode() in cabecera:
+                return f"respuesta '{mensaje}'"
+        if b'"errors"' in cabecera:
+            for codigo in _CODIGO_ERROR.findall(cabecera):
+                if int(codigo) in SESION_CONFIG['codigos_graphql']:
+                    return f"error GraphQL {int(codigo)}"
+        return None
+
+    def puede_reautenticar(self) -> bool:
+        """Indica si quedan re-autenticaciones disponibles en esta ejecución"""
+        return self.reautenticaciones < self.max_reautenticaciones
@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+from urllib.parse import parse_qs
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from limitador import LimitadorTasa  # noqa: E402
+
+# Consulta GraphQL -> fb_api_req_friendly_name (según graphql_queries.py)
+CONSULTAS_GRAPHQL = {
+    'PolarisProfilePageContentQuery': 'user',
+    'PolarisProfileStoryHighlightsTrayContentQuery': 'highlights',
+    'PolarisProfilePostsQuery': 'posts',
+}
+
+
+class RespuestaFalsa:
+    """Lo que el scraper lee de una respuesta de requests"""
+
+    def __init__(self, status_code: int, datos: dict, url: str = ''):
+        self.status_code = status_code
+        self.url = url
+        self.headers = {}
+        self._datos = datos
+        self.content = json.dumps(datos).encode()
+        self.text = self.content.decode()
+
+    def json(self):
+        return self._datos
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            error = requests.exceptions.HTTPError(str(self.status_code))
+            error.response = self
+            raise error
+
+
+class SesionFalsa:
+    """
+    Sesión HTTP con respuestas fijas de Instagram para un perfil
+
+    `fallos` mapea una consulta ('perfil', 'user', 'highlights', 'posts') al estado HTTP que
+    debe devolver; `pedidas` registra las consultas en el orden en que llegaron.
+    """
+
+    def __init__(self, posts=('P1', 'P2'), highlights=('h1',)):
+        self.posts = posts
+        self.highlights = highlights
+        self.fallos = {}
+        self.pedidas = []
+        self.headers = {}
+        self.cookies = {}
+
+    def request(self, metodo, url, data=None, **kwargs):
+        if metodo == 'GET':
+            consulta = 'perfil'
+            datos = {'data': {'user': {'id': '111'}}}
+        else:
+            consulta = CONSULTAS_GRAPHQL[parse_qs(data)['fb_api_req_friendly_name'][0]]
+            datos = self._datos(consulta)
+        self.pedidas.append(consulta)
+        if consulta in self.fallos:
+            return RespuestaFalsa(self.fallos[consulta], {'message': 'error'}, url)
+        return RespuestaFalsa(200, datos, url)
+
+    def _datos(self, consulta: str) -> dict:
+        if consulta == 'user':
+            return {'data': {'user': {
+                'username': 'perfil', 'full_name': 'Perfil', 'pk': '111', 'follower_count': 1000,
+                'following_count': 10, 'media_count': len(self.posts), 'is_private': False,
+            }}}
+        if consulta == 'highlights':
+            return {'data': {'highlights': {'edges': [
+                {'node': {'id': f'highlight:{id_destacada}', 'title': id_destacada,
+                          'cover_media': {'cropped_image_version': {'url': f'https://cdn/{id_destacada}.jpg'}}}}
+                for id_destacada in self.highlights
+            ]}}}
+        return {'data': {'xdt_api__v1__feed__user_timeline_graphql_connection': {'edges': [
+            {'node': {'code': codigo, 'pk': codigo, 'media_type': 1, 'like_count': 5, 'comment_count': 1,
+                      'image_versions2': {'candidates': [
+                          {'url': f'https://cdn/{codigo}.jpg', 'width': 1080, 'height': 1080}]}}}
+            for codigo in self.posts
+        ]}}}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'instagram_data.db')
+
+
+@pytest.fixture
+def scraper(db_path, monkeypatch):
+    """ScraperPerfil sobre una base temporal, con una SesionFalsa ya autenticada y sin archivo ni delays"""
+    monkeypatch.setitem(config.RESPUESTAS_CONFIG, 'activo', False)
+    from scraper_perfil import PlantillasGraphQL, ScraperPerfil
+
+    scraper = ScraperPerfil(db_path)
+    scraper.session = SesionFalsa()
+    scraper.tokens = {'csrf_token': 'csrf', 'fb_lsd': 'lsd', 'fb_dtsg': 'dtsg'}
+    scraper.plantillas = PlantillasGraphQL(scraper.tokens)
+    scraper.limitador = LimitadorTasa(por_segundo=1000, rafaga=1000)
+    return scraper
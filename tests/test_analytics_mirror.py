@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('duckdb')
+pytest.importorskip('numpy')
+
+from analytics_mirror import TABLAS_ESPEJO, EspejoAnalitico  # noqa: E402
+from database import InstagramDatabase  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_conn(db_path):
+    InstagramDatabase(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.executemany('INSERT INTO usuarios_unicos (username, cantidad_seguidores) VALUES (?, ?)',
+                     [(f'perfil{i}', i) for i in range(5)])
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def espejo(db_path, sqlite_conn):
+    espejo = EspejoAnalitico(db_path, archivo=':memory:')
+    espejo.sincronizar()
+    yield espejo
+    espejo.cerrar()
+
+
+def _sincronizar(espejo, sqlite_conn):
+    return espejo._sincronizar_tabla(sqlite_conn, 'usuarios_unicos', TABLAS_ESPEJO['usuarios_unicos'], False)
+
+
+def _usernames(espejo):
+    return sorted(u for u, in espejo.con.execute('SELECT username FROM usuarios_unicos').fetchall())
+
+
+def test_inserciones_durante_la_copia_no_fuerzan_copia_completa(espejo, sqlite_conn, monkeypatch):
+    sqlite_conn.execute("UPDATE usuarios_unicos SET cantidad_seguidores = 100, "
+                        "ultima_actualizacion = datetime('now', '+1 minute') WHERE username = 'perfil0'")
+    copiar = espejo._copiar
+
+    def copiar_con_escritor(*args, **kwargs):
+        # Otro proceso inserta un perfil mientras el espejo copia los cambios
+        sqlite_conn.execute("INSERT OR IGNORE INTO usuarios_unicos (username) VALUES ('nuevo')")
+        return copiar(*args, **kwargs)
+
+    monkeypatch.setattr(espejo, '_copiar', copiar_con_escritor)
+    copiadas, fue_completa = _sincronizar(espejo, sqlite_conn)
+    assert copiadas and not fue_completa
+    assert 'nuevo' not in _usernames(espejo)
+
+    monkeypatch.setattr(espejo, '_copiar', copiar)
+    _sincronizar(espejo, sqlite_conn)
+    assert _usernames(espejo) == ['nuevo'] + [f'perfil{i}' for i in range(5)]
+
+
+def test_borrado_sin_cambio_de_marca_hace_copia_completa(espejo, sqlite_conn):
+    sqlite_conn.execute("DELETE FROM usuarios_unicos WHERE username = 'perfil3'")
+    assert _sincronizar(espejo, sqlite_conn) == (4, True)
+    assert _usernames(espejo) == ['perfil0', 'perfil1', 'perfil2', 'perfil4']
+
+
+def test_error_en_la_copia_completa_no_queda_enmascarado(espejo, sqlite_conn, monkeypatch):
+    # Sin filas modificadas desde la marca: solo la copia completa por el borrado lee de SQLite
+    espejo.con.execute("UPDATE _sincronizacion SET marca = '9999-12-31 00:00:00'")
+    sqlite_conn.execute("DELETE FROM usuarios_unicos WHERE username = 'perfil3'")
+
+    def falla(*args, **kwargs):
+        raise RuntimeError('lectura fallida')
+
+    monkeypatch.setattr(espejo, '_copiar', falla)
+    with pytest.raises(RuntimeError, match='lectura fallida'):
+        _sincronizar(espejo, sqlite_conn)
+
+    # La transacción se cerró una sola vez y el espejo sigue usable
+    monkeypatch.undo()
+    assert _sincronizar(espejo, sqlite_conn) == (4, True)
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+
+def _media(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {
+            'media': sorted(conn.execute('SELECT tipo_media, id_externo, url_media FROM media_urls')),
+            'posts': sorted(conn.execute('SELECT shortcode FROM posts')),
+            'recursos': conn.execute('SELECT COUNT(*) FROM recursos_post').fetchone()[0],
+            'variantes': conn.execute('SELECT COUNT(*) FROM variantes_recurso').fetchone()[0],
+            'destacadas': conn.execute('SELECT cantidad_destacadas FROM usuarios_unicos').fetchone()[0],
+        }
+
+
+def _scrapear(scraper, consultas=('user', 'highlights', 'posts')):
+    datos = scraper.scrape_user_complete('perfil', list(consultas))
+    assert scraper.save_user_to_database(datos)
+    return datos
+
+
+@pytest.fixture
+def guardado(scraper, db_path):
+    _scrapear(scraper)
+    antes = _media(db_path)
+    assert len(antes['media']) == 3 and antes['destacadas'] == 1 and antes['variantes'] == 2
+    return antes
+
+
+@pytest.mark.parametrize('fallos', [
+    {'posts': 500},
+    {'highlights': 500},
+    {'posts': 500, 'highlights': 429},
+])
+def test_consulta_fallida_conserva_media(scraper, db_path, guardado, monkeypatch, fallos):
+    monkeypatch.setattr(scraper, '_esperar', lambda segundos, etapa: None)
+    scraper.session.fallos = fallos
+    datos = _scrapear(scraper)
+
+    assert set(fallos) <= set(datos['consultas_fallidas'])
+    assert _media(db_path) == guardado
+
+
+def test_consulta_respondida_reemplaza_solo_su_tipo(scraper, db_path, guardado):
+    scraper.session.posts = ('P3',)
+    scraper.session.fallos = {'highlights': 500}
+    _scrapear(scraper)
+
+    despues = _media(db_path)
+    assert [fila[1] for fila in despues['media'] if fila[0] == 'post'] == ['P3']
+    assert [fila for fila in despues['media'] if fila[0] == 'destacada'] == \
+        [fila for fila in guardado['media'] if fila[0] == 'destacada']
+    assert despues['posts'] == [('P3',)] and despues['destacadas'] == 1
+
+
+
+def test_consulta_fallida_no_registra_cambios(scraper, db_path, guardado):
+    with sqlite3.connect(db_path) as conn:
+        ultimo = conn.execute('SELECT MAX(seq) FROM cambios').fetchone()[0]
+
+    scraper.session.fallos = {'posts': 500, 'highlights': 500}
+    _scrapear(scraper)
+
+    with sqlite3.connect(db_path) as conn:
+        nuevos = conn.execute('SELECT entidad, clave, operacion, campos FROM cambios WHERE seq > ?',
+                              (ultimo,)).fetchall()
+    assert nuevos == []
+
+
+def test_cambios_de_media_solo_de_los_tipos_reemplazados(scraper, db_path, guardado):
+    with sqlite3.connect(db_path) as conn:
+        ultimo = conn.execute('SELECT MAX(seq) FROM cambios').fetchone()[0]
+
+    posts = [{'shortcode': 'P3', 'thumbnail_url': 'https://cdn/P3.jpg'}]
+    assert scraper.db.insertar_media_urls('perfil', {'posts': posts, 'consultas_ok': ['posts']})
+
+    with sqlite3.connect(db_path) as conn:
+        nuevos = sorted(conn.execute('SELECT clave, operacion FROM cambios WHERE seq > ?', (ultimo,)))
+    assert nuevos == [('post:P1', 'baja'), ('post:P2', 'baja'), ('post:P3', 'alta')]
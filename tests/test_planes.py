@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from migraciones import CONSULTAS_CRITICAS, VERSION_ACTUAL, _paginas_cursores, verificar_planes, version_esquema
+
+PAGINAS = sorted(_paginas_cursores())
+
+
+@pytest.fixture
+def conn(db_path):
+    # Abrir la base crea el esquema y aplica todas las migraciones
+    from database import InstagramDatabase
+    InstagramDatabase(db_path)
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def test_migraciones_aplicadas(conn):
+    assert version_esquema(conn) == VERSION_ACTUAL
+
+
+@pytest.mark.parametrize('nombre', PAGINAS + sorted(CONSULTAS_CRITICAS))
+def test_consulta_critica_usa_su_indice(conn, nombre):
+    usa_indice, plan = verificar_planes(conn)[nombre]
+    assert usa_indice, plan
+
+
+@pytest.mark.parametrize('nombre', PAGINAS)
+def test_pagina_keyset_sin_ordenar(conn, nombre):
+    # Cada página busca en el índice desde la última clave, sin ordenar la tabla
+    sql, parametros, _ = _paginas_cursores()[nombre]
+    plan = [fila[-1] for fila in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)]
+    assert not any('TEMP B-TREE' in linea for linea in plan), plan
+
+
+def test_orden_seguidores_empieza_por_los_nunca_scrapeados(db_path, conn):
+    from database import InstagramDatabase
+
+    db = InstagramDatabase(db_path)
+    db.insertar_usuario({'username': 'famoso', 'follower_count': 5_000_000, 'error': 'HTTP 500',
+                         'tipo_fallo': 'no_encontrado'})
+    db.agregar_usuarios_masivo(['nuevo'])
+    conn.execute("UPDATE usuarios_unicos SET proximo_intento = NULL, ultima_actualizacion = '2000-01-01'")
+    conn.commit()
+
+    assert list(db.iterar_usuarios_pendientes(orden='seguidores')) == ['nuevo', 'famoso']
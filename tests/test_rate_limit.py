@@ -0,0 +1,51 @@
+import time
+
+import config
+
+
+def test_rate_limit_sin_espera_posible_no_cancela_el_perfil(scraper, monkeypatch):
+    # Con un deadline menor que la espera de 60s, el 429 vuelve a la etapa sin dormir
+    monkeypatch.setitem(config.SCRAPING_CONFIG, 'deadline_perfil', 30)
+    scraper.session.fallos = {'posts': 429}
+    inicio = time.monotonic()
+    datos = scraper.scrape_user_complete('perfil', ['user', 'highlights', 'posts'])
+
+    assert time.monotonic() - inicio < 5
+    assert 'tipo_fallo' not in datos
+    assert datos['consultas_fallidas'] == ['posts']
+    assert scraper.session.pedidas.count('posts') == 1
+
+
+def test_rate_limit_en_usuario_no_es_timeout(scraper, monkeypatch):
+    monkeypatch.setitem(config.SCRAPING_CONFIG, 'deadline_perfil', 30)
+    scraper.session.fallos = {'user': 429}
+    datos = scraper.scrape_user_complete('perfil', ['user', 'highlights', 'posts'])
+
+    assert datos['tipo_fallo'] == 'rate_limit'
+
+
+def test_rate_limit_en_perfil_respeta_el_deadline(scraper, monkeypatch):
+    monkeypatch.setitem(config.SCRAPING_CONFIG, 'deadline_perfil', 30)
+    scraper.session.fallos = {'perfil': 429}
+    inicio = time.monotonic()
+    datos = scraper.scrape_user_complete('perfil', ['user', 'highlights', 'posts'])
+
+    assert time.monotonic() - inicio < 5
+    assert datos['tipo_fallo'] == 'rate_limit'
+
+
+def test_rate_limit_no_excede_el_tiempo_de_la_ejecucion(scraper, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(config.OUTPUT_CONFIG, 'save_csv', False)
+    monkeypatch.setattr(scraper, 'autenticar', lambda **kwargs: True)
+    monkeypatch.setattr(scraper, '_esperar', lambda segundos, etapa: None)
+    scraper.db.agregar_usuarios_masivo(['perfil', 'otro'])
+    scraper.session.fallos = {'perfil': 429}
+
+    inicio = time.monotonic()
+    scraper.scrape_pending_users(max_minutos=0.05, orden='antiguedad')
+
+    # 3s de presupuesto: sin acotar, la espera por rate limit sola serían 120s
+    assert time.monotonic() - inicio < 10
+    posicion = scraper.db.obtener_posicion_batch('pendientes')
+    assert posicion['cola'] == ['otro']  # El primero del orden, limitado cuando se acabó el tiempo
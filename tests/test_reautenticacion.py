@@ -0,0 +1,67 @@
+import builtins
+import getpass
+import io
+import json
+import sys
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def sin_consola(tmp_path, monkeypatch):
+    """stdin cerrado y cualquier prompt falla el test"""
+    def prompt(*args, **kwargs):
+        raise AssertionError('la re-autenticación no debe leer la consola')
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''))
+    monkeypatch.setattr(builtins, 'input', prompt)
+    monkeypatch.setattr(getpass, 'getpass', prompt)
+
+
+def test_reautenticacion_sin_credenciales_es_sesion_invalida(scraper, sin_consola, monkeypatch):
+    monkeypatch.setitem(config.LOGIN_CONFIG, 'directorio_perfil', None)
+    scraper.session.fallos = {'perfil': 401}
+    datos = scraper.scrape_user_complete('perfil', ['user', 'highlights', 'posts'])
+
+    assert datos['tipo_fallo'] == 'sesion'
+    assert scraper.monitor.reautenticaciones == 1
+
+
+def test_credenciales_guardadas_sin_prompt(sin_consola, tmp_path):
+    from login import InstagramLogin
+
+    (tmp_path / 'instagram_credentials.json').write_text(json.dumps({'username': 'u', 'password': 'p'}))
+    assert InstagramLogin().get_credentials(interactivo=False) == ('u', 'p')
+
+
+def test_sin_credenciales_guardadas_sin_prompt(sin_consola):
+    from login import InstagramLogin
+
+    assert InstagramLogin().get_credentials(interactivo=False) == (None, None)
+
+
+def test_refrescar_tokens_recarga_doc_ids_sin_login(scraper, sin_consola, monkeypatch):
+    import scraper_perfil
+
+    def autenticar(*args, **kwargs):
+        raise AssertionError('con la sesión válida no se vuelve a hacer login')
+
+    doc_ids = dict(scraper.DOC_IDS, posts='999')
+    monkeypatch.setattr(scraper_perfil, 'cargar_doc_ids', lambda: doc_ids)
+    monkeypatch.setattr(scraper, 'autenticar', autenticar)
+
+    assert scraper.refrescar_tokens()
+    assert scraper.plantillas.doc_ids['posts'] == '999'
+    assert scraper.session.pedidas == ['perfil']
+
+
+def test_refrescar_tokens_con_sesion_invalida_reautentica_sin_prompt(scraper, sin_consola, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(scraper, 'autenticar', lambda **kwargs: llamadas.append(kwargs) or False)
+    scraper.session.fallos = {'perfil': 401}
+
+    assert not scraper.refrescar_tokens()
+    assert [llamada['interactivo'] for llamada in llamadas] == [False]
@@ -0,0 +1,74 @@
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+import config
+from database import InstagramDatabase
+from retencion import archivar
+
+
+@pytest.fixture
+def db(db_path):
+    return InstagramDatabase(db_path)
+
+
+def _envejecer(db_path, tabla, columna):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f"UPDATE {tabla} SET {columna} = datetime('now', '-30 days')")
+
+
+def test_perfil_inactivo_archivado_deja_lapida(db, db_path, tmp_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            INSERT INTO usuarios_unicos (username, perfil_inactivo, nombre_persona, biografia, cantidad_seguidores)
+            VALUES ('borrado', TRUE, 'Borrado', 'fotografía', 0)
+        """)
+    assert db.registrar_fallo('borrado', 'no_encontrado')
+    _envejecer(db_path, 'usuarios_unicos', 'ultima_actualizacion')
+
+    assert archivar(db_path, 'perfiles_inactivos', dias=1, directorio=str(tmp_path / 'archivo')) == 1
+
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        lapida = conn.execute('SELECT * FROM usuarios_unicos WHERE username = ?', ('borrado',)).fetchone()
+    assert lapida['estado_fallo'] == 'descartado' and lapida['tipo_fallo'] == 'no_encontrado'
+    assert lapida['perfil_inactivo'] and lapida['fecha_archivado'] is not None
+    assert lapida['nombre_persona'] is None and lapida['biografia'] is None
+    assert db.buscar_perfiles('fotografía') == []
+
+    (ruta,) = (tmp_path / 'archivo' / 'usuarios_unicos').iterdir()
+    with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+        assert json.loads(archivo.readline())['nombre_persona'] == 'Borrado'
+
+    # La lápida no se vuelve a archivar y re-importar el username no lo vuelve elegible
+    assert archivar(db_path, 'perfiles_inactivos', dias=1, directorio=str(tmp_path / 'archivo')) == 0
+    assert db.agregar_usuarios_masivo(['borrado', 'nuevo']) == (1, 1)
+    with sqlite3.connect(db_path) as conn:
+        elegibles = [u for u, in conn.execute(
+            'SELECT username FROM usuarios_unicos WHERE proximo_intento IS NULL OR proximo_intento <= CURRENT_TIMESTAMP')]
+    assert elegibles == ['nuevo']
+
+
+@pytest.mark.parametrize('borrar', [True, False])
+def test_media_archivada_borra_archivos_sin_referencias(db, db_path, tmp_path, monkeypatch, borrar):
+    monkeypatch.setitem(config.RETENCION_CONFIG, 'borrar_archivos', borrar)
+    compartido = tmp_path / 'compartido.jpg'
+    propio = tmp_path / 'propio.jpg'
+    for archivo in (compartido, propio):
+        archivo.write_bytes(b'jpg')
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("""
+            INSERT INTO media_urls (username, url_media, tipo_media, ruta_archivo, fecha_scraping)
+            VALUES (?, ?, 'post', ?, datetime('now', ?))
+        """, [
+            ('viejo', 'https://cdn/a.jpg', str(compartido), '-30 days'),
+            ('viejo', 'https://cdn/b.jpg', str(propio), '-30 days'),
+            ('reciente', 'https://cdn/a2.jpg', str(compartido), '-0 days'),
+        ])
+
+    assert archivar(db_path, 'media_posts', dias=1, directorio=str(tmp_path / 'archivo')) == 2
+    assert compartido.exists()
+    assert propio.exists() is not borrar
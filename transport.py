@@ -0,0 +1,199 @@
+import importlib.util
+import socket
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from config import TRANSPORT_CONFIG
+from logger import obtener_logger
+
+logger = obtener_logger('transport')
+
+# ==============================================================================
+# CAPA DE TRANSPORTE HTTP PARA LA SESIÓN COMPARTIDA
+# ==============================================================================
+
+def _soporta_brotli() -> bool:
+    """urllib3 solo decodifica 'br' si hay un paquete brotli instalado"""
+    return any(importlib.util.find_spec(nombre) for nombre in ('brotli', 'brotlicffi'))
+
+
+def accept_encoding() -> str:
+    """Devuelve el Accept-Encoding soportado por el entorno (gzip siempre, brotli si está disponible)"""
+    return 'gzip, deflate, br' if _soporta_brotli() else 'gzip, deflate'
+
+
+def _opciones_socket() -> list:
+    """Opciones de socket con TCP keep-alive para conexiones del pool inactivas"""
+    opciones = list(HTTPConnection.default_socket_options)
+    opciones.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+    inactividad = TRANSPORT_CONFIG['keepalive_inactividad']
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, inactividad))
+    elif hasattr(socket, 'TCP_KEEPALIVE'):  # macOS
+        opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, inactividad))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, TRANSPORT_CONFIG['keepalive_intervalo']))
+    return opciones
+
+
+class AdaptadorKeepAlive(HTTPAdapter):
+    """HTTPAdapter con tamaños de pool explícitos y TCP keep-alive"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = _opciones_socket()
+        super().init_poolmanager(*args, **kwargs)
+
+
+def configurar_sesion_requests(session: requests.Session, pool_maxsize: Optional[int] = None) -> requests.Session:
+    """
+    Configura pools de conexión, keep-alive y compresión en una sesión de requests
+
+    Args:
+        session (requests.Session): Sesión a configurar
+        pool_maxsize (int, optional): Conexiones por host (por defecto, de config)
+
+    Returns:
+        requests.Session: La misma sesión configurada
+    """
+    adaptador = AdaptadorKeepAlive(
+        pool_connections=TRANSPORT_CONFIG['pool_hosts'],
+        pool_maxsize=pool_maxsize or TRANSPORT_CONFIG['pool_por_host'],
+        pool_block=TRANSPORT_CONFIG['pool_bloqueante'],
+        max_retries=0,
+    )
+    session.mount('https://', adaptador)
+    session.mount('http://', adaptador)
+    session.headers['Accept-Encoding'] = accept_encoding()
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+# ==============================================================================
+# BACKEND ALTERNATIVO (HTTP/2) CON LA MISMA INTERFAZ
+# ==============================================================================
+
+class _RespuestaHttpx:
+    """Envuelve una respuesta de httpx con la interfaz de requests.Response que usa el scraper"""
+
+    def __init__(self, respuesta):
+        self._respuesta = respuesta
+
+    def __getattr__(self, nombre):
+        return getattr(self._respuesta, nombre)
+
+    @property
+    def content(self) -> bytes:
+        # En modo stream httpx exige read() antes de acceder al cuerpo
+        return self._respuesta.read()
+
+    @property
+    def ok(self) -> bool:
+        return self._respuesta.status_code < 400
+
+    def raise_for_status(self):
+        if self._respuesta.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self._respuesta.status_code} Error for url: {self._respuesta.url}", response=self)
+
+    def iter_content(self, chunk_size: int = 1024):
+        return self._respuesta.iter_bytes(chunk_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._respuesta.close()
+
+
+class SesionHttpx:
+    """
+    Sesión sobre httpx (HTTP/2 opcional) que expone el subconjunto de requests.Session
+    usado por el scraper: headers, cookies, get() y post().
+    """
+
+    def __init__(self, http2: bool = True, pool_maxsize: Optional[int] = None):
+        import httpx
+
+        self._httpx = httpx
+        http2 = http2 and importlib.util.find_spec('h2') is not None
+        if not http2:
+            logger.debug("[*] Paquete 'h2' no instalado: httpx usará HTTP/1.1")
+
+        maximo = pool_maxsize or TRANSPORT_CONFIG['pool_por_host']
+        self._cliente = httpx.Client(
+            http2=http2,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=maximo * TRANSPORT_CONFIG['pool_hosts'],
+                max_keepalive_connections=maximo,
+                keepalive_expiry=TRANSPORT_CONFIG['keepalive_inactividad'],
+            ),
+        )
+        self._cliente.headers['Accept-Encoding'] = accept_encoding()
+
+    @property
+    def headers(self):
+        return self._cliente.headers
+
+    @property
+    def cookies(self):
+        return self._cliente.cookies
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            conexion, lectura = timeout
+            return self._httpx.Timeout(lectura, connect=conexion)
+        return timeout
+
+    def request(self, metodo: str, url: str, data=None, timeout=None, stream: bool = False, **kwargs):
+        if isinstance(data, (str, bytes)):
+            kwargs['content'] = data
+        elif data is not None:
+            kwargs['data'] = data
+        if timeout is not None:
+            kwargs['timeout'] = self._timeout(timeout)
+
+        # Mismas excepciones que requests para que los llamadores distingan timeouts
+        try:
+            if stream:
+                peticion = self._cliente.build_request(metodo, url, **kwargs)
+                return _RespuestaHttpx(self._cliente.send(peticion, stream=True))
+            return _RespuestaHttpx(self._cliente.request(metodo, url, **kwargs))
+        except self._httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except self._httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self._cliente.close()
+
+
+def crear_sesion(backend: Optional[str] = None, pool_maxsize: Optional[int] = None):
+    """
+    Crea la sesión HTTP compartida según TRANSPORT_CONFIG['backend']
+
+    Args:
+        backend (str, optional): 'requests' o 'httpx' (por defecto, de config)
+        pool_maxsize (int, optional): Conexiones por host
+
+    Returns:
+        requests.Session o SesionHttpx
+    """
+    backend = backend or TRANSPORT_CONFIG['backend']
+
+    if backend == 'httpx':
+        if importlib.util.find_spec('httpx') is not None:
+            return SesionHttpx(http2=TRANSPORT_CONFIG['http2'], pool_maxsize=pool_maxsize)
+        logger.warning("[!] Backend 'httpx' no disponible (pip install httpx[http2]). Usando requests.")
+
+    return configurar_sesion_requests(requests.Session(), pool_maxsize=pool_maxsize)